@@ -0,0 +1,214 @@
+import cv2
+import numpy as np
+
+# Registro de modelos de fundo: nome -> fábrica. Todo modelo expõe
+# apply(gray) -> máscara uint8 (0/255) do mesmo tamanho do frame. Modelos com
+# `batched = True` também aceitam uma pilha (câmeras, H, W) e mantêm o estado
+# de cada câmera na fatia correspondente (ver multi_stream.py).
+BACKGROUND_MODELS = {}
+
+
+def register_background_model(name):
+    """Decorador que registra uma fábrica de modelo de fundo sob `name`."""
+    def decorator(factory):
+        BACKGROUND_MODELS[name] = factory
+        return factory
+    return decorator
+
+
+def create_background_model(name, **params):
+    """Cria o modelo de fundo registrado como `name` com os parâmetros dados."""
+    if name not in BACKGROUND_MODELS:
+        raise ValueError(f"Modelo de fundo desconhecido: {name} (disponíveis: {sorted(BACKGROUND_MODELS)})")
+    return BACKGROUND_MODELS[name](**params)
+
+
+@register_background_model("mog2")
+def create_mog2(history=100, var_threshold=40, detect_shadows=False):
+    return cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold,
+                                              detectShadows=detect_shadows)
+
+
+@register_background_model("knn")
+def create_knn(history=100, dist2_threshold=400.0, detect_shadows=False):
+    return cv2.createBackgroundSubtractorKNN(history=history, dist2Threshold=dist2_threshold,
+                                             detectShadows=detect_shadows)
+
+
+@register_background_model("running_average")
+class RunningAverageSubtractor:
+    """Fundo como média móvel exponencial por pixel, em NumPy.
+
+    Um pixel é frente quando |frame - fundo| > threshold; o fundo é atualizado
+    com taxa `alpha` a cada frame. Os buffers são alocados uma única vez.
+    Aceita um frame (H, W) ou uma pilha (câmeras, H, W), atualizada em uma operação.
+    """
+
+    batched = True
+
+    def __init__(self, alpha=0.05, threshold=25):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.background = None
+        self._diff = None
+
+    def apply(self, gray):
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self._diff = np.empty(gray.shape, np.float32)
+            return np.zeros(gray.shape, np.uint8)
+
+        np.subtract(gray, self.background, out=self._diff)
+        np.abs(self._diff, out=self._diff)
+        mask = (self._diff > self.threshold).view(np.uint8) * np.uint8(255)
+
+        # fundo = (1 - alpha) * fundo + alpha * frame, in-place em float32 no cv2 (sem
+        # temporários float64); uma pilha é vista como uma imagem 2D (câmeras * H, W)
+        rows = gray.reshape(-1, gray.shape[-1])
+        cv2.accumulateWeighted(rows, self.background.reshape(rows.shape), self.alpha)
+        return mask
+
+
+@register_background_model("frame_difference")
+class FrameDifferenceSubtractor:
+    """Linha de base: frente é o que mudou mais que `threshold` desde o frame anterior.
+
+    Aceita um frame (H, W) ou uma pilha (câmeras, H, W).
+    """
+
+    batched = True
+
+    def __init__(self, threshold=25):
+        self.threshold = threshold
+        self.previous = None
+
+    def apply(self, gray):
+        if self.previous is None or self.previous.shape != gray.shape:
+            self.previous = gray.copy()
+            return np.zeros(gray.shape, np.uint8)
+
+        # Uma pilha vira uma imagem 2D (câmeras * H, W) para o cv2, sem cópia
+        rows = gray.reshape(-1, gray.shape[-1])
+        diff = cv2.absdiff(rows, self.previous.reshape(rows.shape))
+        np.copyto(self.previous, gray)
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        return mask.reshape(gray.shape)
+
+
+@register_background_model("gmm")
+class GaussianMixtureSubtractor:
+    """Mistura de gaussianas por pixel (como o MOG2), com todo o estado em arrays NumPy.
+
+    Cada pixel tem `n_components` gaussianas (médias, variâncias e pesos em arrays
+    (K, H, W) float32). Um pixel casa com a componente mais próxima cuja distância²
+    é menor que `var_threshold` vezes a variância; ele é fundo se essa componente
+    está entre as mais pesadas que somam `background_ratio`. Sem casamento, a
+    componente mais fraca é substituída por uma nova, centrada no pixel. A taxa de
+    aprendizado é 1/min(frames, history), como no MOG2.
+
+    Ao contrário do objeto do cv2, o estado pode ser salvo e restaurado
+    (`state_arrays` / `load_state`, ver checkpoint.py).
+    """
+
+    checkpointable = True
+
+    def __init__(self, history=100, var_threshold=40, n_components=3, background_ratio=0.9,
+                 var_init=15.0, var_min=4.0, var_max=75.0):
+        self.history = history
+        self.var_threshold = var_threshold
+        self.n_components = n_components
+        self.background_ratio = background_ratio
+        self.var_init = var_init
+        self.var_min = var_min
+        self.var_max = var_max
+        self.frames = 0
+        self.means = self.variances = self.weights = None
+
+    def params(self):
+        return {"history": self.history, "var_threshold": self.var_threshold, "n_components": self.n_components,
+                "background_ratio": self.background_ratio, "var_init": self.var_init,
+                "var_min": self.var_min, "var_max": self.var_max}
+
+    def _reset(self, gray):
+        shape = (self.n_components,) + gray.shape
+        self.means = np.zeros(shape, np.float32)
+        self.means[0] = gray
+        self.variances = np.full(shape, self.var_init, np.float32)
+        self.weights = np.zeros(shape, np.float32)
+        self.weights[0] = 1.0
+        self.frames = 1
+
+    def apply(self, gray):
+        if self.means is None or self.means.shape[1:] != gray.shape:
+            self._reset(gray)
+            return np.zeros(gray.shape, np.uint8)
+
+        self.frames += 1
+        alpha = np.float32(1.0 / min(self.frames, self.history))
+        x = gray.astype(np.float32)
+        diff = x - self.means                                   # (K, H, W)
+        dist2 = diff * diff
+
+        # Componente casada: a de menor distância normalizada entre as dentro do limiar.
+        # K é pequeno: laços sobre as componentes com operações (H, W) contíguas são
+        # bem mais rápidos que argmin/take_along_axis ao longo do eixo 0
+        normalized = dist2 / self.variances
+        normalized[self.weights <= 0] = np.inf
+        best = np.zeros(gray.shape, np.intp)
+        best_distance = normalized[0].copy()
+        for k in range(1, self.n_components):
+            closer = normalized[k] < best_distance
+            best[closer] = k
+            np.minimum(best_distance, normalized[k], out=best_distance)
+        matched = best_distance < self.var_threshold
+        owner = np.stack([(best == k) & matched for k in range(self.n_components)])
+
+        # Fundo: a componente casada está entre as mais pesadas que somam background_ratio,
+        # isto é, o peso das componentes mais pesadas que ela ainda não chega ao limiar
+        best_weight = np.zeros(gray.shape, np.float32)
+        heavier = np.zeros(gray.shape, np.float32)
+        for k in range(self.n_components):
+            best_weight += self.weights[k] * owner[k]
+        for k in range(self.n_components):
+            heavier += self.weights[k] * (self.weights[k] > best_weight)
+        background = matched & (heavier < self.background_ratio)
+
+        # Atualização densa: pesos de todas as componentes; média e variância só da casada
+        self.weights *= 1 - alpha
+        self.weights += alpha * owner
+        rho = np.maximum(self.weights, alpha)
+        np.divide(alpha, rho, out=rho)
+        rho *= owner
+        self.means += rho * diff
+        dist2 -= self.variances
+        dist2 *= rho
+        self.variances += dist2
+        np.clip(self.variances, self.var_min, self.var_max, out=self.variances)
+
+        # Sem casamento: a componente mais fraca do pixel vira uma nova gaussiana no valor atual
+        if not matched.all():
+            weakest = np.zeros(gray.shape, np.intp)
+            lightest = self.weights[0].copy()
+            for k in range(1, self.n_components):
+                weakest[self.weights[k] < lightest] = k
+                np.minimum(lightest, self.weights[k], out=lightest)
+            replace = np.stack([(weakest == k) & ~matched for k in range(self.n_components)])
+            np.copyto(self.means, x, where=replace)
+            self.variances[replace] = self.var_init
+            self.weights[replace] = alpha
+            self.weights /= self.weights.sum(axis=0)
+
+        return (~background).view(np.uint8) * np.uint8(255)
+
+    def state_arrays(self):
+        """Arrays que definem o estado do modelo ({nome: array}); vazio antes do primeiro frame."""
+        if self.means is None:
+            return {}
+        return {"means": self.means, "variances": self.variances, "weights": self.weights}
+
+    def load_state(self, arrays, frames):
+        """Restaura o estado salvo por `state_arrays` após `frames` frames (arrays copiados para a memória)."""
+        self.means = np.array(arrays["means"], np.float32)
+        self.variances = np.array(arrays["variances"], np.float32)
+        self.weights = np.array(arrays["weights"], np.float32)
+        self.frames = frames
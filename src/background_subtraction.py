@@ -2,177 +2,914 @@ import cv2
 import numpy as np
 import os
 import time
-import matplotlib.pyplot as plt
+import hashlib
+
+from writer_pool import AsyncWriterPool, encode_and_write
+from frame_source import FrameSource, open_frame_source, open_live_source
+from background_models import BACKGROUND_MODELS, create_background_model
+from checkpoint import CHECKPOINT_DIR, load_manifest, restore_checkpoint, save_checkpoint
+from mask_store import MaskStore, MaskStoreWriter
+from profiler import FrameProfiler, print_profile
+from roi import ROI_PATH, RegionOfInterest, as_region_of_interest
+from tracker import MultiObjectTracker, track_color
+from video_output import COMPOSITE_FILE, VIDEO_OUTPUTS, VideoOutputStage
+from postprocessing import PostProcessor, apply_morphology, apply_filter, remove_small_regions, filter_regions
 
 # Diretórios
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 VIDEO_PATH = os.path.join(BASE_DIR, '../data/raw/reconstructed_video.mp4')
 
 RAW_FRAMES_DIR = os.path.join(BASE_DIR, '../data/raw/frames')
-MASKS_DIR = os.path.join(BASE_DIR, '../data/processed/reconstructed_video/masks')
-TRACKED_DIR = os.path.join(BASE_DIR, '../data/processed/reconstructed_video/tracked')
+OUTPUT_DIR = os.path.join(BASE_DIR, '../data/processed/reconstructed_video')
+MASKS_DIR = os.path.join(OUTPUT_DIR, 'masks')
+TRACKED_DIR = os.path.join(OUTPUT_DIR, 'tracked')
 DEBUG_DIR = os.path.join(BASE_DIR, '../data/debug')
 LOG_FILE = os.path.join(DEBUG_DIR, "debug_log.txt")
-GRAY_DIR = os.path.join(BASE_DIR, '../data/processed/reconstructed_video/gray_frames')
-FILTERED_DIR = os.path.join(BASE_DIR, '../data/processed/reconstructed_video/filtered_frames')
-
-# Criar diretórios se não existirem
-os.makedirs(RAW_FRAMES_DIR, exist_ok=True)
-os.makedirs(MASKS_DIR, exist_ok=True)
-os.makedirs(TRACKED_DIR, exist_ok=True)
-os.makedirs(DEBUG_DIR, exist_ok=True)
-os.makedirs(GRAY_DIR, exist_ok=True)
-os.makedirs(FILTERED_DIR, exist_ok=True)
-
-# Verificar se a pasta DEBUG foi criada
-if not os.path.exists(DEBUG_DIR):
-    print("❌ ERRO: A pasta DEBUG_DIR não foi criada corretamente!")
-
-# Inicializar o Background Subtractor (MOG2)
-fgbg = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=40, detectShadows=False)
-
-cap = cv2.VideoCapture(VIDEO_PATH)
-frame_num = 0
-start_time = time.time()
-
-video_original = cv2.VideoWriter(os.path.join(BASE_DIR, '../data/processed/reconstructed_video/original.avi'),
-                                 cv2.VideoWriter_fourcc(*'XVID'), 20, 
-                                 (int(cap.get(3)), int(cap.get(4))))
-
-video_tracking = cv2.VideoWriter(os.path.join(BASE_DIR, '../data/processed/reconstructed_video/tracking.avi'),
-                                 cv2.VideoWriter_fourcc(*'XVID'), 20, 
-                                 (int(cap.get(3)), int(cap.get(4))))
-
-video_filtered = cv2.VideoWriter(os.path.join(BASE_DIR, '../data/processed/reconstructed_video/filtered.avi'),
-                                 cv2.VideoWriter_fourcc(*'XVID'), 20, 
-                                 (int(cap.get(3)), int(cap.get(4))))
-
-video_mog2 = cv2.VideoWriter(os.path.join(BASE_DIR, '../data/processed/reconstructed_video/mog2.avi'),
-                             cv2.VideoWriter_fourcc(*'XVID'), 20, 
-                             (int(cap.get(3)), int(cap.get(4))))
-
-# Função de melhorias na segmentação
-def apply_morphology(mask, kernel_size=5):
-    kernel = np.ones((kernel_size, kernel_size), np.uint8)
-    mask_closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)  # Preenche buracos
-    mask_opened = cv2.morphologyEx(mask_closed, cv2.MORPH_OPEN, kernel)  # Remove pequenos ruídos
-    return mask_opened
-
-def apply_filter(mask, method='median', kernel_size=5):
-    if method == 'median':
-        return cv2.medianBlur(mask, kernel_size)
-    elif method == 'gaussian':
-        return cv2.GaussianBlur(mask, (kernel_size, kernel_size), 0)
-    return mask
-
-def remove_small_regions(mask, min_size=500):
-    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
-    mask_filtered = np.zeros_like(mask)
-    for i in range(1, num_labels):
-        if stats[i, cv2.CC_STAT_AREA] >= min_size:
-            mask_filtered[labels == i] = 255
-    return mask_filtered
-
-# Criar log de depuração
-with open(LOG_FILE, "w") as log_file:
-    log_file.write("Frame, Pixels Ativos (Antes), Pixels Ativos (Depois)\n")
-
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame_num += 1
-    print(f"📌 Processando frame {frame_num}...")
-
-    # Converter para tons de cinza
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(os.path.join(GRAY_DIR, f"gray_{frame_num:04d}.png"), gray)
-
-    # Aplicar subtração de fundo (MOG2)
-    fgmask = fgbg.apply(gray)
-
-    cv2.imwrite(os.path.join(FILTERED_DIR, f"mog2_{frame_num:04d}.png"), fgmask)
-
-    # Contagem de pixels ativos antes das melhorias
-    pixels_antes = np.sum(fgmask > 0)
-
-    # Aplicar melhorias
-    fgmask = cv2.medianBlur(fgmask, 5)
-    kernel = np.ones((5, 5), np.uint8)
-    fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, kernel)
-    fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_CLOSE, kernel)
-
-    fgmask = apply_morphology(fgmask)
-    fgmask = apply_filter(fgmask, method='median')
-    fgmask = remove_small_regions(fgmask)
-
-    # Contagem de pixels ativos depois das melhorias
-    pixels_depois = np.sum(fgmask > 0)
-
-    # Salvar informações no log
-    with open(LOG_FILE, "a") as log_file:
-        log_file.write(f"{frame_num}, {pixels_antes}, {pixels_depois}\n")
-
-    # Salvar máscara final
-    mask_filename = os.path.join(MASKS_DIR, f"mask_{frame_num:04d}.png")
-    saved_mask = cv2.imwrite(mask_filename, fgmask)
-
-    # Salvar debug das máscaras intermediárias
-    debug_filename = os.path.join(DEBUG_DIR, f"mask_before_{frame_num:04d}.png")
-    saved_debug = cv2.imwrite(debug_filename, fgmask)
-
-    # Teste: salvar a máscara em outro diretório
-    test_filename = os.path.join(MASKS_DIR, f"test_mask_{frame_num:04d}.png")
-    saved_test = cv2.imwrite(test_filename, fgmask)
-
-    # Aplicar rastreamento de objetos
-    contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    tracked_frame = frame.copy()
-
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-        if w * h > 300:  # Evitar falsos positivos
-            cv2.rectangle(tracked_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-    # Salvar rastreamento
-    tracked_filename = os.path.join(TRACKED_DIR, f"tracked_{frame_num}.png")
-    saved_tracked = cv2.imwrite(tracked_filename, tracked_frame)
-
-    # Salvar imagem de depuração do rastreamento
-    debug_tracked_filename = os.path.join(DEBUG_DIR, f"tracked_debug_{frame_num}.png")
-    saved_debug_tracked = cv2.imwrite(debug_tracked_filename, tracked_frame)
-
-    # Criar uma cópia do frame filtrado antes de exibir
-    filtered = fgmask.copy()
-
-    # Exibir os diferentes estágios do processamento
-    cv2.imshow("Frame Original", frame)
-    cv2.imshow("Escala de Cinza", gray)
-    cv2.imshow("Filtro Bruto", filtered)
-    cv2.imshow("Máscara MOG2", fgmask)
-
-    # Pressionar 'q' para sair
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-
-    video_original.write(frame)
-    video_tracking.write(tracked_frame)
-    video_filtered.write(cv2.cvtColor(fgmask, cv2.COLOR_GRAY2BGR))
-    video_mog2.write(cv2.cvtColor(fgmask, cv2.COLOR_GRAY2BGR))
-
-cap.release()
-video_original.release()
-video_tracking.release()
-video_filtered.release()
-video_mog2.release()
-cv2.destroyAllWindows()
-
-elapsed_time = time.time() - start_time
-print(f"\n⏳ Processamento concluído! Tempo total: {elapsed_time:.2f} segundos.")
-print(f"📂 Máscaras salvas em: {MASKS_DIR}")
-print(f"📂 Rastreamento salvo em: {TRACKED_DIR}")
-print(f"📂 Filtros brutos salvos em: {FILTERED_DIR}")
-print(f"📂 Escala de cinza salva em: {GRAY_DIR}")
-print(f"📂 Vídeos gerados em: {os.path.join(BASE_DIR, '../data/processed/reconstructed_video/')}")
+GRAY_DIR = os.path.join(OUTPUT_DIR, 'gray_frames')
+FILTERED_DIR = os.path.join(OUTPUT_DIR, 'filtered_frames')
+
+# Saídas que o pipeline sabe produzir
+ALL_OUTPUTS = (
+    "gray",             # gray_frames/gray_XXXX.png
+    "mog2",             # filtered_frames/mog2_XXXX.png (máscara bruta do MOG2)
+    "mask",             # masks/mask_XXXX.png (máscara final)
+    "mask_store",       # masks.bsm (máscaras finais empacotadas em bits, ver mask_store.py)
+    "test_mask",        # masks/test_mask_XXXX.png
+    "debug_mask",       # debug/mask_before_XXXX.png
+    "tracked",          # tracked/tracked_X.png
+    "debug_tracked",    # debug/tracked_debug_X.png
+    "video_original",   # original.avi
+    "video_tracking",   # tracking.avi
+    "video_filtered",   # filtered.avi
+    "video_mog2",       # mog2.avi
+    "display",          # janelas do cv2.imshow
+    "log",              # debug/debug_log.txt
+    "trajectories",     # trajectories.npy (trilhas do rastreador, ver tracker.py)
+)
+
+# Políticas de saída prontas. Toda saída é opcional: o que não estiver na política
+# não é codificado nem gravado.
+OUTPUT_PRESETS = {
+    # comportamento do script original (tudo + janelas; sem o rastreador, que muda o desenho das caixas)
+    "legacy": tuple(output for output in ALL_OUTPUTS if output != "trajectories"),
+    "default": ("mask", "log"),     # apenas o necessário para ground truth/avaliação
+    "none": (),                     # produção headless: só a máscara em memória
+}
+
+# Saídas que precisam do frame colorido (sem elas, os frames são lidos já em cinza)
+COLOR_OUTPUTS = {"tracked", "debug_tracked", "video_original", "video_tracking", "display"}
+
+# Saídas que são apenas cópias de outra saída (mesmo conteúdo, outro caminho)
+OUTPUT_COPIES = {
+    "mask": ("test_mask", "debug_mask"),
+    "tracked": ("debug_tracked",),
+}
+
+class BackgroundSubtractionPipeline:
+    """Pipeline de subtração de fundo (modelo de fundo + pós-processamento + rastreamento).
+
+    `process(frame)` devolve a máscara final de um frame; `run(video_path)` percorre
+    um vídeo inteiro e grava as saídas escolhidas em `outputs`.
+    """
+
+    def __init__(self, history=100, var_threshold=40, detect_shadows=False, model="mog2", model_params=None,
+                 postprocessing="fused", stages=None, outputs=OUTPUT_PRESETS["default"], output_dir=OUTPUT_DIR,
+                 debug_dir=DEBUG_DIR, min_box_area=300, fps=20, headless=False,
+                 writer_workers=4, max_pending_writes=64, prefetch=8, roi=None, counter=None, scale=1.0,
+                 profile=False, tracker=None, live_fps=None, latency_budget=None, video_composite=False,
+                 video_process=True, direct_grayscale=False, checkpoint_dir=None, checkpoint_every=0,
+                 resume=False, verbose=True):
+        if isinstance(outputs, str):
+            outputs = OUTPUT_PRESETS[outputs]
+        unknown = set(outputs) - set(ALL_OUTPUTS)
+        if unknown:
+            raise ValueError(f"Saídas desconhecidas: {sorted(unknown)}")
+
+        # Modelo de fundo do registro (background_models); history/var_threshold/detect_shadows
+        # são os parâmetros do MOG2 (history/var_threshold também os do gmm) e `model_params`
+        # sobrescreve/complementa os de qualquer modelo
+        params = {}
+        if model == "mog2":
+            params = {"history": history, "var_threshold": var_threshold, "detect_shadows": detect_shadows}
+        elif model == "gmm":
+            params = {"history": history, "var_threshold": var_threshold}
+        params.update(model_params or {})
+        self.model = model
+        self.model_params = params
+        self.fgbg = create_background_model(model, **params)
+
+        # Checkpoints do estado do modelo de fundo (só modelos `checkpointable`, ex.: gmm): gravados
+        # em `checkpoint_dir` a cada `checkpoint_every` frames e ao final; com `resume`, a execução
+        # continua do último checkpoint e só os frames seguintes a ele são processados
+        if checkpoint_dir is None and (checkpoint_every or resume):
+            checkpoint_dir = CHECKPOINT_DIR
+        if checkpoint_dir is not None and not getattr(self.fgbg, "checkpointable", False):
+            raise ValueError(f"O modelo {model} não tem estado salvável; use --model gmm para checkpoints")
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        # Escala de processamento: os frames são reduzidos uma vez na entrada e kernels/áreas
+        # do pós-processamento são ajustados; as máscaras só voltam ao tamanho original quando usadas
+        if not 0 < scale <= 1:
+            raise ValueError("scale deve estar em (0, 1]")
+        self.scale = scale
+        self._frame_shape = None
+        self._processing_shape = None
+
+        # Estágios após o MOG2: pós-processamento declarativo ou lista explícita de (nome, função)
+        self.postprocessor = None
+        if stages is None:
+            self.postprocessor = PostProcessor(postprocessing, scale=scale)
+            stages = self.postprocessor.stages()
+        self.stages = list(stages)
+        self.outputs = set(outputs)
+        if headless:
+            # Modo headless: nenhuma janela e nenhum cv2.waitKey por frame
+            self.outputs.discard("display")
+        self.output_dir = output_dir
+        self.debug_dir = debug_dir
+        self.min_box_area = min_box_area
+        self.fps = fps
+        self.verbose = verbose
+
+        # Região de interesse (caminho .mat, máscara ou RegionOfInterest): o modelo e o
+        # pós-processamento rodam só no recorte do ROI, com a máscara zerada fora dele
+        self.roi = as_region_of_interest(roi)
+        self._processing_roi = self.roi
+
+        # Estágio opcional de contagem de pessoas (crowd_count.CrowdCounter), dentro do loop
+        self.counter = counter
+
+        # Rastreador de múltiplos objetos (tracker.MultiObjectTracker): identidades persistentes
+        # entre frames a partir das estatísticas do remove_small_regions; a saída "trajectories" cria um
+        # rastreador padrão quando nenhum foi passado
+        if tracker is None and "trajectories" in self.outputs:
+            tracker = MultiObjectTracker(min_area=min_box_area)
+        self.tracker = tracker
+
+        # Escritas assíncronas: 0 workers grava de forma síncrona na thread principal
+        self.writer_workers = writer_workers
+        self.max_pending_writes = max_pending_writes
+        self._writer = None
+
+        # Vídeos: um fluxo codificado por conteúdo distinto, em um processo separado
+        # (`video_process`); `video_composite` junta todos lado a lado em composite.avi
+        self.video_composite = video_composite
+        self.video_process = video_process
+
+        # Frames decodificados à frente do loop de segmentação (0 desliga)
+        self.prefetch = prefetch
+        # Decodificação dos JPEGs direto em cinza (mais rápida, mas muda alguns pixels; ver frame_source)
+        self.direct_grayscale = direct_grayscale
+
+        # Tempo real: `live_fps` reproduz a fonte no ritmo do relógio, entregando sempre o frame
+        # mais novo (frames atrasados são descartados); com `latency_budget` (s, padrão 1/live_fps),
+        # frames cuja máscara sai depois do orçamento pulam as etapas opcionais
+        self.live_fps = live_fps
+        if latency_budget is None and live_fps:
+            latency_budget = 1.0 / live_fps
+        self.latency_budget = latency_budget
+
+        # Tempo acumulado (segundos) por estágio, para profiling
+        self.stage_times = {"decode": 0.0, "gray": 0.0, "model": 0.0}
+        if self.scale != 1:
+            self.stage_times["resize"] = 0.0
+        if self.roi is not None:
+            self.stage_times["roi"] = 0.0
+        for name, _ in self.stages:
+            self.stage_times[name] = 0.0
+        self.stage_times["tracking"] = 0.0
+        if self.counter is not None:
+            self.stage_times["count"] = 0.0
+        if self.checkpoint_dir is not None:
+            self.stage_times["checkpoint"] = 0.0
+
+        # Perfil por frame (profiler.FrameProfiler), criado a cada run() com `profile=True`
+        self.profile = profile
+        self.profiler = None
+
+        # Resultados intermediários do último frame processado
+        self.last_gray = None
+        self.last_raw_mask = None
+        self.pixels_before = 0
+        self.pixels_after = 0
+
+    def _record(self, name, seconds):
+        """Soma o tempo de um estágio ao total da execução e ao registro do frame atual."""
+        self.stage_times[name] += seconds
+        if self.profiler is not None:
+            self.profiler.add_time(name, seconds)
+
+    def config(self):
+        """Parâmetros que determinam as saídas do pipeline (chave do cache de etapas)."""
+        if self.postprocessor is not None:
+            operations = [list(operation) for operation in self.postprocessor.operations]
+        else:
+            operations = [name for name, _ in self.stages]
+        return {
+            "model": self.model,
+            "model_params": self.model_params,
+            "operations": operations,
+            "outputs": sorted(self.outputs),
+            "min_box_area": self.min_box_area,
+            "fps": self.fps,
+            "scale": self.scale,
+            "direct_grayscale": self.direct_grayscale,
+            "roi": hashlib.sha256(self.roi.mask.tobytes()).hexdigest() if self.roi is not None else None,
+            "tracker": ({"min_area": self.tracker.min_area, "max_distance": self.tracker.max_distance,
+                         "max_misses": self.tracker.max_misses, "min_hits": self.tracker.min_hits,
+                         "velocity_smoothing": self.tracker.velocity_smoothing}
+                        if self.tracker is not None else None),
+        }
+
+    def output_paths(self):
+        """Arquivos e diretórios escritos pelas saídas habilitadas ({nome: caminho})."""
+        paths = {
+            "gray": os.path.join(self.output_dir, 'gray_frames'),
+            "mog2": os.path.join(self.output_dir, 'filtered_frames'),
+            "mask": os.path.join(self.output_dir, 'masks'),
+            "test_mask": os.path.join(self.output_dir, 'masks'),
+            "mask_store": os.path.join(self.output_dir, 'masks.bsm'),
+            "tracked": os.path.join(self.output_dir, 'tracked'),
+            "debug_mask": self.debug_dir,
+            "debug_tracked": self.debug_dir,
+            "log": os.path.join(self.debug_dir, "debug_log.txt"),
+            "trajectories": os.path.join(self.output_dir, "trajectories.npy"),
+        }
+        for output, (filename, _) in VIDEO_OUTPUTS.items():
+            filename = COMPOSITE_FILE if self.video_composite else filename
+            paths[output] = os.path.join(self.output_dir, filename)
+        selected = {}
+        for output in ALL_OUTPUTS:
+            if output in self.outputs and output in paths and paths[output] not in selected.values():
+                selected[output] = paths[output]
+        # O log já está dentro do diretório de depuração quando ele inteiro é guardado
+        if self.debug_dir in selected.values():
+            selected.pop("log", None)
+        return selected
+
+    def _set_frame_shape(self, shape):
+        """Calcula o tamanho de processamento (e o ROI reduzido) para frames de `shape`."""
+        self._frame_shape = shape
+        height, width = shape
+        self._processing_shape = (max(1, int(round(height * self.scale))), max(1, int(round(width * self.scale))))
+        if self.roi is not None and self.scale != 1:
+            size = self._processing_shape[::-1]
+            self._processing_roi = RegionOfInterest(cv2.resize(self.roi.mask, size, interpolation=cv2.INTER_NEAREST))
+
+    def _ingest(self, frame):
+        """Frame em tons de cinza e a imagem efetivamente processada (reduzida e recortada)."""
+        t0 = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        t1 = time.perf_counter()
+        self._record("gray", t1 - t0)
+
+        if gray.shape != self._frame_shape:
+            self._set_frame_shape(gray.shape)
+        small = gray
+        if self.scale != 1:
+            small = cv2.resize(gray, self._processing_shape[::-1], interpolation=cv2.INTER_AREA)
+            self._record("resize", time.perf_counter() - t1)
+        if self._processing_roi is not None:
+            small = self._processing_roi.crop(small)
+        return gray, small
+
+    def process(self, frame):
+        """Processa um frame (BGR ou tons de cinza) e devolve a máscara final.
+
+        A máscara está na resolução de processamento (ver `scale`); `upsample`
+        a leva ao tamanho do frame.
+        """
+        gray, small = self._ingest(frame)
+
+        t1 = time.perf_counter()
+        fgmask = self.fgbg.apply(small)
+        t0 = time.perf_counter()
+        self._record("model", t0 - t1)
+
+        roi = self._processing_roi
+        if roi is not None:
+            fgmask = roi.apply(fgmask)
+            t1 = time.perf_counter()
+            self._record("roi", t1 - t0)
+            t0 = t1
+
+        self.last_gray = gray
+        self.last_raw_mask = fgmask
+        self.pixels_before = int(np.count_nonzero(fgmask))
+
+        if self.postprocessor is not None:
+            self.postprocessor.regions = None
+        for name, stage in self.stages:
+            fgmask = stage(fgmask)
+            t1 = time.perf_counter()
+            self._record(name, t1 - t0)
+            t0 = t1
+
+        self.pixels_after = int(np.count_nonzero(fgmask))
+        if self.scale != 1:
+            # Contagens de pixels equivalentes no tamanho original, para o log
+            self.pixels_before = int(round(self.pixels_before / self.scale ** 2))
+            self.pixels_after = int(round(self.pixels_after / self.scale ** 2))
+
+        if roi is not None:
+            # Saídas, avaliação e rastreamento recebem máscaras do tamanho do frame (reduzido)
+            fgmask = roi.paste(fgmask)
+            self.last_raw_mask = roi.paste(self.last_raw_mask)
+            self._record("roi", time.perf_counter() - t0)
+        return fgmask
+
+    def upsample(self, mask):
+        """Máscara no tamanho original do frame (a própria máscara quando scale == 1)."""
+        if mask.shape == self._frame_shape:
+            return mask
+        return cv2.resize(mask, self._frame_shape[::-1], interpolation=cv2.INTER_NEAREST)
+
+    def regions(self, mask):
+        """Estatísticas (x, y, w, h, área) e centróides dos objetos da máscara final.
+
+        Reaproveita o resultado do remove_small_regions do frame atual; só rotula
+        a máscara de novo quando o pós-processamento não terminou nele. As
+        estatísticas são sempre devolvidas nas coordenadas do frame original.
+        """
+        regions = self.postprocessor.final_regions() if self.postprocessor is not None else None
+        offset = (0, 0)
+        if regions is None:
+            _, stats, centroids = filter_regions(mask, min_size=0)
+            if mask.shape == self._frame_shape:
+                return stats, centroids
+        else:
+            stats, centroids = regions
+            if self._processing_roi is not None:
+                # Estatísticas calculadas no recorte do ROI
+                offset = (self._processing_roi.x0, self._processing_roi.y0)
+
+        if offset == (0, 0) and self._processing_shape == self._frame_shape:
+            return stats, centroids
+
+        fy = self._frame_shape[0] / self._processing_shape[0]
+        fx = self._frame_shape[1] / self._processing_shape[1]
+        scaled = stats.astype(np.float64)
+        scaled[:, cv2.CC_STAT_LEFT] += offset[0]
+        scaled[:, cv2.CC_STAT_TOP] += offset[1]
+        scaled[:, [cv2.CC_STAT_LEFT, cv2.CC_STAT_WIDTH]] *= fx
+        scaled[:, [cv2.CC_STAT_TOP, cv2.CC_STAT_HEIGHT]] *= fy
+        scaled[:, cv2.CC_STAT_AREA] *= fx * fy
+        centroids = (centroids + offset) * (fx, fy)
+        return np.rint(scaled).astype(stats.dtype), centroids
+
+    def boxes(self, mask):
+        """Caixas delimitadoras (x, y, w, h) dos objetos com w*h > min_box_area."""
+        stats, _ = self.regions(mask)
+        boxes = stats[:, :4]
+        return boxes[boxes[:, 2] * boxes[:, 3] > self.min_box_area]  # Evitar falsos positivos
+
+    def update_tracks(self, frame_num, mask):
+        """Atualiza o rastreador com os objetos da máscara; devolve (ids, caixas) das trilhas visíveis."""
+        t0 = time.perf_counter()
+        tracks = self.tracker.update(frame_num, self.regions(mask))
+        self._record("tracking", time.perf_counter() - t0)
+        return tracks
+
+    def track(self, frame, mask, tracks=None):
+        """Desenha as caixas delimitadoras dos objetos da máscara sobre uma cópia do frame.
+
+        Com `tracks` (ids, caixas) do rastreador, cada trilha é desenhada com sua cor e seu id.
+        """
+        t0 = time.perf_counter()
+        tracked_frame = frame.copy()
+
+        if tracks is None:
+            for x, y, w, h in self.boxes(mask):
+                cv2.rectangle(tracked_frame, (int(x), int(y)), (int(x + w), int(y + h)), (0, 255, 0), 2)
+        else:
+            for track_id, (x, y, w, h) in zip(*tracks):
+                color = track_color(track_id)
+                cv2.rectangle(tracked_frame, (int(x), int(y)), (int(x + w), int(y + h)), color, 2)
+                cv2.putText(tracked_frame, str(track_id), (int(x), max(int(y) - 4, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+
+        self._record("tracking", time.perf_counter() - t0)
+        return tracked_frame
+
+    def _image_paths(self, output, frame_num):
+        """Caminhos de destino de uma saída de imagem (incluindo as cópias habilitadas)."""
+        paths = {
+            "gray": os.path.join(self.output_dir, 'gray_frames', f"gray_{frame_num:04d}.png"),
+            "mog2": os.path.join(self.output_dir, 'filtered_frames', f"mog2_{frame_num:04d}.png"),
+            "mask": os.path.join(self.output_dir, 'masks', f"mask_{frame_num:04d}.png"),
+            "test_mask": os.path.join(self.output_dir, 'masks', f"test_mask_{frame_num:04d}.png"),
+            "debug_mask": os.path.join(self.debug_dir, f"mask_before_{frame_num:04d}.png"),
+            "tracked": os.path.join(self.output_dir, 'tracked', f"tracked_{frame_num}.png"),
+            "debug_tracked": os.path.join(self.debug_dir, f"tracked_debug_{frame_num}.png"),
+        }
+        names = (output,) + OUTPUT_COPIES.get(output, ())
+        return [paths[name] for name in names if name in self.outputs]
+
+    def _save_image(self, output, frame_num, image):
+        """Codifica a imagem em PNG uma única vez e grava o resultado em todos os destinos."""
+        paths = self._image_paths(output, frame_num)
+        if not paths:
+            return
+        t0 = time.perf_counter()
+        if self._writer is not None:
+            self._writer.write_image(paths, image, description=f"{output} frame {frame_num}")
+        else:
+            encode_and_write(paths, image)
+        self._record(f"write_{output}", time.perf_counter() - t0)
+
+    def _open_video_output(self, size):
+        """Estágio de vídeo (video_output.VideoOutputStage) das saídas de vídeo habilitadas, ou None."""
+        if not self.outputs & set(VIDEO_OUTPUTS):
+            return None
+        return VideoOutputStage(self.output_dir, self.outputs, size, self.fps, composite=self.video_composite,
+                                separate_process=self.video_process)
+
+    def _make_dirs(self):
+        dirs = {
+            "gray": [os.path.join(self.output_dir, 'gray_frames')],
+            "mog2": [os.path.join(self.output_dir, 'filtered_frames')],
+            "mask": [os.path.join(self.output_dir, 'masks')],
+            "test_mask": [os.path.join(self.output_dir, 'masks')],
+            "tracked": [os.path.join(self.output_dir, 'tracked')],
+            "debug_mask": [self.debug_dir],
+            "debug_tracked": [self.debug_dir],
+            "log": [self.debug_dir],
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        for output, paths in dirs.items():
+            if output in self.outputs:
+                for path in paths:
+                    os.makedirs(path, exist_ok=True)
+
+    def open_source(self, source=RAW_FRAMES_DIR, **kwargs):
+        """Abre a fonte de frames, lendo direto em cinza quando nenhuma saída precisa de cor."""
+        if isinstance(source, FrameSource):
+            return source
+        grayscale = not (self.outputs & COLOR_OUTPUTS)
+        if self.live_fps:
+            return open_live_source(source, self.live_fps, grayscale=grayscale,
+                                    direct_grayscale=self.direct_grayscale, **kwargs)
+        return open_frame_source(source, grayscale=grayscale, prefetch=self.prefetch,
+                                 direct_grayscale=self.direct_grayscale, **kwargs)
+
+    def warm_up(self, frame):
+        """Atualiza apenas o modelo de fundo com um frame (sem pós-processamento nem saídas)."""
+        self.fgbg.apply(self._ingest(frame)[1])
+
+    def run(self, source=RAW_FRAMES_DIR, max_frames=None, start=0, warmup=0, on_mask=None):
+        """Processa os frames de `source` (diretório de frames, vídeo ou FrameSource).
+
+        Processa até `max_frames` frames a partir do frame `start` (0 = início) e grava
+        as saídas habilitadas. Os `warmup` frames anteriores a `start` só alimentam o
+        modelo de fundo. `on_mask(frame_num, mask)` é chamado para cada máscara final.
+        """
+        self._make_dirs()
+
+        # Retomada: começa logo após o frame do último checkpoint; se `start` estiver mais
+        # adiante, os frames entre os dois só atualizam o modelo (aquecimento)
+        resumed_from = None
+        if self.checkpoint_dir is not None and self.resume:
+            manifest = load_manifest(self.checkpoint_dir)
+            if manifest is not None:
+                resumed_from = manifest["frame"]
+                warmup = max(start - resumed_from, 0)
+                start = max(start, resumed_from)
+
+        warmup = min(warmup, start)
+        stop = start + max_frames if max_frames is not None else None
+        if isinstance(source, FrameSource):
+            frames = source
+        else:
+            frames = self.open_source(source, start=start - warmup, stop=stop)
+        if self.roi is not None and frames.frame_size != self.roi.shape[::-1]:
+            frames.close()
+            raise ValueError(f"ROI {self.roi.shape[::-1]} não corresponde aos frames {frames.frame_size}")
+        checkpoint_meta = None
+        if self.checkpoint_dir is not None:
+            checkpoint_meta = {"frame_size": list(frames.frame_size), "scale": self.scale,
+                               "roi": self.config()["roi"]}
+            if resumed_from is not None:
+                try:
+                    restore_checkpoint(self.checkpoint_dir, self.fgbg, checkpoint_meta)
+                except ValueError:
+                    frames.close()
+                    raise
+                if self.verbose:
+                    print(f"♻️ Retomando do checkpoint do frame {resumed_from}")
+        checkpoints_saved = 0
+        last_checkpoint = resumed_from
+        last_frame = None
+        video = mask_store = None
+        frame_stats = []
+        write_stats = video_stats = None
+        try:
+            video = self._open_video_output(frames.frame_size)
+            if "mask_store" in self.outputs:
+                width, height = frames.frame_size
+                store_path = os.path.join(self.output_dir, "masks.bsm")
+                # Retomada: as máscaras já gravadas até o checkpoint são copiadas para o novo store
+                previous_store = None
+                if resumed_from is not None and os.path.exists(store_path):
+                    previous_store = MaskStore(store_path)
+                    if previous_store.shape != (height, width):
+                        previous_store.close()
+                        raise ValueError(f"{store_path} tem máscaras {previous_store.shape}, "
+                                         f"diferentes dos frames {(height, width)}")
+                mask_store = MaskStoreWriter(store_path, (height, width))
+                if previous_store is not None:
+                    with previous_store:
+                        for frame_num, packed in zip(previous_store.frame_numbers, previous_store.data):
+                            if frame_num <= resumed_from:
+                                mask_store.append_packed(frame_num, packed)
+            if self.writer_workers:
+                self._writer = AsyncWriterPool(self.writer_workers, self.max_pending_writes)
+            needs_tracking = bool(self.outputs & {"tracked", "debug_tracked", "video_tracking"})
+            needs_full_mask = (on_mask is not None or self.counter is not None
+                               or bool(self.outputs & {"mask", "test_mask", "debug_mask", "mask_store", "display",
+                                                       "video_filtered", "video_mog2"}))
+
+            # Escritas cronometradas (na thread do loop: codificação síncrona ou envio para o pool)
+            # (uma cópia, como test_mask ou debug_tracked, é gravada e cronometrada pela saída principal)
+            for output in ("gray", "mog2", "mask", "mask_store", "tracked"):
+                if self.outputs & {output, *OUTPUT_COPIES.get(output, ())}:
+                    self.stage_times.setdefault(f"write_{output}", 0.0)
+            if video is not None:
+                self.stage_times.setdefault("write_video", 0.0)
+            self.profiler = None
+            if self.profile:
+                counters = ("pixels_before", "pixels_after", "blobs") + (("tracks",) if self.tracker is not None else ())
+                self.profiler = FrameProfiler(self.stage_times, counters=counters)
+
+            # Tempo real: (frame, latência até a máscara, latência até o fim do frame, etapas opcionais puladas)
+            latencies = []
+            processed = warmed = 0
+            warmup_time = 0.0
+            start_time = time.time()
+
+            next_frame_time = time.perf_counter()
+            for frame_num, frame in frames:
+                # Tempo esperando o próximo frame (decodificação ou buffer de leitura antecipada)
+                received = time.perf_counter()
+                decode_time = received - next_frame_time
+                # Instante de captura (fontes ao vivo) para a latência de ponta a ponta
+                captured = getattr(frames, "last_capture_time", None) or received
+                if resumed_from is not None and frame_num <= resumed_from:
+                    # Já incorporado ao checkpoint (fontes abertas fora do pipeline começam do início)
+                    next_frame_time = time.perf_counter()
+                    continue
+                if frame_num <= start:
+                    t0 = time.perf_counter()
+                    self.warm_up(frame)
+                    warmup_time += time.perf_counter() - t0
+                    warmed += 1
+                    next_frame_time = time.perf_counter()
+                    continue
+
+                if self.profiler is not None:
+                    self.profiler.begin_frame(frame_num)
+                self._record("decode", decode_time)
+                processed += 1
+                if self.verbose:
+                    print(f"📌 Processando frame {frame_num}...")
+
+                fgmask = self.process(frame)
+                gray = self.last_gray
+                if needs_full_mask:
+                    # Em escala reduzida, a máscara só volta ao tamanho do frame se for usada
+                    fgmask = self.upsample(fgmask)
+
+                frame_stats.append((frame_num, self.pixels_before, self.pixels_after))
+                if self.profiler is not None:
+                    self.profiler.set_counter("pixels_before", self.pixels_before)
+                    self.profiler.set_counter("pixels_after", self.pixels_after)
+                    self.profiler.set_counter("blobs", len(self.regions(fgmask)[0]))
+                if on_mask is not None:
+                    on_mask(frame_num, fgmask)
+
+                last_frame = frame_num
+                if self.checkpoint_every and processed % self.checkpoint_every == 0:
+                    t0 = time.perf_counter()
+                    save_checkpoint(self.checkpoint_dir, self.fgbg, frame_num, checkpoint_meta)
+                    self._record("checkpoint", time.perf_counter() - t0)
+                    checkpoints_saved += 1
+                    last_checkpoint = frame_num
+
+                if self.latency_budget is not None:
+                    # A máscara já foi entregue; se ela saiu fora do orçamento, escritas,
+                    # contagem, rastreamento e exibição ficam para o próximo frame
+                    mask_latency = time.perf_counter() - captured
+                    if mask_latency > self.latency_budget:
+                        latencies.append((frame_num, mask_latency, mask_latency, True))
+                        if self.profiler is not None:
+                            self.profiler.end_frame()
+                        next_frame_time = time.perf_counter()
+                        continue
+
+                self._save_image("gray", frame_num, gray)
+                if "mog2" in self.outputs:
+                    self._save_image("mog2", frame_num, self.upsample(self.last_raw_mask))
+
+                if self.counter is not None:
+                    t0 = time.perf_counter()
+                    self.counter.update(frame_num, fgmask, self.regions(fgmask))
+                    self._record("count", time.perf_counter() - t0)
+
+                # Salvar máscara final (e suas cópias, se habilitadas)
+                self._save_image("mask", frame_num, fgmask)
+                if mask_store is not None:
+                    t0 = time.perf_counter()
+                    if self._writer is not None:
+                        self._writer.submit(mask_store.append, frame_num, fgmask, key="mask_store",
+                                            description=f"mask_store frame {frame_num}")
+                    else:
+                        mask_store.append(frame_num, fgmask)
+                    self._record("write_mask_store", time.perf_counter() - t0)
+
+                # Aplicar rastreamento de objetos
+                tracks = self.update_tracks(frame_num, fgmask) if self.tracker is not None else None
+                if tracks is not None and self.profiler is not None:
+                    self.profiler.set_counter("tracks", len(self.tracker))
+                tracked_frame = self.track(frame, fgmask, tracks) if needs_tracking else None
+                self._save_image("tracked", frame_num, tracked_frame)
+
+                # Exibir os diferentes estágios do processamento
+                if "display" in self.outputs:
+                    cv2.imshow("Frame Original", frame)
+                    cv2.imshow("Escala de Cinza", gray)
+                    cv2.imshow("Filtro Bruto", fgmask)
+                    cv2.imshow("Máscara MOG2", self.upsample(self.last_raw_mask))
+
+                    # Pressionar 'q' para sair
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+
+                if video is not None:
+                    t0 = time.perf_counter()
+                    video.write(original=frame, tracking=tracked_frame, mask=fgmask)
+                    self._record("write_video", time.perf_counter() - t0)
+
+                if self.latency_budget is not None:
+                    latencies.append((frame_num, mask_latency, time.perf_counter() - captured, False))
+                if self.profiler is not None:
+                    self.profiler.end_frame()
+                next_frame_time = time.perf_counter()
+
+        finally:
+            # Também em caso de erro: encerra a leitura antecipada, as threads de escrita, o
+            # processo codificador (e sua memória compartilhada) e o arquivo do masks.bsm
+            frames.close()
+            # Esvazia a fila de escritas antes de fechar os vídeos
+            if self._writer is not None:
+                errors = self._writer.close()
+                write_stats = self._writer.stats()
+                self._writer = None
+                if errors:
+                    print(f"❌ {len(errors)} escrita(s) falharam:")
+                    for description, error in errors[:10]:
+                        print(f"   {description}: {error}")
+            try:
+                video_stats = video.close() if video is not None else None
+            finally:
+                if mask_store is not None:
+                    mask_store.close()
+
+            # O log é gravado uma única vez, ao final (também após um erro, como o masks.bsm,
+            # para que uma retomada encontre as linhas dos frames já processados)
+            if "log" in self.outputs:
+                log_path = os.path.join(self.debug_dir, "debug_log.txt")
+                # Retomada: as linhas do log até o checkpoint são mantidas
+                previous_stats = ([stat for stat in read_log(log_path) if stat[0] <= resumed_from]
+                                  if resumed_from is not None else [])
+                write_log(previous_stats + frame_stats, log_path)
+        reader_stats = frames.stats()
+
+        # Checkpoint final: a próxima execução com `resume` processa só os frames novos
+        checkpoint = None
+        if self.checkpoint_dir is not None:
+            if last_frame is not None and last_frame != last_checkpoint:
+                t0 = time.perf_counter()
+                save_checkpoint(self.checkpoint_dir, self.fgbg, last_frame, checkpoint_meta)
+                self.stage_times["checkpoint"] += time.perf_counter() - t0
+                checkpoints_saved += 1
+                last_checkpoint = last_frame
+            checkpoint = {"dir": self.checkpoint_dir, "resumed_from": resumed_from, "saved": checkpoints_saved,
+                          "last_frame": last_checkpoint}
+
+        if "display" in self.outputs:
+            cv2.destroyAllWindows()
+
+        # Trajetórias gravadas uma única vez, ao final
+        tracking = None
+        if self.tracker is not None:
+            if "trajectories" in self.outputs:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self.tracker.save(os.path.join(self.output_dir, "trajectories.npy"))
+            tracking = self.tracker.summary()
+
+        # Perfil gravado uma única vez, ao final
+        profile = None
+        if self.profiler is not None:
+            os.makedirs(self.debug_dir, exist_ok=True)
+            self.profiler.save_csv(os.path.join(self.debug_dir, "profile.csv"))
+            self.profiler.save_json(os.path.join(self.debug_dir, "profile.json"))
+            profile = self.profiler.summary()
+
+        realtime = None
+        if self.latency_budget is not None:
+            realtime = realtime_summary(latencies, self.latency_budget, reader_stats)
+
+        elapsed_time = time.time() - start_time
+        return {"frames": processed, "elapsed_time": elapsed_time, "stage_times": dict(self.stage_times),
+                "writes": write_stats, "reader": reader_stats, "frame_stats": frame_stats,
+                "warmup_frames": warmed, "warmup_time": warmup_time,
+                "roi": self.roi.stats() if self.roi is not None else None, "profile": profile,
+                "tracking": tracking, "realtime": realtime, "video": video_stats, "checkpoint": checkpoint}
+
+
+def realtime_summary(latencies, budget, reader_stats=None):
+    """Latência de ponta a ponta (ms, da captura à máscara e ao fim do frame) e taxas de descarte.
+
+    `latencies` tem uma tupla (frame, latência da máscara, latência total, degradado)
+    por frame processado; os frames descartados vêm das estatísticas da fonte ao vivo.
+    """
+    records = np.array(latencies, dtype=[("frame", np.int64), ("mask", np.float64),
+                                         ("total", np.float64), ("degraded", bool)])
+
+    def describe(values):
+        values = values * 1000
+        if not len(values):
+            return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        p50, p95, p99 = np.percentile(values, (50, 95, 99))
+        return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+                "max": float(values.max())}
+
+    processed = len(records)
+    dropped = (reader_stats or {}).get("dropped", 0)
+    offered = processed + dropped
+    return {
+        "budget_ms": 1000 * budget,
+        "processed": processed,
+        "dropped": dropped,
+        "drop_rate": dropped / offered if offered else 0.0,
+        "degraded": int(records["degraded"].sum()),
+        "deadline_misses": int((records["total"] > budget).sum()),
+        "mask_latency_ms": describe(records["mask"]),
+        "total_latency_ms": describe(records["total"]),
+    }
+
+
+def read_log(log_path=LOG_FILE):
+    """Linhas (frame, antes, depois) de um log gravado por `write_log` (vazio se não existir)."""
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path) as log_file:
+        next(log_file, None)  # cabeçalho
+        return [tuple(int(value) for value in line.split(",")) for line in log_file if line.strip()]
+
+
+def write_log(frame_stats, log_path=LOG_FILE):
+    """Grava o log de pixels ativos (antes/depois das melhorias) por frame."""
+    with open(log_path, "w") as log_file:
+        log_file.write("Frame, Pixels Ativos (Antes), Pixels Ativos (Depois)\n")
+        log_file.writelines(f"{frame_num}, {before}, {after}\n" for frame_num, before, after in frame_stats)
+
+
+def print_summary(summary, output_dir=OUTPUT_DIR):
+    """Exibe o resumo de uma execução do pipeline."""
+    print(f"\n⏳ Processamento concluído! Tempo total: {summary['elapsed_time']:.2f} segundos.")
+    if summary["frames"]:
+        print("⏱️ Tempo médio por estágio (ms/frame):")
+        for name, seconds in summary["stage_times"].items():
+            print(f"   {name}: {1000 * seconds / summary['frames']:.2f}")
+    reader = summary.get("reader")
+    if reader and "depth" in reader:
+        print(f"🎞️ Leitura antecipada (buffer de {reader['depth']}): o loop esperou por frame "
+              f"{reader['waits']} vez(es) ({100 * reader['wait_rate']:.1f}%, {reader['wait_time']:.2f} s)")
+    if summary.get("profile"):
+        print_profile(summary["profile"])
+    realtime = summary.get("realtime")
+    if realtime:
+        print(f"⏱️ Tempo real (orçamento de {realtime['budget_ms']:.1f} ms): {realtime['processed']} frames "
+              f"processados, {realtime['dropped']} descartados ({100 * realtime['drop_rate']:.1f}%), "
+              f"{realtime['degraded']} sem as etapas opcionais, {realtime['deadline_misses']} fora do prazo")
+        for name, key in (("até a máscara", "mask_latency_ms"), ("frame completo", "total_latency_ms")):
+            stats = realtime[key]
+            print(f"   latência {name:>14}: p50 {stats['p50']:.1f} | p95 {stats['p95']:.1f} | "
+                  f"p99 {stats['p99']:.1f} | máx {stats['max']:.1f} ms")
+    roi = summary.get("roi")
+    if roi:
+        print(f"🎯 ROI: {100 * roi['crop_fraction']:.1f}% do frame processado (recorte), "
+              f"{100 * roi['roi_fraction']:.1f}% dentro do ROI")
+    tracking = summary.get("tracking")
+    if tracking:
+        print(f"🚶 Rastreamento: {tracking['tracks']} trilha(s) confirmada(s), até {tracking['max_active']} "
+              f"ativa(s) ao mesmo tempo, {tracking['mean_length']:.1f} frames por trilha em média "
+              f"(máximo {tracking['max_length']})")
+    video = summary.get("video")
+    if video:
+        copies = f", cópia(s): {', '.join(video['copies'])}" if video["copies"] else ""
+        encode = f", codificação {video['encode_time']:.2f} s em outro processo" if video["encode_time"] else ""
+        print(f"🎬 Vídeo: {video['frames']} frames em {', '.join(video['files'])}{copies}{encode}; "
+              f"o loop esperou {video['waits']} vez(es) ({video['wait_time']:.2f} s)")
+    checkpoint = summary.get("checkpoint")
+    if checkpoint:
+        resumed = (f"retomado do frame {checkpoint['resumed_from']}, " if checkpoint["resumed_from"] is not None
+                   else "")
+        print(f"💾 Checkpoints: {resumed}{checkpoint['saved']} gravado(s), último no frame "
+              f"{checkpoint['last_frame']} ({checkpoint['dir']})")
+    writes = summary.get("writes")
+    if writes:
+        print(f"💾 Escritas assíncronas: {writes['completed']}/{writes['submitted']} concluídas, "
+              f"{writes['errors']} erro(s), {writes['backpressure_waits']} espera(s) por fila cheia "
+              f"({writes['backpressure_time']:.2f} s)")
+    print(f"📂 Máscaras salvas em: {os.path.join(output_dir, 'masks')}")
+    print(f"📂 Rastreamento salvo em: {os.path.join(output_dir, 'tracked')}")
+    print(f"📂 Filtros brutos salvos em: {os.path.join(output_dir, 'filtered_frames')}")
+    print(f"📂 Escala de cinza salva em: {os.path.join(output_dir, 'gray_frames')}")
+    print(f"📂 Vídeos gerados em: {output_dir}")
+
+
+def run_background_subtraction(source=RAW_FRAMES_DIR, max_frames=None, evaluate_live=False, **pipeline_kwargs):
+    """Executa o pipeline completo sobre os frames (ponto de entrada usado pelo main.py).
+
+    Com `evaluate_live=True`, cada máscara é comparada com a ground truth já
+    existente assim que é gerada, sem esperar o fim da execução.
+    """
+    pipeline = BackgroundSubtractionPipeline(**pipeline_kwargs)
+
+    evaluator = None
+    if evaluate_live:
+        from evaluate import LiveEvaluator
+        evaluator = LiveEvaluator(roi=pipeline.roi.mask if pipeline.roi is not None else None)
+
+    try:
+        summary = pipeline.run(source, max_frames=max_frames, on_mask=evaluator)
+    finally:
+        if evaluator is not None:
+            evaluator.close()
+    print_summary(summary, pipeline.output_dir)
+
+    if evaluator is not None:
+        summary["metrics"], summary["frame_metrics"] = evaluator.results()
+        print(f"\n📊 Avaliação ao vivo: {len(evaluator)} frames com ground truth "
+              f"({evaluator.missing} sem ground truth)")
+        for key, value in summary["metrics"].items():
+            print(f"   {key}: {value:.4f}")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Subtração de fundo (MOG2) sobre a sequência de frames.")
+    parser.add_argument("--source", default=RAW_FRAMES_DIR,
+                        help=f"Diretório de frames ou arquivo de vídeo (ex.: {VIDEO_PATH})")
+    parser.add_argument("--max-frames", type=int, help="Processa no máximo N frames")
+    parser.add_argument("--preset", choices=sorted(OUTPUT_PRESETS), default="default",
+                        help="Política de saídas pronta")
+    parser.add_argument("--outputs", nargs="*", choices=ALL_OUTPUTS,
+                        help="Lista explícita de saídas (substitui --preset)")
+    parser.add_argument("--headless", action="store_true", help="Não abre janelas (modo produção)")
+    parser.add_argument("--quiet", action="store_true", help="Não imprime o progresso por frame")
+    parser.add_argument("--writer-workers", type=int, default=4,
+                        help="Threads de escrita assíncrona (0 = escrita síncrona)")
+    parser.add_argument("--prefetch", type=int, default=8, help="Frames decodificados à frente (0 desliga)")
+    parser.add_argument("--direct-grayscale", action="store_true",
+                        help="Decodifica os JPEGs direto em cinza (mais rápido; difere em ~0,3%% dos pixels)")
+    parser.add_argument("--model", choices=sorted(BACKGROUND_MODELS), default="mog2", help="Modelo de fundo")
+    parser.add_argument("--roi", nargs="?", const=ROI_PATH,
+                        help="Processa só a região de interesse do arquivo .mat (padrão: perspective_roi.mat)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Escala de processamento (ex.: 0.5 processa em meia resolução)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Registra tempos por estágio e contadores por frame (debug/profile.csv e .json)")
+    parser.add_argument("--live-fps", type=float,
+                        help="Modo tempo real: reproduz a fonte a N frames/s como uma câmera ao vivo")
+    parser.add_argument("--latency-budget", type=float,
+                        help="Orçamento de latência por frame em ms (padrão: 1000 / --live-fps)")
+    parser.add_argument("--video-composite", action="store_true",
+                        help="Grava as saídas de vídeo lado a lado em um único composite.avi")
+    parser.add_argument("--track", action="store_true",
+                        help="Rastreia os objetos entre frames e grava as trajetórias (trajectories.npy)")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="Grava o estado do modelo (--model gmm) a cada N frames e ao final")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="Diretório dos checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continua do último checkpoint, processando só os frames seguintes")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="Avalia cada máscara contra a ground truth existente durante a execução")
+    args = parser.parse_args()
+
+    outputs = list(args.outputs if args.outputs is not None else OUTPUT_PRESETS[args.preset])
+    if args.track:
+        outputs.append("trajectories")
+    run_background_subtraction(args.source, max_frames=args.max_frames, evaluate_live=args.evaluate,
+                               prefetch=args.prefetch, direct_grayscale=args.direct_grayscale,
+                               model=args.model, roi=args.roi, scale=args.scale, profile=args.profile,
+                               outputs=outputs, live_fps=args.live_fps, video_composite=args.video_composite,
+                               latency_budget=args.latency_budget / 1000 if args.latency_budget else None,
+                               headless=args.headless, writer_workers=args.writer_workers,
+                               checkpoint_dir=args.checkpoint_dir if args.checkpoint_every or args.resume else None,
+                               checkpoint_every=args.checkpoint_every, resume=args.resume,
+                               verbose=not args.quiet)
@@ -0,0 +1,501 @@
+import cv2
+import numpy as np
+import os
+import time
+import shutil
+import tempfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import background_subtraction as bs
+from background_models import BACKGROUND_MODELS
+from frame_source import IMAGE_EXTENSIONS, RAW_FRAMES_DIR, open_frame_source
+from image_loader import ParallelImageLoader
+from mask_store import confusion_counts_packed, pack_mask
+from postprocessing import POSTPROCESSING_PRESETS, compare_with_legacy, filter_regions
+
+
+def display_available():
+    """Verifica se o OpenCV consegue abrir janelas (falso em builds headless ou sem display)."""
+    try:
+        cv2.namedWindow("benchmark")
+        cv2.destroyWindow("benchmark")
+        return True
+    except cv2.error:
+        return False
+
+
+def benchmark_outputs(source=RAW_FRAMES_DIR, presets=("none", "legacy"), max_frames=300):
+    """Mede frames/s do pipeline para cada política de saída."""
+    results = {}
+
+    for preset in presets:
+        outputs = set(bs.OUTPUT_PRESETS[preset])
+        if "display" in outputs and not display_available():
+            print(f"⚠️ Sem suporte a janelas: '{preset}' será medido sem cv2.imshow/waitKey")
+            outputs.discard("display")
+
+        output_dir = tempfile.mkdtemp(prefix=f"bench_{preset}_")
+        try:
+            pipeline = bs.BackgroundSubtractionPipeline(outputs=outputs, output_dir=output_dir,
+                                                        debug_dir=os.path.join(output_dir, "debug"),
+                                                        verbose=False)
+            summary = pipeline.run(source, max_frames=max_frames)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        fps = summary["frames"] / summary["elapsed_time"] if summary["elapsed_time"] > 0 else 0.0
+        results[preset] = {"frames": summary["frames"], "elapsed_time": summary["elapsed_time"], "fps": fps}
+        print(f"   {preset:>8}: {summary['frames']} frames em {summary['elapsed_time']:.2f} s -> {fps:.1f} frames/s")
+
+    return results
+
+
+def collect_raw_masks(source=RAW_FRAMES_DIR, max_frames=300, history=100, var_threshold=40):
+    """Máscaras brutas do MOG2 (antes do pós-processamento) para os primeiros frames."""
+    fgbg = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold, detectShadows=False)
+    with open_frame_source(source, grayscale=True, stop=max_frames) as frames:
+        return [fgbg.apply(gray) for _, gray in frames]
+
+
+def benchmark_postprocessing(source=RAW_FRAMES_DIR, presets=("legacy", "fused", "fast"), max_frames=300):
+    """Custo por frame e concordância com a cadeia original de cada preset de pós-processamento."""
+    raw_masks = collect_raw_masks(source, max_frames)
+    results = {}
+    for preset in presets:
+        result = compare_with_legacy(raw_masks, POSTPROCESSING_PRESETS[preset], fuse=preset != "legacy")
+        results[preset] = result
+        print(f"   {preset:>7}: {result['candidate_ms']:.2f} ms/frame (original: {result['legacy_ms']:.2f}) | "
+              f"IoU médio {result['mean_iou']:.4f}, mínimo {result['min_iou']:.4f} | "
+              f"{result['identical_frames']}/{result['frames']} frames idênticos")
+        print(f"            {' -> '.join(f'{op}({param})' for op, param in result['operations'])}")
+    return results
+
+
+def remove_small_regions_loop(mask, min_size=500):
+    """Implementação original (um laço Python por componente), mantida como referência."""
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    mask_filtered = np.zeros_like(mask)
+    for i in range(1, num_labels):
+        if stats[i, cv2.CC_STAT_AREA] >= min_size:
+            mask_filtered[labels == i] = 255
+    return mask_filtered
+
+
+def contour_boxes(mask, min_box_area=300):
+    """Caixas pelo caminho original: findContours + boundingRect."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = [cv2.boundingRect(contour) for contour in contours]
+    return [box for box in boxes if box[2] * box[3] > min_box_area]
+
+
+def synthetic_blob_mask(num_blobs, size=(480, 640), large_every=4, seed=0):
+    """Máscara com `num_blobs` blobs separados em uma grade.
+
+    Um a cada `large_every` blobs é um objeto de 23x23 (mantido com min_size=500);
+    os demais são ruído de 1 a 4 pixels de lado (removidos).
+    """
+    rng = np.random.default_rng(seed)
+    height, width = size
+    cell = 26
+    cells = [(y, x) for y in range(0, height - cell + 1, cell) for x in range(0, width - cell + 1, cell)]
+    if num_blobs > len(cells):
+        raise ValueError(f"No máximo {len(cells)} blobs cabem em {size}")
+
+    mask = np.zeros(size, np.uint8)
+    chosen = rng.choice(len(cells), num_blobs, replace=False)
+    for i, index in enumerate(chosen):
+        y, x = cells[index]
+        side = 23 if i % large_every == 0 else int(rng.integers(1, 5))
+        mask[y:y + side, x:x + side] = 255
+    return mask
+
+
+def benchmark_regions(blob_counts=(10, 50, 100, 200, 400), repeats=5, min_size=500):
+    """Micro-benchmark do remove_small_regions variando o número de blobs."""
+    results = []
+    for num_blobs in blob_counts:
+        mask = synthetic_blob_mask(num_blobs)
+        num_labels = cv2.connectedComponents(mask, connectivity=8)[0] - 1
+
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            expected = remove_small_regions_loop(mask, min_size)
+            contour_boxes(expected)
+        t1 = time.perf_counter()
+        for _ in range(repeats):
+            result, stats, _ = filter_regions(mask, min_size)
+        t2 = time.perf_counter()
+
+        loop_ms = 1000 * (t1 - t0) / repeats
+        lut_ms = 1000 * (t2 - t1) / repeats
+        results.append({"blobs": num_blobs, "components": num_labels, "loop_ms": loop_ms, "lut_ms": lut_ms,
+                        "identical": bool(np.array_equal(expected, result))})
+        print(f"   {num_blobs:>5} blobs ({num_labels:>4} componentes): laço + findContours {loop_ms:8.2f} ms | "
+              f"tabela de áreas {lut_ms:6.2f} ms | {loop_ms / lut_ms:6.1f}x | "
+              f"{'idêntico' if results[-1]['identical'] else 'DIFERENTE'}")
+    return results
+
+
+def _run_model(task):
+    """Executa um modelo de fundo em um processo novo (para medir o pico de memória isolado)."""
+    import resource
+    from evaluate import compute_metrics
+
+    model, source, max_frames, ground_truth_dir = task
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    totals, evaluated = {}, 0
+
+    def on_mask(frame_num, mask):
+        nonlocal evaluated
+        filename = f"mask_{frame_num:04d}.png"
+        gt = cv2.imread(os.path.join(ground_truth_dir, filename), cv2.IMREAD_GRAYSCALE)
+        if gt is None:
+            return
+        metrics, _ = compute_metrics({filename: gt}, {filename: mask})
+        for key, value in metrics.items():
+            totals[key] = totals.get(key, 0.0) + value
+        evaluated += 1
+
+    pipeline = bs.BackgroundSubtractionPipeline(model=model, outputs=(), verbose=False)
+    summary = pipeline.run(source, max_frames=max_frames, on_mask=on_mask)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB no Linux
+
+    frames = summary["frames"]
+    stage_times = summary["stage_times"]
+    return {
+        "model": model,
+        "frames": frames,
+        "model_ms": 1000 * stage_times["model"] / frames if frames else 0.0,
+        "total_ms": 1000 * sum(stage_times.values()) / frames if frames else 0.0,
+        "peak_rss_mb": rss_after / 1024,
+        "model_rss_mb": (rss_after - rss_before) / 1024,
+        "evaluated": evaluated,
+        **{key: value / evaluated for key, value in totals.items() if evaluated},
+    }
+
+
+def benchmark_models(source=RAW_FRAMES_DIR, models=None, max_frames=None, ground_truth_dir=None,
+                     results_file=None):
+    """Compara os modelos de fundo registrados: ms/frame, pico de memória e métricas de avaliação."""
+    from evaluate import GROUND_TRUTH_DIR, RESULTS_DIR
+
+    models = models or sorted(BACKGROUND_MODELS)
+    ground_truth_dir = ground_truth_dir or GROUND_TRUTH_DIR
+    results_file = results_file or os.path.join(RESULTS_DIR, "model_comparison.csv")
+    if not os.path.isdir(ground_truth_dir):
+        print(f"⚠️ Ground truth não encontrada em {ground_truth_dir}: apenas custo será medido")
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as executor:
+        results = list(executor.map(_run_model, [(model, source, max_frames, ground_truth_dir)
+                                                 for model in models]))
+
+    metric_names = ["Accuracy", "Precision", "Recall", "F1-Score", "IoU"]
+    columns = ["model", "frames", "model_ms", "total_ms", "peak_rss_mb", "model_rss_mb"] + metric_names
+    os.makedirs(os.path.dirname(results_file), exist_ok=True)
+    with open(results_file, "w", encoding="utf-8") as f:
+        f.write(",".join(columns) + "\n")
+        for result in results:
+            f.write(",".join(str(result.get(column, "")) for column in columns) + "\n")
+
+    print(f"{'modelo':>17} | {'modelo ms':>9} | {'total ms':>8} | {'pico MB':>7} | {'Δ MB':>6} | "
+          + " | ".join(f"{name:>9}" for name in metric_names))
+    for result in results:
+        metrics = " | ".join(f"{result[name]:9.4f}" if name in result else f"{'-':>9}" for name in metric_names)
+        print(f"{result['model']:>17} | {result['model_ms']:9.2f} | {result['total_ms']:8.2f} | "
+              f"{result['peak_rss_mb']:7.1f} | {result['model_rss_mb']:6.1f} | {metrics}")
+    print(f"\n✅ Tabela salva em: {results_file}")
+    return results
+
+
+def benchmark_decode(folder=RAW_FRAMES_DIR, worker_counts=None, max_files=None):
+    """Carga completa de um diretório: cv2.imread serial vs. pool de decodificação com N threads."""
+    paths = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    paths = paths[:max_files]
+    cpus = os.cpu_count() or 1
+    worker_counts = worker_counts or sorted({1, 2, 4, cpus})
+
+    # Observação: o cache de páginas do SO não é esvaziado; só a primeira passada é realmente fria
+    t0 = time.perf_counter()
+    expected = [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in paths]
+    serial_time = time.perf_counter() - t0
+    print(f"   {'serial (imread)':>18}: {serial_time:6.2f} s ({len(paths) / serial_time:7.1f} imagens/s)")
+
+    results = [{"workers": 0, "seconds": serial_time, "speedup": 1.0, "identical": True}]
+    for workers in worker_counts:
+        t0 = time.perf_counter()
+        with ParallelImageLoader(workers) as loader:
+            stack, ok = loader.load_stack(paths)
+        elapsed = time.perf_counter() - t0
+        identical = bool(ok.all()) and all(np.array_equal(a, b) for a, b in zip(expected, stack))
+        results.append({"workers": workers, "seconds": elapsed, "speedup": serial_time / elapsed,
+                        "identical": identical})
+        print(f"   {f'pool ({workers} threads)':>18}: {elapsed:6.2f} s ({len(paths) / elapsed:7.1f} imagens/s) | "
+              f"{serial_time / elapsed:5.2f}x | {'idêntico' if identical else 'DIFERENTE'}")
+    return results
+
+
+def benchmark_scales(source=RAW_FRAMES_DIR, scales=(1.0, 0.75, 0.5, 0.25), max_frames=300):
+    """Custo por frame e IoU (contra a escala 1) de cada escala de processamento.
+
+    As máscaras são comparadas já ampliadas para o tamanho do frame, como seriam gravadas.
+    """
+    scales = [1.0] + [scale for scale in scales if scale != 1.0]
+    reference = {}
+    results = []
+    for scale in scales:
+        ious = []
+
+        def on_mask(frame_num, mask):
+            packed = pack_mask(mask)
+            if scale == 1.0:
+                reference[frame_num] = packed
+                return
+            tp, fp, fn, _ = confusion_counts_packed(reference[frame_num], packed, mask.size)
+            union = tp + fp + fn
+            ious.append(tp / union if union else 1.0)
+
+        pipeline = bs.BackgroundSubtractionPipeline(outputs=(), scale=scale, verbose=False)
+        summary = pipeline.run(source, max_frames=max_frames, on_mask=on_mask)
+        frames = summary["frames"]
+        stage_ms = 1000 * sum(summary["stage_times"].values()) / frames
+        result = {"scale": scale, "frames": frames, "stage_ms": stage_ms,
+                  "fps": frames / summary["elapsed_time"],
+                  "mean_iou": float(np.mean(ious)) if ious else 1.0,
+                  "min_iou": float(np.min(ious)) if ious else 1.0,
+                  "operations": pipeline.postprocessor.operations}
+        results.append(result)
+        print(f"   escala {scale:4.2f}: {stage_ms:6.2f} ms/frame | {result['fps']:6.1f} frames/s | "
+              f"{results[0]['stage_ms'] / stage_ms:5.2f}x | IoU médio {result['mean_iou']:.4f} "
+              f"(mínimo {result['min_iou']:.4f})")
+    return results
+
+
+def render_comparison_matplotlib(gt, pred, path):
+    """Figura de comparação original (matplotlib, 3 subplots), para referência de custo."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(12, 6))
+    for i, (image, cmap, title) in enumerate(((gt, "gray", "Ground Truth"), (pred, "gray", "Predição"),
+                                              (np.abs(gt - pred), "hot", "Diferença"))):
+        plt.subplot(1, 3, i + 1)
+        plt.imshow(image, cmap=cmap)
+        plt.title(title)
+    plt.savefig(path)
+    plt.close()
+
+
+def benchmark_render(frames=50, workers=4, size=(480, 640)):
+    """Imagens de comparação/s: figura matplotlib vs. renderizador NumPy (por par e em montagem)."""
+    from comparison_renderer import render_comparisons
+
+    pairs = [(f"mask_{i + 1:04d}.png", synthetic_blob_mask(20, size, seed=i), synthetic_blob_mask(20, size, seed=i + 1))
+             for i in range(frames)]
+    output_dir = tempfile.mkdtemp(prefix="bench_render_")
+    try:
+        t0 = time.perf_counter()
+        for filename, gt, pred in pairs:
+            render_comparison_matplotlib(gt, pred, os.path.join(output_dir, f"mpl_{filename}"))
+        reference = time.perf_counter() - t0
+        print(f"   {'matplotlib':>22}: {1000 * reference / frames:7.2f} ms/par")
+
+        results = {"matplotlib": reference}
+        for name, montage in (("numpy + pool", False), ("numpy + montagem", True)):
+            summary = render_comparisons(iter(pairs), output_dir, workers=workers, montage=montage,
+                                         verbose=False)
+            results[name] = summary["elapsed_time"]
+            print(f"   {name:>22}: {1000 * summary['elapsed_time'] / frames:7.2f} ms/par | "
+                  f"{reference / summary['elapsed_time']:5.1f}x | {summary['images']} imagem(ns)")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def benchmark_streams(source=RAW_FRAMES_DIR, stream_counts=(1, 4, 8), models=("running_average", "mog2"),
+                      max_frames=100, workers=4):
+    """Vazão agregada com N câmeras (cópias de `source`): pilha vetorizada vs. um modelo por câmera.
+
+    Para modelos NumPy também confere que as duas execuções geram as mesmas máscaras.
+    """
+    from multi_stream import MultiStreamRunner
+
+    results = []
+    for model in models:
+        batched = getattr(BACKGROUND_MODELS[model], "batched", False)
+        for count in stream_counts:
+            streams = [{"name": f"cam_{i + 1:02d}", "source": source} for i in range(count)]
+            modes = (True, False) if batched else (False,)
+            digests = {}
+            for batch in modes:
+                masks = {}
+
+                def on_mask(name, frame_num, mask):
+                    masks[name, frame_num] = pack_mask(mask).tobytes()
+
+                runner = MultiStreamRunner(streams, model=model, workers=workers, max_frames=max_frames,
+                                           batch=batch, on_mask=on_mask)
+                summary = runner.run()
+                digests[batch] = masks
+                result = {"model": model, "streams": count, "batched": batch, "frames": summary["frames"],
+                          "fps": summary["fps"],
+                          "model_ms": 1000 * summary["model_time"] / max(summary["frames"], 1)}
+                results.append(result)
+                mode = "pilha" if batch else "por câmera"
+                print(f"   {model:>16} x{count:<3} {mode:>10}: {result['fps']:7.1f} frames/s agregados | "
+                      f"modelo {result['model_ms']:6.2f} ms/frame")
+            if len(digests) == 2:
+                same = digests[True] == digests[False]
+                print(f"   {'':>16}      máscaras pilha == por câmera: {'sim' if same else 'NÃO'}")
+    return results
+
+
+def synthetic_tracks(num_objects=100, num_frames=2000, size=(480, 640), seed=0):
+    """Regiões (stats, centróides) por frame de `num_objects` caixas em movimento retilíneo com reflexão nas bordas."""
+    rng = np.random.default_rng(seed)
+    height, width = size
+    sizes = rng.integers(16, 40, (num_objects, 2)).astype(np.float64)  # (w, h)
+    positions = rng.uniform(0, 1, (num_objects, 2)) * ([width, height] - sizes)
+    velocities = rng.uniform(-3, 3, (num_objects, 2))
+    for _ in range(num_frames):
+        positions += velocities
+        limits = [width, height] - sizes
+        bounced = (positions < 0) | (positions > limits)
+        velocities[bounced] *= -1
+        np.clip(positions, 0, limits, out=positions)
+        stats = np.empty((num_objects, 5), np.int32)
+        stats[:, :2] = np.rint(positions)
+        stats[:, 2:4] = sizes
+        stats[:, 4] = sizes[:, 0] * sizes[:, 1]
+        yield stats, stats[:, :2] + stats[:, 2:4] / 2.0
+
+
+def benchmark_tracking(num_objects=100, num_frames=2000, fps=20):
+    """Custo por frame do rastreador com `num_objects` trilhas simultâneas e as trocas de identidade."""
+    from tracker import MultiObjectTracker
+
+    tracker = MultiObjectTracker(min_area=0)
+    regions = list(synthetic_tracks(num_objects, num_frames))
+    truth = {}
+    t0 = time.perf_counter()
+    for frame_num, frame_regions in enumerate(regions, start=1):
+        tracker.update(frame_num, frame_regions)
+    elapsed = time.perf_counter() - t0
+
+    # Troca de identidade: o objeto sintético passa a ser seguido por outra trilha
+    for frame_num, (stats, _) in enumerate(regions, start=1):
+        for index, (x, y) in enumerate(stats[:, :2]):
+            truth[frame_num, int(x), int(y)] = index
+    last_track = {}
+    switches = 0
+    for record in tracker.trajectories(min_hits=1):
+        index = truth.get((int(record["frame"]), int(record["x"]), int(record["y"])))
+        if index is None:
+            continue
+        if index in last_track and last_track[index] != record["track_id"]:
+            switches += 1
+        last_track[index] = record["track_id"]
+
+    ms = 1000 * elapsed / num_frames
+    print(f"   {num_objects} objetos x {num_frames} frames: {ms:.3f} ms/frame "
+          f"({1000 / ms:.0f} frames/s, {1000 / ms / fps:.0f}x o tempo real a {fps} fps) | "
+          f"{tracker.next_id - 1} trilhas criadas, {switches} troca(s) de identidade")
+    return {"objects": num_objects, "frames": num_frames, "ms_per_frame": ms, "switches": switches,
+            "tracks": tracker.next_id - 1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de subtração de fundo.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    outputs_parser = subparsers.add_parser("outputs", help="frames/s por política de saída")
+    outputs_parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou vídeo")
+    outputs_parser.add_argument("--frames", type=int, default=300, help="Número máximo de frames")
+    outputs_parser.add_argument("--presets", nargs="+", default=["none", "legacy"],
+                                choices=sorted(bs.OUTPUT_PRESETS))
+
+    post_parser = subparsers.add_parser("postprocessing",
+                                        help="custo e precisão do pós-processamento fundido vs. original")
+    post_parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou vídeo")
+    post_parser.add_argument("--frames", type=int, default=300, help="Número máximo de frames")
+    post_parser.add_argument("--presets", nargs="+", default=["legacy", "fused", "fast"],
+                             choices=sorted(POSTPROCESSING_PRESETS))
+
+    regions_parser = subparsers.add_parser("regions", help="micro-benchmark do remove_small_regions")
+    regions_parser.add_argument("--blobs", nargs="+", type=int, default=[10, 50, 100, 200, 400])
+    regions_parser.add_argument("--repeats", type=int, default=5)
+
+    models_parser = subparsers.add_parser("models", help="compara os modelos de fundo registrados")
+    models_parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou vídeo")
+    models_parser.add_argument("--frames", type=int, help="Número máximo de frames (padrão: todos)")
+    models_parser.add_argument("--models", nargs="+", choices=sorted(BACKGROUND_MODELS))
+    models_parser.add_argument("--ground-truth", help="Diretório da ground truth (padrão: data/ground_truth)")
+    models_parser.add_argument("--output", help="Arquivo CSV da tabela (padrão: data/results/model_comparison.csv)")
+
+    scales_parser = subparsers.add_parser("scales", help="velocidade vs. IoU por escala de processamento")
+    scales_parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou vídeo")
+    scales_parser.add_argument("--frames", type=int, default=300, help="Número máximo de frames")
+    scales_parser.add_argument("--scales", nargs="+", type=float, default=[1.0, 0.75, 0.5, 0.25])
+
+    decode_parser = subparsers.add_parser("decode", help="carga de imagens serial vs. pool de decodificação")
+    decode_parser.add_argument("--folder", default=RAW_FRAMES_DIR, help="Diretório de imagens")
+    decode_parser.add_argument("--workers", nargs="+", type=int, help="Números de threads (padrão: 1, 2, 4, CPUs)")
+    decode_parser.add_argument("--files", type=int, help="Número máximo de arquivos")
+
+    render_parser = subparsers.add_parser("render", help="imagens de comparação: matplotlib vs. NumPy")
+    render_parser.add_argument("--frames", type=int, default=50, help="Número de pares sintéticos")
+    render_parser.add_argument("--workers", type=int, default=4, help="Threads de coloração/codificação")
+
+    streams_parser = subparsers.add_parser("streams", help="várias câmeras: pilha vetorizada vs. por câmera")
+    streams_parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou vídeo")
+    streams_parser.add_argument("--frames", type=int, default=100, help="Frames por câmera")
+    streams_parser.add_argument("--streams", nargs="+", type=int, default=[1, 4, 8], help="Números de câmeras")
+    streams_parser.add_argument("--models", nargs="+", default=["running_average", "mog2"],
+                                choices=sorted(BACKGROUND_MODELS))
+    streams_parser.add_argument("--workers", type=int, default=4, help="Threads de processamento")
+
+    tracking_parser = subparsers.add_parser("tracking", help="custo do rastreador com muitas trilhas simultâneas")
+    tracking_parser.add_argument("--objects", nargs="+", type=int, default=[10, 100, 200])
+    tracking_parser.add_argument("--frames", type=int, default=2000, help="Frames sintéticos")
+
+    args = parser.parse_args()
+
+    if args.command == "outputs":
+        print("⏱️ Benchmark de políticas de saída:")
+        results = benchmark_outputs(args.source, args.presets, args.frames)
+        if "none" in results and "legacy" in results and results["legacy"]["fps"] > 0:
+            print(f"\n🚀 Headless sem saídas é {results['none']['fps'] / results['legacy']['fps']:.1f}x "
+                  f"mais rápido que o comportamento original")
+    elif args.command == "postprocessing":
+        print("⏱️ Benchmark de pós-processamento:")
+        benchmark_postprocessing(args.source, args.presets, args.frames)
+    elif args.command == "regions":
+        print("⏱️ Benchmark de remove_small_regions (min_size=500):")
+        benchmark_regions(args.blobs, args.repeats)
+    elif args.command == "models":
+        print("⏱️ Comparação de modelos de fundo:")
+        benchmark_models(args.source, args.models, args.frames, args.ground_truth, args.output)
+    elif args.command == "scales":
+        print("⏱️ Benchmark de escalas de processamento (IoU contra a escala 1):")
+        benchmark_scales(args.source, args.scales, args.frames)
+    elif args.command == "decode":
+        print(f"⏱️ Benchmark de decodificação ({os.cpu_count()} CPUs):")
+        benchmark_decode(args.folder, args.workers, args.files)
+    elif args.command == "streams":
+        print(f"⏱️ Benchmark multi-câmera ({os.cpu_count()} CPUs):")
+        benchmark_streams(args.source, args.streams, args.models, args.frames, args.workers)
+    elif args.command == "tracking":
+        print("⏱️ Benchmark do rastreador:")
+        for num_objects in args.objects:
+            benchmark_tracking(num_objects, args.frames)
+    elif args.command == "render":
+        print("⏱️ Benchmark de imagens de comparação:")
+        benchmark_render(args.frames, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import cv2
+import numpy as np
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+
+from background_models import create_background_model
+from benchmark import contour_boxes
+from evaluate import compute_metrics, load_mask_stack
+from frame_source import RAW_FRAMES_DIR, ImageFolderFrameSource
+from postprocessing import apply_filter, apply_morphology, filter_regions, remove_small_regions
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_DIR = os.path.normpath(os.path.join(BASE_DIR, "../data/benchmarks"))
+
+# Casos medidos, na ordem da tabela; cada um é cronometrado por frame (ms)
+CASES = ("decode", "mog2_apply", "apply_morphology", "apply_filter", "remove_small_regions",
+         "contours", "regions", "compute_metrics", "load_masks")
+
+
+def synthetic_sequence(width=640, height=480, frames=200, blobs=20, seed=0):
+    """Sequência sintética: fundo fixo com ruído e `blobs` elipses em movimento.
+
+    Devolve (frames (N, H, W) uint8, máscaras verdadeiras (N, H, W) uint8 0/255).
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    background = (60 + 80 * xx / max(width - 1, 1) + 40 * yy / max(height - 1, 1)).astype(np.float32)
+
+    axes = rng.uniform(0.02, 0.05, (blobs, 2)) * (width, height)
+    positions = rng.uniform(0, 1, (blobs, 2)) * (width, height)
+    velocities = rng.uniform(-4, 4, (blobs, 2))
+    shades = rng.integers(0, 2, blobs) * 200 + 20
+
+    sequence = np.empty((frames, height, width), np.uint8)
+    truth = np.zeros((frames, height, width), np.uint8)
+    for i in range(frames):
+        frame = background + rng.normal(0, 4, background.shape).astype(np.float32)
+        for (cx, cy), (ax, ay), shade in zip(positions, axes, shades):
+            cv2.ellipse(frame, (int(cx), int(cy)), (int(ax), int(ay)), 0, 0, 360, float(shade), -1)
+            cv2.ellipse(truth[i], (int(cx), int(cy)), (int(ax), int(ay)), 0, 0, 360, 255, -1)
+        np.clip(frame, 0, 255, out=frame)
+        sequence[i] = frame
+        positions += velocities
+        bounced = (positions < 0) | (positions > (width, height))
+        velocities[bounced] *= -1
+    return sequence, truth
+
+
+def prepare_dataset(workdir, dataset="mall", frames=200, width=640, height=480, blobs=20, seed=0):
+    """Grava as máscaras do MOG2 e a ground truth (PNG) em `workdir`.
+
+    "mall" usa os primeiros `frames` de data/raw/frames, com as máscaras finais de
+    um MOG2 como ground truth; o caso "decode" lê esses mesmos JPEGs. "synthetic"
+    usa `synthetic_sequence`, com as máscaras verdadeiras como ground truth, e
+    grava os frames em JPEG no `workdir` para o caso "decode".
+    """
+    gt_dir = os.path.join(workdir, "ground_truth")
+    pred_dir = os.path.join(workdir, "predictions")
+    for folder in (gt_dir, pred_dir):
+        os.makedirs(folder, exist_ok=True)
+
+    if dataset == "mall":
+        frames_dir = RAW_FRAMES_DIR
+        with ImageFolderFrameSource(frames_dir, grayscale=True, stop=frames) as source:
+            sequence = np.stack([frame for _, frame in source])
+        truth = None
+    else:
+        frames_dir = os.path.join(workdir, "frames")
+        os.makedirs(frames_dir, exist_ok=True)
+        sequence, truth = synthetic_sequence(width, height, frames, blobs, seed)
+
+    model = create_background_model("mog2")
+    raw_masks = []
+    for i, frame in enumerate(sequence):
+        if truth is not None:
+            cv2.imwrite(os.path.join(frames_dir, f"frame_{i + 1:05d}.jpg"), frame)
+        raw = model.apply(frame)
+        raw_masks.append(raw)
+        final = remove_small_regions(apply_morphology(apply_filter(raw)))
+        cv2.imwrite(os.path.join(pred_dir, f"mask_{i + 1:05d}.png"), final)
+        gt = truth[i] if truth is not None else apply_morphology(final, 7)
+        cv2.imwrite(os.path.join(gt_dir, f"mask_{i + 1:05d}.png"), gt)
+    return {"frames_dir": frames_dir, "gt_dir": gt_dir, "pred_dir": pred_dir,
+            "sequence": sequence, "raw_masks": raw_masks}
+
+
+def _time_case(func, count, repeats):
+    """Mediana (entre `repeats` execuções) do tempo por item, em ms."""
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) / count)
+    return 1000 * float(np.median(samples))
+
+
+def run_suite(data, repeats=5, cases=CASES):
+    """Tempo por frame (ms) de cada caso sobre os dados de `prepare_dataset`."""
+    sequence, raw_masks = data["sequence"], data["raw_masks"]
+    count = len(sequence)
+    _, gt_stack, _ = load_mask_stack(data["gt_dir"])
+    names, pred_stack, _ = load_mask_stack(data["pred_dir"])
+    gt_images = dict(zip(names, gt_stack))
+    pred_images = dict(zip(names, pred_stack))
+
+    def decode():
+        with ImageFolderFrameSource(data["frames_dir"], grayscale=True, stop=count) as source:
+            for _ in source:
+                pass
+
+    def mog2_apply():
+        model = create_background_model("mog2")
+        for frame in sequence:
+            model.apply(frame)
+
+    def each_mask(func):
+        def run():
+            for mask in raw_masks:
+                func(mask)
+        return run
+
+    runners = {
+        "decode": decode,
+        "mog2_apply": mog2_apply,
+        "apply_morphology": each_mask(apply_morphology),
+        "apply_filter": each_mask(apply_filter),
+        "remove_small_regions": each_mask(remove_small_regions),
+        "contours": each_mask(contour_boxes),
+        "regions": each_mask(lambda mask: filter_regions(mask, min_size=0)),
+        "compute_metrics": lambda: compute_metrics(gt_images, pred_images),
+        "load_masks": lambda: load_mask_stack(data["pred_dir"]),
+    }
+    return {case: _time_case(runners[case], count, repeats) for case in cases}
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__,
+            "cpus": os.cpu_count(), "machine": platform.machine()}
+
+
+def baseline_name(dataset, frames, width, height, blobs):
+    if dataset == "mall":
+        return f"mall_{frames}f"
+    return f"synthetic_{width}x{height}_{blobs}b_{frames}f"
+
+
+def save_baseline(path, results, params):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "environment": environment(), "created": time.time(),
+                   "results_ms": results}, f, indent=2)
+
+
+def compare_with_baseline(results, baseline, threshold=0.2, min_delta_ms=0.05):
+    """Linhas (caso, baseline, atual, razão, regrediu) comparando com um baseline salvo.
+
+    Um caso regride quando fica mais de `threshold` (fração) mais lento e a diferença
+    passa de `min_delta_ms` (para não acusar ruído em casos de microssegundos).
+    """
+    rows = []
+    for case, current in results.items():
+        reference = baseline["results_ms"].get(case)
+        if reference is None:
+            rows.append((case, None, current, None, False))
+            continue
+        ratio = current / reference if reference else float("inf")
+        regressed = current > reference * (1 + threshold) and current - reference > min_delta_ms
+        rows.append((case, reference, current, ratio, regressed))
+    return rows
+
+
+def print_results(rows, threshold):
+    print(f"   {'caso':>22} | {'baseline':>9} | {'atual':>9} | {'razão':>6}")
+    for case, reference, current, ratio, regressed in rows:
+        if reference is None:
+            print(f"   {case:>22} | {'-':>9} | {current:9.3f} | {'novo':>6}")
+            continue
+        flag = f"  ❌ regressão (> {100 * threshold:.0f}%)" if regressed else ""
+        print(f"   {case:>22} | {reference:9.3f} | {current:9.3f} | {ratio:6.2f}{flag}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks de regressão (ms/frame por caso).")
+    parser.add_argument("--dataset", choices=("mall", "synthetic"), default="synthetic")
+    parser.add_argument("--frames", type=int, default=200, help="Comprimento da sequência")
+    parser.add_argument("--width", type=int, default=640, help="Largura (sintética)")
+    parser.add_argument("--height", type=int, default=480, help="Altura (sintética)")
+    parser.add_argument("--blobs", type=int, default=20, help="Número de objetos (sintética)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5, help="Execuções por caso (vale a mediana)")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--baseline", help="Arquivo JSON do baseline (padrão: data/benchmarks/<sequência>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--force", action="store_true",
+                        help="Compara mesmo com um baseline gerado com outros parâmetros")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regressão máxima tolerada (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="Diferença mínima (ms/frame) para contar como regressão")
+    args = parser.parse_args()
+
+    params = {"dataset": args.dataset, "frames": args.frames, "seed": args.seed}
+    if args.dataset == "synthetic":
+        params.update(width=args.width, height=args.height, blobs=args.blobs)
+    baseline_path = args.baseline or os.path.join(
+        BASELINES_DIR, baseline_name(args.dataset, args.frames, args.width, args.height, args.blobs) + ".json")
+
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        print(f"🧪 Preparando sequência {args.dataset} ({args.frames} frames)...")
+        data = prepare_dataset(workdir, args.dataset, args.frames, args.width, args.height, args.blobs, args.seed)
+        print(f"⏱️ Medindo {len(args.cases)} caso(s), mediana de {args.repeats} execuções (ms/frame):")
+        results = run_suite(data, args.repeats, args.cases)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            if not args.force:
+                print(f"❌ Baseline {baseline_path} gerado com outros parâmetros: {baseline.get('params')} "
+                      f"(atuais: {params}). Use --save-baseline para substituí-lo ou --force para comparar")
+                return 2
+            print(f"⚠️ Baseline gerado com outros parâmetros: {baseline.get('params')} (comparação forçada)")
+
+    rows = (compare_with_baseline(results, baseline, args.threshold, args.min_delta_ms) if baseline
+            else [(case, None, current, None, False) for case, current in results.items()])
+    print_results(rows, args.threshold)
+
+    if args.save_baseline or baseline is None:
+        save_baseline(baseline_path, results, params)
+        print(f"💾 Baseline salvo em: {baseline_path}")
+        if not args.save_baseline:
+            print("⚠️ Não havia baseline para esta sequência: nada foi comparado. "
+                  "Rode de novo para comparar com o baseline gravado agora")
+        return 0
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"❌ {len(regressions)} caso(s) com regressão: {', '.join(regressions)}")
+        return 1
+    print(f"✅ Nenhuma regressão acima de {100 * args.threshold:.0f}% em relação a {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
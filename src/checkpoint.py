@@ -0,0 +1,88 @@
+import numpy as np
+import os
+import json
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "../data/checkpoints")
+MANIFEST = "checkpoint.json"
+
+
+def save_checkpoint(directory, model, frame_num, meta=None):
+    """Grava o estado de um modelo `checkpointable` após o frame `frame_num`.
+
+    Cada array de `model.state_arrays()` vira um .npy (`<nome>_<frame>.npy`, lido
+    com mmap) e checkpoint.json aponta para eles. O manifesto é trocado por último,
+    com os.replace: uma interrupção no meio da gravação deixa o checkpoint anterior
+    intacto. Os arquivos do checkpoint anterior são apagados em seguida.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = load_manifest(directory)
+
+    files = {}
+    for name, array in model.state_arrays().items():
+        filename = f"{name}_{frame_num:08d}.npy"
+        np.save(os.path.join(directory, filename), array)
+        files[name] = filename
+
+    manifest = {
+        "frame": int(frame_num),
+        "model_frames": int(model.frames),
+        "params": model.params(),
+        "files": files,
+        "created": time.time(),
+        **(meta or {}),
+    }
+    tmp_path = os.path.join(directory, MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+    if previous is not None:
+        for filename in previous["files"].values():
+            if filename not in files.values():
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except FileNotFoundError:
+                    pass
+    return manifest
+
+
+def load_manifest(directory):
+    """Conteúdo de checkpoint.json (ou None se não houver checkpoint em `directory`)."""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_checkpoint(directory):
+    """(manifesto, {nome: array mapeado em memória, só leitura}) do último checkpoint, ou (None, None)."""
+    manifest = load_manifest(directory)
+    if manifest is None:
+        return None, None
+    arrays = {name: np.load(os.path.join(directory, filename), mmap_mode="r")
+              for name, filename in manifest["files"].items()}
+    return manifest, arrays
+
+
+def restore_checkpoint(directory, model, meta=None):
+    """Restaura em `model` o último checkpoint de `directory`; devolve o manifesto (ou None).
+
+    Levanta ValueError se o checkpoint foi gravado com outros parâmetros do modelo
+    ou com outros valores em `meta` (ex.: tamanho dos frames, escala, ROI).
+    """
+    manifest, arrays = load_checkpoint(directory)
+    if manifest is None:
+        return None
+    expected = {"params": model.params(), **(meta or {})}
+    saved = {key: manifest.get(key) for key in expected}
+    # Ida e volta pelo JSON, para comparar tuplas e listas da mesma forma
+    if json.loads(json.dumps(expected)) != saved:
+        raise ValueError(f"Checkpoint em {directory} incompatível com a configuração atual: "
+                         f"salvo {saved}, atual {expected}")
+    model.load_state(arrays, manifest["model_frames"])
+    return manifest
@@ -1,78 +1,60 @@
-import cv2
 import numpy as np
 import os
-import matplotlib.pyplot as plt
+
+from comparison_renderer import render_comparisons, select_frames
+from evaluate import iter_mask_pairs, mask_pair_filenames
+from mask_store import GROUND_TRUTH_STORE, MaskStore, iter_store_pairs, use_packed_masks
 
 # Diretórios
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 GROUND_TRUTH_DIR = os.path.join(BASE_DIR, "../data/ground_truth")
 PREDICTIONS_DIR = os.path.join(BASE_DIR, "../data/processed/reconstructed_video/masks")
+PREDICTIONS_STORE = os.path.join(BASE_DIR, "../data/processed/reconstructed_video/masks.bsm")
 DEBUG_DIR = os.path.join(BASE_DIR, "../data/debug_comparison")
 
 os.makedirs(DEBUG_DIR, exist_ok=True)
 
-def load_images(folder):
-    """Carrega todas as imagens binárias de um diretório."""
-    images = {}
-    
-    if not os.path.exists(folder):
-        print(f"⚠️ Erro: Diretório não encontrado: {folder}")
-        return images
-
-    for filename in sorted(os.listdir(folder)):  
-        if filename.endswith(".png"):
-            img_path = os.path.join(folder, filename)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is not None:
-                _, binary_img = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-                images[filename] = binary_img
-            else:
-                print(f"⚠️ Erro ao carregar imagem: {filename}")
-    return images
-
-# Carregar imagens da Ground Truth e das máscaras geradas
-gt_images = load_images(GROUND_TRUTH_DIR)
-pred_images = load_images(PREDICTIONS_DIR)
-
-# Verificar se há imagens carregadas
-if not gt_images or not pred_images:
-    print("⚠️ Erro: Ground truth ou segmentações não foram carregadas corretamente!")
-    exit()
-
-# Comparar todas as imagens
-for filename in gt_images:
-    if filename in pred_images:
-        gt = gt_images[filename]
-        pred = pred_images[filename]
-
-        # Ajustar dimensões se necessário
-        if gt.shape != pred.shape:
-            pred = cv2.resize(pred, (gt.shape[1], gt.shape[0]), interpolation=cv2.INTER_NEAREST)
-
-        # Calcular diferença
-        diff = np.abs(gt - pred)
-
-        # Salvar imagens de comparação
-        cv2.imwrite(os.path.join(DEBUG_DIR, f"diff_{filename}"), diff)
-
-        plt.figure(figsize=(12, 6))
-        plt.subplot(1, 3, 1)
-        plt.imshow(gt, cmap="gray")
-        plt.title("Ground Truth")
-
-        plt.subplot(1, 3, 2)
-        plt.imshow(pred, cmap="gray")
-        plt.title("Predição")
-
-        plt.subplot(1, 3, 3)
-        plt.imshow(diff, cmap="hot")
-        plt.title("Diferença (GT - Predição)")
-
-        plt.savefig(os.path.join(DEBUG_DIR, f"comparison_{filename}"))
-        plt.close()
-
-        print(f"✅ Comparação salva: {filename}")
+def compare_masks(sample=None, every=1, montage=False, workers=4, seed=0):
+    """Gera as imagens de comparação entre ground truth e máscaras preditas.
+
+    `every`/`sample` limitam os frames renderizados (um a cada N, e/ou N sorteados);
+    só os pares escolhidos são decodificados. `montage` junta vários pares por imagem.
+    """
+    if use_packed_masks(GROUND_TRUTH_STORE, PREDICTIONS_STORE, PREDICTIONS_DIR):
+        # Stores empacotados: decodifica um par de máscaras por vez, sem PNGs
+        with MaskStore(GROUND_TRUTH_STORE) as gt_store, MaskStore(PREDICTIONS_STORE) as pred_store:
+            frame_numbers = np.intersect1d(gt_store.frame_numbers, pred_store.frame_numbers)
+        frame_numbers = select_frames(frame_numbers, sample, every, seed)
+        pairs = iter_store_pairs(GROUND_TRUTH_STORE, PREDICTIONS_STORE, frame_numbers)
     else:
-        print(f"⚠️ Máscara predita não encontrada para {filename}")
-
-print("\n✅ Comparação concluída! Resultados salvos em '/data/debug_comparison/'")
+        # Verificar se os diretórios existem
+        for folder in (GROUND_TRUTH_DIR, PREDICTIONS_DIR):
+            if not os.path.isdir(folder):
+                print(f"⚠️ Erro: Diretório não encontrado: {folder}")
+                return
+
+        for filename in sorted(set(os.listdir(GROUND_TRUTH_DIR)) - set(os.listdir(PREDICTIONS_DIR))):
+            if filename.endswith(".png"):
+                print(f"⚠️ Máscara predita não encontrada para {filename}")
+
+        # Pares decodificados sob demanda, um por vez
+        filenames = select_frames(mask_pair_filenames(GROUND_TRUTH_DIR, PREDICTIONS_DIR), sample, every, seed)
+        pairs = iter_mask_pairs(GROUND_TRUTH_DIR, PREDICTIONS_DIR, filenames=filenames)
+
+    summary = render_comparisons(pairs, DEBUG_DIR, workers=workers, montage=montage)
+    print(f"\n⏳ {summary['frames']} pares em {summary['images']} imagem(ns), {summary['elapsed_time']:.2f} s")
+    print("✅ Comparação concluída! Resultados salvos em '/data/debug_comparison/'")
+    return summary
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Imagens de comparação entre ground truth e máscaras preditas.")
+    parser.add_argument("--every", type=int, default=1, help="Renderiza um frame a cada N")
+    parser.add_argument("--sample", type=int, help="Renderiza no máximo N frames sorteados")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do sorteio de --sample")
+    parser.add_argument("--montage", action="store_true", help="Vários pares reduzidos por imagem")
+    parser.add_argument("--workers", type=int, default=4, help="Threads de coloração/codificação")
+    args = parser.parse_args()
+
+    compare_masks(args.sample, args.every, args.montage, args.workers, args.seed)
@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+import os
+import time
+import random
+import functools
+
+from writer_pool import AsyncWriterPool, encode_and_write
+
+PANEL_TITLES = ("Ground Truth", "Predicao", "Diferenca (XOR)")
+TITLE_HEIGHT = 24
+
+
+def hot_colormap_lut():
+    """Tabela (256, 3) BGR do colormap "hot" do matplotlib: preto -> vermelho -> amarelo -> branco."""
+    x = np.linspace(0.0, 1.0, 256)
+    red = np.clip(3 * x, 0, 1)
+    green = np.clip(3 * x - 1, 0, 1)
+    blue = np.clip(3 * x - 2, 0, 1)
+    return np.round(np.stack([blue, green, red], axis=1) * 255).astype(np.uint8)
+
+
+# Calculadas uma vez: cada painel é uma indexação da máscara nessas tabelas
+HOT_LUT = hot_colormap_lut()
+GRAY_LUT = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+
+
+def xor_diff(gt, pred):
+    """Pixels em que GT e predição discordam (255) — FP e FN com o mesmo peso, sem estouro de uint8."""
+    return cv2.bitwise_xor(gt, pred)
+
+
+@functools.lru_cache(maxsize=16)
+def _title_band(panel_width, titles):
+    """Faixa de títulos (TITLE_HEIGHT, len(titles) * panel_width, 3), desenhada uma vez por largura."""
+    band = np.full((TITLE_HEIGHT, panel_width * len(titles), 3), 32, np.uint8)
+    for i, title in enumerate(titles):
+        cv2.putText(band, title, (i * panel_width + 8, TITLE_HEIGHT - 8), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    band.setflags(write=False)
+    return band
+
+
+def render_comparison(gt, pred, diff=None, titles=PANEL_TITLES):
+    """Imagem BGR [GT | Predição | Diferença] lado a lado, com uma faixa de títulos (se `titles`).
+
+    Os painéis são escritos direto no quadro final por `np.take` nas tabelas de cor,
+    sem figuras intermediárias. Uma predição de outro tamanho é redimensionada
+    (vizinho mais próximo) para o tamanho da GT.
+    """
+    if pred.shape != gt.shape:
+        pred = cv2.resize(pred, (gt.shape[1], gt.shape[0]), interpolation=cv2.INTER_NEAREST)
+    if diff is None:
+        diff = xor_diff(gt, pred)
+
+    height, width = gt.shape
+    top = TITLE_HEIGHT if titles else 0
+    canvas = np.empty((top + height, 3 * width, 3), np.uint8)
+    if titles:
+        canvas[:top] = _title_band(width, tuple(titles))
+    for i, (panel, lut) in enumerate(((gt, GRAY_LUT), (pred, GRAY_LUT), (diff, HOT_LUT))):
+        np.take(lut, panel, axis=0, out=canvas[top:, i * width:(i + 1) * width], mode="clip")
+    return canvas
+
+
+def select_frames(items, sample=None, every=1, seed=0):
+    """Subconjunto ordenado de `items`: um a cada `every` e, se `sample`, até `sample` sorteados."""
+    items = list(items)[::max(every, 1)]
+    if sample is not None and sample < len(items):
+        chosen = sorted(random.Random(seed).sample(range(len(items)), sample))
+        items = [items[i] for i in chosen]
+    return items
+
+
+class Montage:
+    """Folhas com várias comparações reduzidas em grade (`columns` x `rows` por imagem).
+
+    Cada comparação vira uma célula de `tile_scale` do tamanho original, com o nome
+    do frame no canto; `add` devolve a folha quando ela enche e `finish` devolve a
+    última, parcial. Cada folha é um array novo, então pode ir para a fila de
+    codificação enquanto a próxima é montada.
+    """
+
+    def __init__(self, columns=4, rows=6, tile_scale=0.25, titles=PANEL_TITLES):
+        self.columns = columns
+        self.rows = rows
+        self.tile_scale = tile_scale
+        self.titles = tuple(titles)
+        self._sheet = None
+        self._count = 0
+        self._tile_shape = None
+
+    def _new_sheet(self):
+        tile_h, tile_w = self._tile_shape
+        self._sheet = np.zeros((TITLE_HEIGHT + self.rows * tile_h, self.columns * 3 * tile_w, 3), np.uint8)
+        band = _title_band(tile_w, self.titles)
+        for column in range(self.columns):
+            self._sheet[:TITLE_HEIGHT, column * 3 * tile_w:(column + 1) * 3 * tile_w] = band
+        self._count = 0
+
+    def add(self, label, gt, pred):
+        if self._tile_shape is None:
+            self._tile_shape = (max(int(round(gt.shape[0] * self.tile_scale)), 1),
+                                max(int(round(gt.shape[1] * self.tile_scale)), 1))
+        tile_h, tile_w = self._tile_shape
+        if self._sheet is None:
+            self._new_sheet()
+
+        # Reduz as máscaras antes de colorir: o custo por célula cai com tile_scale²
+        small_gt = cv2.resize(gt, (tile_w, tile_h), interpolation=cv2.INTER_NEAREST)
+        small_pred = cv2.resize(pred, (tile_w, tile_h), interpolation=cv2.INTER_NEAREST)
+        tile = render_comparison(small_gt, small_pred, titles=None)
+        cv2.rectangle(tile, (0, 0), (tile.shape[1] - 1, tile_h - 1), (96, 96, 96), 1)
+        cv2.putText(tile, label, (4, 14), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1, cv2.LINE_AA)
+
+        row, column = divmod(self._count, self.columns)
+        y = TITLE_HEIGHT + row * tile_h
+        self._sheet[y:y + tile_h, column * 3 * tile_w:(column + 1) * 3 * tile_w] = tile
+        self._count += 1
+        if self._count == self.columns * self.rows:
+            return self.finish()
+        return None
+
+    def finish(self):
+        sheet, self._sheet = self._sheet, None
+        if sheet is None:
+            return None
+        used_rows = -(-self._count // self.columns)
+        tile_h = self._tile_shape[0]
+        return sheet[:TITLE_HEIGHT + used_rows * tile_h]
+
+
+def _render_and_write(paths, gt, pred, diff_path=None, message=None):
+    diff = xor_diff(gt, pred)
+    encode_and_write(paths, render_comparison(gt, pred, diff))
+    if diff_path:
+        encode_and_write([diff_path], diff)
+    # Só depois da gravação: uma escrita que falha levanta antes e vai para os erros do pool
+    if message:
+        print(message)
+
+
+def _write_and_report(paths, image, message=None):
+    encode_and_write(paths, image)
+    if message:
+        print(message)
+
+
+def render_comparisons(pairs, output_dir, workers=4, montage=False, columns=4, rows=6, tile_scale=0.25,
+                       write_diff=True, verbose=True):
+    """Grava as comparações de (nome, gt, predição) em `output_dir`.
+
+    Modo normal: `comparison_<nome>` (e `diff_<nome>`, a máscara XOR) por par, com a
+    coloração e a codificação PNG feitas no pool de threads (o cv2 libera o GIL).
+    Modo montagem: `montage_XXXX.png` com `columns` x `rows` pares reduzidos por imagem.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    frames = images = 0
+    sheets = Montage(columns, rows, tile_scale) if montage else None
+
+    with AsyncWriterPool(workers=workers, max_pending=4 * workers) as pool:
+        def write_sheet(sheet):
+            path = os.path.join(output_dir, f"montage_{images + 1:04d}.png")
+            message = f"✅ Montagem salva: {os.path.basename(path)}" if verbose else None
+            pool.submit(_write_and_report, [path], sheet, message, description=path)
+            return 1
+
+        for filename, gt, pred in pairs:
+            frames += 1
+            if sheets is None:
+                diff_path = os.path.join(output_dir, f"diff_{filename}") if write_diff else None
+                message = f"✅ Comparação salva: {filename}" if verbose else None
+                pool.submit(_render_and_write, [os.path.join(output_dir, f"comparison_{filename}")],
+                            gt, pred, diff_path, message, description=filename)
+                images += 1
+                continue
+
+            sheet = sheets.add(os.path.splitext(filename)[0], gt, pred)
+            if sheet is not None:
+                images += write_sheet(sheet)
+
+        if sheets is not None:
+            sheet = sheets.finish()
+            if sheet is not None:
+                images += write_sheet(sheet)
+        pool.flush()
+        writes = pool.stats()
+
+    return {"frames": frames, "images": images, "elapsed_time": time.perf_counter() - t0, "writes": writes}
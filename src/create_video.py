@@ -1,41 +1,47 @@
 import cv2
 import os
 
+from image_loader import ParallelImageLoader
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "../data/raw")
 FRAMES_DIR = os.path.join(DATA_DIR, "frames")
 OUTPUT_VIDEO = os.path.join(DATA_DIR, "reconstructed_video.mp4")
 
-os.makedirs(FRAMES_DIR, exist_ok=True)
+def create_video(workers=None):
+    """Reconstrói o vídeo a partir dos frames em data/raw/frames (decodificados em paralelo, em ordem)."""
+    os.makedirs(FRAMES_DIR, exist_ok=True)
 
-frames = sorted([f for f in os.listdir(FRAMES_DIR) if f.endswith((".jpg", ".png"))])
+    frames = sorted([f for f in os.listdir(FRAMES_DIR) if f.endswith((".jpg", ".png"))])
 
-if not frames:
-    print(f"Erro. Nenhuma imagem encontrada em {FRAMES_DIR}")
-    exit()
+    if not frames:
+        print(f"Erro. Nenhuma imagem encontrada em {FRAMES_DIR}")
+        return
 
-frame_sample = cv2.imread(os.path.join(FRAMES_DIR, frames[0]))
+    frame_sample = cv2.imread(os.path.join(FRAMES_DIR, frames[0]))
 
-if frame_sample is None:
-    print("Erro. Não foi possível carregar a imagem de referência.")
-    exit()
+    if frame_sample is None:
+        print("Erro. Não foi possível carregar a imagem de referência.")
+        return
 
-height, width, _ = frame_sample.shape
+    height, width, _ = frame_sample.shape
 
-fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec para MP4
-video = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, 30, (width, height))  # FPS = 30
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec para MP4
+    video = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, 30, (width, height))  # FPS = 30
 
-print(f"Criando vídeo a partir de {len(frames)} frames...")
+    print(f"Criando vídeo a partir de {len(frames)} frames...")
 
-for frame in frames:
-    img_path = os.path.join(FRAMES_DIR, frame)
-    img = cv2.imread(img_path)
+    with ParallelImageLoader(workers, flags=cv2.IMREAD_COLOR) as loader:
+        for img_path, img in loader.load(os.path.join(FRAMES_DIR, frame) for frame in frames):
+            if img is None:
+                print(f"Erro. Falha ao carregar imagem: {img_path}")
+                continue
 
-    if img is None:
-        print(f"Erro. Falha ao carregar imagem: {img_path}")
-        continue
+            video.write(img)
 
-    video.write(img)
+    video.release()
+    print(f"Vídeo salvo em {OUTPUT_VIDEO}")
+    return OUTPUT_VIDEO
 
-video.release()
-print(f"Vídeo salvo em {OUTPUT_VIDEO}")
+if __name__ == "__main__":
+    create_video()
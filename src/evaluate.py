@@ -2,7 +2,11 @@ import cv2
 import numpy as np
 import os
 import time
-from sklearn.metrics import precision_score, recall_score, accuracy_score, f1_score
+
+from image_loader import ParallelImageLoader, decode_image
+from mask_store import (MaskStore, GROUND_TRUTH_STORE, confusion_counts_packed, mask_filename, pack_mask, popcount,
+                        use_packed_masks)
+from roi import ROI_PATH, as_region_of_interest
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -12,7 +16,32 @@ RESULTS_DIR = os.path.join(BASE_DIR, "../data/results")
 
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
-def load_images_from_folder(folder):
+def load_binary_mask(path):
+    """Carrega uma máscara PNG binarizada em 127 (ou None se a leitura falhar)."""
+    img = decode_image(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    _, binary_img = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
+    return binary_img
+
+def load_mask_stack(folder, workers=None):
+    """Decodifica todos os PNGs de um diretório em paralelo para uma pilha (N, H, W) binarizada.
+
+    Devolve (nomes, pilha, ok); ok[i] é falso para arquivos que não puderam ser carregados.
+    """
+    filenames = sorted(f for f in os.listdir(folder) if f.endswith(".png"))
+    if not filenames:
+        return filenames, np.empty((0, 0, 0), np.uint8), np.zeros(0, bool)
+
+    with ParallelImageLoader(workers) as loader:
+        stack, ok = loader.load_stack([os.path.join(folder, f) for f in filenames])
+
+    # Binarização em 127 in-place, sobre a pilha inteira
+    flat = stack.reshape(-1, stack.shape[-1])
+    cv2.threshold(flat, 127, 255, cv2.THRESH_BINARY, dst=flat)
+    return filenames, stack, ok
+
+def load_images_from_folder(folder, workers=None):
     """Carrega todas as imagens binárias de um diretório."""
     images = {}
     
@@ -20,64 +49,241 @@ def load_images_from_folder(folder):
         print(f"Erro. Diretório não encontrado: {folder}")
         return images
 
-    for filename in sorted(os.listdir(folder)):  
-        if filename.endswith(".png"):
-            img_path = os.path.join(folder, filename)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is not None:
-                _, binary_img = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-                images[filename] = binary_img
+    # Cada imagem do dicionário é uma visão da pilha decodificada em paralelo
+    filenames, stack, ok = load_mask_stack(folder, workers)
+    for filename, img, loaded in zip(filenames, stack, ok):
+        if loaded:
+            images[filename] = img
     return images
 
-def compute_metrics(gt_images, predicted_images):
-    """Calcula métricas de avaliação (Acurácia, Precisão, Recall, IoU, F1-Score)."""
-    accuracies, precisions, recalls, f1_scores, ious = [], [], [], [], []
-    per_frame_results = []
-
-    for filename in gt_images:
-        if filename in predicted_images:
-            gt = gt_images[filename]  # Ground Truth
-            pred = predicted_images[filename]  # Máscara segmentada
-
-            # Ajusta dimensões se necessário
-            if gt.shape != pred.shape:
-                print(f"⚠️ Aviso: Redimensionando máscara predita para {filename}")
-                pred = cv2.resize(pred, (gt.shape[1], gt.shape[0]), interpolation=cv2.INTER_NEAREST)
-
-            # Converte para formato binário (0 e 1) para cálculos
-            gt_bin = (gt > 127).astype(np.uint8)
-            pred_bin = (pred > 127).astype(np.uint8)
-
-            # Flatten para cálculos
-            gt_flat = gt_bin.flatten()
-            pred_flat = pred_bin.flatten()
-
-            # Métricas
-            acc = accuracy_score(gt_flat, pred_flat)
-            precision = precision_score(gt_flat, pred_flat, zero_division=1)
-            recall = recall_score(gt_flat, pred_flat, zero_division=1)
-            f1 = f1_score(gt_flat, pred_flat, zero_division=1)
-
-            intersection = np.logical_and(gt_bin, pred_bin).sum()
-            union = np.logical_or(gt_bin, pred_bin).sum()
-            iou = intersection / union if union != 0 else 0
-
-            accuracies.append(acc)
-            precisions.append(precision)
-            recalls.append(recall)
-            f1_scores.append(f1)
-            ious.append(iou)
-
-            per_frame_results.append(f"{filename}: Acc={acc:.4f}, Precision={precision:.4f}, Recall={recall:.4f}, F1-Score={f1:.4f}, IoU={iou:.4f}")
-
-    # Retorna as métricas médias e os resultados por frame
+def mask_pair_filenames(gt_folder, pred_folder):
+    """Interseção ordenada dos PNGs presentes nos dois diretórios (só nomes, nada é decodificado)."""
+    gt_files = {f for f in os.listdir(gt_folder) if f.endswith(".png")}
+    pred_files = {f for f in os.listdir(pred_folder) if f.endswith(".png")}
+    return sorted(gt_files & pred_files)
+
+def iter_mask_pairs(gt_folder, pred_folder, workers=None, filenames=None):
+    """Gera (nome, gt, predição) frame a frame, decodificando cada par só quando ele é pedido.
+
+    Os pares são decodificados em paralelo e entregues em ordem; só os poucos
+    pares à frente do consumidor ficam em memória, qualquer que seja o tamanho da sequência.
+    `filenames` restringe a um subconjunto dos pares (padrão: todos).
+    """
+    if filenames is None:
+        filenames = mask_pair_filenames(gt_folder, pred_folder)
+
+    def load_pair(filename):
+        return (filename, load_binary_mask(os.path.join(gt_folder, filename)),
+                load_binary_mask(os.path.join(pred_folder, filename)))
+
+    with ParallelImageLoader(workers) as loader:
+        for filename, gt, pred in loader.imap(load_pair, filenames):
+            if gt is None or pred is None:
+                print(f"⚠️ Erro ao carregar imagem: {filename}")
+                continue
+            yield filename, gt, pred
+
+# Resultado por frame: contagens da matriz de confusão e as métricas derivadas delas
+FRAME_METRICS_DTYPE = np.dtype([
+    ("filename", "U64"),
+    ("tp", np.int64), ("fp", np.int64), ("fn", np.int64), ("tn", np.int64),
+    ("accuracy", np.float64), ("precision", np.float64), ("recall", np.float64),
+    ("f1", np.float64), ("iou", np.float64),
+])
+
+def confusion_counts(gt, pred, roi=None):
+    """TP, FP, FN e TN de um par de máscaras (ou de pilhas (N, H, W)) em uma passada.
+
+    Para pilhas, devolve um array de contagens por frame em cada posição. Com
+    `roi` (máscara (H, W)), só os pixels dentro do ROI são contados.
+    """
+    gt_bin = gt > 127
+    pred_bin = pred > 127
+    axes = tuple(range(gt_bin.ndim - 2, gt_bin.ndim))
+    pixels = gt_bin.shape[-2] * gt_bin.shape[-1]
+    if roi is not None:
+        roi_bin = np.asarray(roi) > 0
+        gt_bin &= roi_bin
+        pred_bin &= roi_bin
+        pixels = int(np.count_nonzero(roi_bin))
+
+    tp = np.count_nonzero(gt_bin & pred_bin, axis=axes)
+    gt_pos = np.count_nonzero(gt_bin, axis=axes)
+    pred_pos = np.count_nonzero(pred_bin, axis=axes)
+    fp = pred_pos - tp
+    fn = gt_pos - tp
+    tn = pixels - tp - fp - fn
+    return tp, fp, fn, tn
+
+def _ratio(numerator, denominator, zero_division):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), zero_division)
+
+def metrics_from_counts(tp, fp, fn, tn):
+    """Acurácia, Precisão, Recall, F1 e IoU a partir das contagens (escalares ou arrays).
+
+    Segue as convenções anteriores (sklearn com zero_division=1; IoU = 0 com união vazia).
+    """
     return {
-        "Accuracy": np.mean(accuracies) if accuracies else 0,
-        "Precision": np.mean(precisions) if precisions else 0,
-        "Recall": np.mean(recalls) if recalls else 0,
-        "F1-Score": np.mean(f1_scores) if f1_scores else 0,
-        "IoU": np.mean(ious) if ious else 0
-    }, per_frame_results
+        "Accuracy": _ratio(tp + tn, tp + fp + fn + tn, 0.0),
+        "Precision": _ratio(tp, tp + fp, 1.0),
+        "Recall": _ratio(tp, tp + fn, 1.0),
+        "F1-Score": _ratio(2 * tp, 2 * tp + fp + fn, 1.0),
+        "IoU": _ratio(tp, tp + fp + fn, 0.0),
+    }
+
+def frame_metrics_array(filenames, tp, fp, fn, tn):
+    """Monta o array estruturado (FRAME_METRICS_DTYPE) com os resultados por frame."""
+    metrics = metrics_from_counts(np.asarray(tp), np.asarray(fp), np.asarray(fn), np.asarray(tn))
+    results = np.zeros(len(filenames), dtype=FRAME_METRICS_DTYPE)
+    results["filename"] = filenames
+    results["tp"], results["fp"], results["fn"], results["tn"] = tp, fp, fn, tn
+    results["accuracy"] = metrics["Accuracy"]
+    results["precision"] = metrics["Precision"]
+    results["recall"] = metrics["Recall"]
+    results["f1"] = metrics["F1-Score"]
+    results["iou"] = metrics["IoU"]
+    return results
+
+def summarize_frame_metrics(per_frame):
+    """Médias das métricas sobre todos os frames avaliados."""
+    columns = {"Accuracy": "accuracy", "Precision": "precision", "Recall": "recall",
+               "F1-Score": "f1", "IoU": "iou"}
+    return {key: float(per_frame[column].mean()) if len(per_frame) else 0
+            for key, column in columns.items()}
+
+class StreamingEvaluator:
+    """Acumula as métricas frame a frame, sem guardar as máscaras.
+
+    Mantém somas corridas das métricas (médias disponíveis a qualquer momento em
+    `means()`) e só as quatro contagens de cada frame para o relatório por frame.
+    """
+
+    def __init__(self, roi=None):
+        self.roi = roi
+        self.filenames = []
+        self.counts = []
+        self.totals = {"Accuracy": 0.0, "Precision": 0.0, "Recall": 0.0, "F1-Score": 0.0, "IoU": 0.0}
+
+    def __len__(self):
+        return len(self.counts)
+
+    def update(self, filename, gt, pred):
+        """Avalia um par de máscaras; o par pode ser liberado logo em seguida."""
+        # Ajusta dimensões se necessário
+        if gt.shape != pred.shape:
+            print(f"⚠️ Aviso: Redimensionando máscara predita para {filename}")
+            pred = cv2.resize(pred, (gt.shape[1], gt.shape[0]), interpolation=cv2.INTER_NEAREST)
+        self.update_counts(filename, *confusion_counts(gt, pred, self.roi))
+
+    def update_counts(self, filename, tp, fp, fn, tn):
+        """Acrescenta um frame já reduzido às contagens TP/FP/FN/TN."""
+        self.filenames.append(filename)
+        self.counts.append((tp, fp, fn, tn))
+        for key, value in metrics_from_counts(tp, fp, fn, tn).items():
+            self.totals[key] += float(value)
+
+    def means(self):
+        """Médias correntes das métricas sobre os frames avaliados até agora."""
+        frames = len(self)
+        return {key: total / frames if frames else 0 for key, total in self.totals.items()}
+
+    def results(self):
+        """(médias, array estruturado por frame), como compute_metrics."""
+        counts = np.array(self.counts, dtype=np.int64).reshape(-1, 4)
+        return self.means(), frame_metrics_array(self.filenames, *counts.T)
+
+class LiveEvaluator(StreamingEvaluator):
+    """Avalia as máscaras enquanto o pipeline as produz: use como `on_mask` de pipeline.run.
+
+    A ground truth de cada frame é lida sob demanda do store empacotado, se ele
+    existir, ou do PNG correspondente; frames sem ground truth são contados em `missing`.
+    """
+
+    def __init__(self, gt_folder=GROUND_TRUTH_DIR, gt_store=GROUND_TRUTH_STORE, roi=None):
+        super().__init__(roi)
+        self.gt_folder = gt_folder
+        self.missing = 0
+        self._store = MaskStore(gt_store) if gt_store and os.path.exists(gt_store) else None
+
+    def _ground_truth(self, frame_num):
+        if self._store is not None:
+            return self._store.get(frame_num) if frame_num in self._store else None
+        path = os.path.join(self.gt_folder, mask_filename(frame_num))
+        return load_binary_mask(path) if os.path.exists(path) else None
+
+    def __call__(self, frame_num, mask):
+        gt = self._ground_truth(frame_num)
+        if gt is None:
+            self.missing += 1
+            return
+        self.update(mask_filename(frame_num), gt, mask)
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+def compute_metrics_streaming(pairs, roi=None):
+    """compute_metrics sobre um iterável de (nome, gt, predição), um par em memória por vez."""
+    evaluator = StreamingEvaluator(roi)
+    for filename, gt, pred in pairs:
+        evaluator.update(filename, gt, pred)
+    return evaluator.results()
+
+def compute_metrics(gt_images, predicted_images, roi=None):
+    """Calcula métricas de avaliação (Acurácia, Precisão, Recall, IoU, F1-Score).
+
+    Devolve as médias e um array estruturado com TP/FP/FN/TN e as métricas de cada frame.
+    """
+    pairs = ((filename, gt_images[filename], predicted_images[filename])
+             for filename in gt_images if filename in predicted_images)
+    return compute_metrics_streaming(pairs, roi)
+
+def compute_metrics_batch(gt_stack, pred_stack, filenames=None, roi=None):
+    """Versão em lote de compute_metrics para pilhas (N, H, W) já alinhadas frame a frame."""
+    tp, fp, fn, tn = confusion_counts(gt_stack, pred_stack, roi)
+    if filenames is None:
+        filenames = [str(i) for i in range(len(tp))]
+    per_frame_results = frame_metrics_array(filenames, tp, fp, fn, tn)
+    return summarize_frame_metrics(per_frame_results), per_frame_results
+
+def compute_metrics_packed(gt_store, pred_store, batch_frames=256, roi=None):
+    """compute_metrics direto sobre dois stores empacotados (popcount, sem decodificar PNGs)."""
+    if gt_store.shape != pred_store.shape:
+        raise ValueError(f"Stores com tamanhos diferentes: {gt_store.shape} e {pred_store.shape}")
+
+    pixels = gt_store.pixels
+    roi_packed = None
+    if roi is not None:
+        # Os bits fora do ROI são zerados com um AND sobre a máscara do ROI empacotada
+        roi_packed = pack_mask(np.where(np.asarray(roi) > 0, 255, 0).astype(np.uint8))
+        pixels = int(popcount(roi_packed))
+
+    frame_numbers = np.intersect1d(gt_store.frame_numbers, pred_store.frame_numbers)
+    gt_rows = np.array([gt_store._row(n) for n in frame_numbers], dtype=np.int64)
+    pred_rows = np.array([pred_store._row(n) for n in frame_numbers], dtype=np.int64)
+
+    counts = np.empty((4, len(frame_numbers)), np.int64)
+    for start in range(0, len(frame_numbers), batch_frames):
+        stop = start + batch_frames
+        gt_packed = gt_store.data[gt_rows[start:stop]]
+        pred_packed = pred_store.data[pred_rows[start:stop]]
+        if roi_packed is not None:
+            gt_packed &= roi_packed
+            pred_packed &= roi_packed
+        counts[:, start:stop] = confusion_counts_packed(gt_packed, pred_packed, pixels)
+
+    filenames = [mask_filename(n) for n in frame_numbers]
+    per_frame_results = frame_metrics_array(filenames, *counts)
+    return summarize_frame_metrics(per_frame_results), per_frame_results
+
+def format_frame_metrics(row):
+    """Linha de texto de um frame, no formato do arquivo de resultados."""
+    return (f"{row['filename']}: Acc={row['accuracy']:.4f}, Precision={row['precision']:.4f}, "
+            f"Recall={row['recall']:.4f}, F1-Score={row['f1']:.4f}, IoU={row['iou']:.4f}")
 
 def save_results_to_file(metrics, per_frame_results, elapsed_time):
     """Salva as métricas em um arquivo de texto com UTF-8 para evitar erros no Windows."""
@@ -85,8 +291,8 @@ def save_results_to_file(metrics, per_frame_results, elapsed_time):
 
     with open(results_file, "w", encoding="utf-8") as f: 
         f.write("==== MÉTRICAS POR FRAME ====\n")
-        for line in per_frame_results:
-            f.write(line + "\n")
+        for row in per_frame_results:
+            f.write(format_frame_metrics(row) + "\n")
 
         f.write("\n==== MÉTRICAS GERAIS ====\n")
         for key, value in metrics.items():
@@ -96,9 +302,44 @@ def save_results_to_file(metrics, per_frame_results, elapsed_time):
 
     print(f"\n✅ Resultados salvos em: {results_file}")
 
-def evaluate_segmentation(video_name):
-    """Executa a avaliação comparando segmentações geradas com a ground truth."""
+def report_results(metrics, per_frame_results, elapsed_time):
+    """Exibe as métricas gerais e salva o arquivo de resultados."""
+    print("\n==== MÉTRICAS GERAIS ====")
+    for key, value in metrics.items():
+        print(f"{key}: {value:.4f}")
+
+    print(f"\nTempo total de avaliação: {elapsed_time:.2f} segundos")
+
+    save_results_to_file(metrics, per_frame_results, elapsed_time)
+
+def evaluate_packed(gt_store_path, pred_store_path, roi=None):
+    """Avaliação a partir dos stores empacotados (.bsm) da ground truth e das máscaras."""
+    start_time = time.time()
+
+    with MaskStore(gt_store_path) as gt_store, MaskStore(pred_store_path) as pred_store:
+        metrics, per_frame_results = compute_metrics_packed(gt_store, pred_store, roi=roi)
+
+    if not len(per_frame_results):
+        print("Erro. Nenhum frame em comum entre a ground truth e a segmentação gerada!")
+        return
+
+    report_results(metrics, per_frame_results, time.time() - start_time)
+    return metrics
+
+def evaluate_segmentation(video_name, roi=None):
+    """Executa a avaliação comparando segmentações geradas com a ground truth.
+
+    Com `roi` (caminho .mat, máscara ou RegionOfInterest), só os pixels do ROI são contados.
+    """
+    roi = as_region_of_interest(roi)
+    roi_mask = roi.mask if roi is not None else None
     processed_dir = os.path.join(PROCESSED_BASE_DIR, video_name, "masks")  
+    pred_store = os.path.join(PROCESSED_BASE_DIR, video_name, "masks.bsm")
+
+    # Caminho rápido: máscaras empacotadas em bits, sem decodificar PNGs (se os stores não forem sobras)
+    if use_packed_masks(GROUND_TRUTH_STORE, pred_store, processed_dir):
+        print(f"Avaliando segmentação (stores empacotados) para o vídeo: {video_name}")
+        return evaluate_packed(GROUND_TRUTH_STORE, pred_store, roi_mask)
 
     if not os.path.exists(GROUND_TRUTH_DIR):
         print("Erro. Diretório da ground truth não encontrado!")
@@ -109,35 +350,31 @@ def evaluate_segmentation(video_name):
         return
 
     print(f"Avaliando segmentação para o vídeo: {video_name}")
-    
-    gt_images = load_images_from_folder(GROUND_TRUTH_DIR)
-    pred_images = load_images_from_folder(processed_dir)
 
-    if not gt_images:
-        print("Erro. Nenhuma imagem encontrada na ground truth!")
-        return
-
-    if not pred_images:
-        print("Erro. Nenhuma imagem encontrada na segmentação gerada!")
-        return
-    
     start_time = time.time()
 
-    metrics, per_frame_results = compute_metrics(gt_images, pred_images)
+    # Pares decodificados sob demanda: memória constante para qualquer tamanho de sequência
+    metrics, per_frame_results = compute_metrics_streaming(iter_mask_pairs(GROUND_TRUTH_DIR, processed_dir),
+                                                            roi_mask)
+
+    if not len(per_frame_results):
+        print("Erro. Nenhum frame em comum entre a ground truth e a segmentação gerada!")
+        return
 
     end_time = time.time()  
     elapsed_time = end_time - start_time
 
-    print("\n==== MÉTRICAS GERAIS ====")
-    for key, value in metrics.items():
-        print(f"{key}: {value:.4f}")
-
-    print(f"\nTempo total de avaliação: {elapsed_time:.2f} segundos")
-
-    save_results_to_file(metrics, per_frame_results, elapsed_time)
+    report_results(metrics, per_frame_results, elapsed_time)
 
     return metrics
 
 if __name__ == "__main__":
-    video_name = "reconstructed_video" 
-    evaluate_segmentation(video_name)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Avalia as máscaras segmentadas contra a ground truth.")
+    parser.add_argument("--video", default="reconstructed_video", help="Nome do vídeo em data/processed")
+    parser.add_argument("--roi", nargs="?", const=ROI_PATH,
+                        help="Conta só os pixels da região de interesse (padrão: perspective_roi.mat)")
+    args = parser.parse_args()
+
+    evaluate_segmentation(args.video, roi=args.roi)
@@ -0,0 +1,321 @@
+import cv2
+import os
+import queue
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_FRAMES_DIR = os.path.join(BASE_DIR, '../data/raw/frames')
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class FrameSource:
+    """Fonte de frames: iterável de (frame_num, frame), numerados a partir de 1.
+
+    Com `grayscale=True` os frames já saem em tons de cinza (2D).
+    """
+
+    grayscale = False
+
+    @property
+    def frame_size(self):
+        """(largura, altura) dos frames."""
+        raise NotImplementedError
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class VideoFrameSource(FrameSource):
+    """Frames decodificados de um arquivo de vídeo com cv2.VideoCapture."""
+
+    def __init__(self, path, grayscale=False, start=0, stop=None):
+        self.path = path
+        self.grayscale = grayscale
+        self.start = start
+        self.stop = stop
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise IOError(f"Não foi possível abrir o vídeo: {path}")
+
+    @property
+    def frame_size(self):
+        return (int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def __len__(self):
+        total = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        stop = total if self.stop is None else min(self.stop, total)
+        return max(0, stop - self.start)
+
+    def __iter__(self):
+        if self.start:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+        frame_num = self.start
+        while self._cap.isOpened() and (self.stop is None or frame_num < self.stop):
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            frame_num += 1
+            if self.grayscale:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            yield frame_num, frame
+
+    def close(self):
+        self._cap.release()
+
+
+class ImageFolderFrameSource(FrameSource):
+    """Frames lidos diretamente de um diretório de imagens (ex.: data/raw/frames/seq_*.jpg).
+
+    Evita reconstruir um vídeo só para decodificá-lo de novo. Em tons de cinza, o
+    frame é decodificado em BGR e convertido com cvtColor, como no script original.
+    Com `direct_grayscale=True`, o JPEG é decodificado direto para 1 canal: é mais
+    rápido, mas a conversão interna da libjpeg difere da do cvtColor (cerca de 0,3%
+    dos pixels, por até 11 níveis), o que muda algumas máscaras.
+    """
+
+    def __init__(self, folder=RAW_FRAMES_DIR, grayscale=False, start=0, stop=None, direct_grayscale=False):
+        self.folder = folder
+        self.grayscale = grayscale
+        self.direct_grayscale = direct_grayscale
+        self.files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise IOError(f"Nenhuma imagem encontrada em {folder}")
+        self.start = start
+        self.stop = len(self.files) if stop is None else min(stop, len(self.files))
+        self._frame_size = None
+
+    @property
+    def frame_size(self):
+        if self._frame_size is None:
+            sample = cv2.imread(os.path.join(self.folder, self.files[0]), cv2.IMREAD_GRAYSCALE)
+            self._frame_size = (sample.shape[1], sample.shape[0])
+        return self._frame_size
+
+    def __len__(self):
+        return max(0, self.stop - self.start)
+
+    def __iter__(self):
+        direct = self.grayscale and self.direct_grayscale
+        flags = cv2.IMREAD_GRAYSCALE if direct else cv2.IMREAD_COLOR
+        for index in range(self.start, self.stop):
+            path = os.path.join(self.folder, self.files[index])
+            frame = cv2.imread(path, flags)
+            if frame is None:
+                raise IOError(f"Falha ao carregar imagem: {path}")
+            if self.grayscale and not direct:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            yield index + 1, frame
+
+
+_END = object()
+
+
+class PrefetchingFrameSource(FrameSource):
+    """Decodifica frames à frente do consumidor em uma thread, com buffer de `depth` frames.
+
+    `stats()` informa quantas vezes o consumidor precisou esperar por um frame.
+    """
+
+    def __init__(self, source, depth=8):
+        if depth < 1:
+            raise ValueError("depth deve ser >= 1")
+        self.source = source
+        self.depth = depth
+        self.grayscale = source.grayscale
+        self.frames = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self._queue = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def frame_size(self):
+        return self.source.frame_size
+
+    def __len__(self):
+        return len(self.source)
+
+    def _put(self, item):
+        """Coloca um item no buffer; devolve False se a fonte foi fechada enquanto esperava."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer(self):
+        try:
+            for item in self.source:
+                if not self._put(item):
+                    return
+            self._put(_END)
+        except Exception as e:  # repassa o erro para a thread consumidora
+            self._put(e)
+
+    def __iter__(self):
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._producer, daemon=True, name="frame-prefetch")
+        self._thread.start()
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                t0 = time.perf_counter()
+                item = self._queue.get()
+                self.waits += 1
+                self.wait_time += time.perf_counter() - t0
+
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            self.frames += 1
+            yield item
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "depth": self.depth,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "wait_rate": self.waits / self.frames if self.frames else 0.0,
+        }
+
+
+class LiveFrameSource(FrameSource):
+    """Fonte ao vivo: uma thread captura os frames e só o mais recente fica disponível.
+
+    Com `fps`, os frames de `source` são publicados no ritmo do relógio (frame i no
+    instante t0 + i / fps), acompanhe o consumidor ou não, como uma câmera. O
+    consumidor recebe sempre o frame mais novo; os publicados e nunca entregues
+    contam como descartados. `last_capture_time` (relógio de time.perf_counter) é o
+    instante de captura do último frame entregue.
+    """
+
+    def __init__(self, source, fps=None):
+        self.source = source
+        self.fps = fps
+        self.grayscale = source.grayscale
+        self.published = 0
+        self.delivered = 0
+        self.last_capture_time = None
+        self._latest = None
+        self._ended = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def frame_size(self):
+        return self.source.frame_size
+
+    def __len__(self):
+        return len(self.source)
+
+    def _producer(self):
+        try:
+            start = time.perf_counter()
+            for i, (frame_num, frame) in enumerate(self.source):
+                if self.fps:
+                    # O frame já decodificado só "chega" no instante dele
+                    delay = start + i / self.fps - time.perf_counter()
+                    if delay > 0 and self._stop.wait(delay):
+                        return
+                if self._stop.is_set():
+                    return
+                with self._condition:
+                    self._latest = (frame_num, frame, time.perf_counter())
+                    self.published += 1
+                    self._condition.notify()
+        except Exception as e:  # repassa o erro para a thread consumidora
+            with self._condition:
+                self._error = e
+        finally:
+            with self._condition:
+                self._ended = True
+                self._condition.notify()
+
+    def __iter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._producer, daemon=True, name="live-capture")
+        self._thread.start()
+
+        while True:
+            with self._condition:
+                while self._latest is None and not self._ended:
+                    self._condition.wait()
+                if self._error is not None:
+                    raise self._error
+                if self._latest is None:
+                    return
+                frame_num, frame, captured = self._latest
+                self._latest = None
+            self.delivered += 1
+            self.last_capture_time = captured
+            yield frame_num, frame
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
+
+    def stats(self):
+        dropped = self.published - self.delivered
+        return {
+            "fps": self.fps,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": dropped,
+            "drop_rate": dropped / self.published if self.published else 0.0,
+        }
+
+
+def open_live_source(path=RAW_FRAMES_DIR, fps=20, grayscale=False, start=0, stop=None, direct_grayscale=False):
+    """Reproduz um diretório de frames (ou vídeo) a `fps` frames/s de relógio, como uma câmera ao vivo."""
+    return LiveFrameSource(open_frame_source(path, grayscale=grayscale, prefetch=0, start=start, stop=stop,
+                                             direct_grayscale=direct_grayscale), fps)
+
+
+def open_frame_source(path=RAW_FRAMES_DIR, grayscale=False, prefetch=8, start=0, stop=None, direct_grayscale=False):
+    """Abre um diretório de frames ou um vídeo, com prefetch opcional (0 desliga).
+
+    `direct_grayscale` (só diretórios) decodifica os JPEGs direto em cinza; ver ImageFolderFrameSource.
+    """
+    if os.path.isdir(path):
+        source = ImageFolderFrameSource(path, grayscale=grayscale, start=start, stop=stop,
+                                        direct_grayscale=direct_grayscale)
+    else:
+        source = VideoFrameSource(path, grayscale=grayscale, start=start, stop=stop)
+
+    if prefetch:
+        source = PrefetchingFrameSource(source, depth=prefetch)
+    return source
@@ -2,7 +2,11 @@ import cv2
 import os
 import numpy as np
 import random
-import matplotlib.pyplot as plt
+
+from comparison_renderer import render_comparison
+from stage_cache import StageCache, module_sources
+from mask_store import (MaskStore, MaskStoreWriter, MASKS_STORE, GROUND_TRUTH_STORE, current_mask_source,
+                        mask_filename, mask_png_frames, popcount)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -15,22 +19,67 @@ os.makedirs(DEBUG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(BASE_DIR, "../data/ground_truth_log.txt")
 
+def generate_ground_truth_store(masks_store=MASKS_STORE, output_store=GROUND_TRUTH_STORE, chunk_frames=256):
+    """Gera a ground truth empacotada a partir do store de máscaras, sem decodificar PNGs.
+
+    As máscaras do store já estão binarizadas em 127, então os bits são copiados
+    bloco a bloco. Devolve {nome do PNG equivalente: pixels ativos} e as linhas de log.
+    """
+    counts, log_data = {}, []
+    with MaskStore(masks_store) as masks, MaskStoreWriter(output_store, masks.shape, chunk_frames) as writer:
+        for start in range(0, len(masks), chunk_frames):
+            frame_numbers = masks.frame_numbers[start:start + chunk_frames]
+            packed = np.asarray(masks.data[start:start + chunk_frames])
+            active = popcount(packed)
+            for frame_num, row, num_active_pixels in zip(frame_numbers, packed, active):
+                writer.append_packed(frame_num, row)
+                percentage_active = (num_active_pixels / masks.pixels) * 100
+                counts[mask_filename(frame_num)] = int(num_active_pixels)
+                log_data.append(f"{mask_filename(frame_num)}: {num_active_pixels} pixels brancos "
+                                f"({percentage_active:.2f}%)")
+    return counts, log_data
+
+def remove_ground_truth_pngs(folder=GROUND_TRUTH_DIR):
+    """Apaga os PNGs de ground truth de uma execução anterior."""
+    for filename in os.listdir(folder) if os.path.isdir(folder) else []:
+        if filename.endswith(".png"):
+            os.remove(os.path.join(folder, filename))
+
 def generate_ground_truth():
     print("🟢 Gerando máscaras para ground truth...")
 
-    log_data = []
+    # Uma única fonte por execução: masks.bsm e/ou PNGs, o que for da última segmentação
+    source = current_mask_source(MASKS_STORE, MASKS_DIR)
+    if source is None:
+        print(f"⚠️ Nenhuma máscara encontrada em {MASKS_DIR} nem {MASKS_STORE}")
+        return
+    if source == "png" and os.path.exists(MASKS_STORE):
+        print(f"⚠️ {MASKS_STORE} é mais antigo que os PNGs (sobra de uma execução anterior); usando os PNGs")
+    if source == "store" and mask_png_frames(MASKS_DIR):
+        print(f"⚠️ PNGs em {MASKS_DIR} não correspondem a {MASKS_STORE} (sobra de uma execução anterior); "
+              f"usando o store")
 
-    for filename in sorted(os.listdir(MASKS_DIR)):
+    log_data = []
+    store_counts = None
+    if source in ("both", "store"):
+        store_counts, store_log = generate_ground_truth_store()
+        if source == "store":
+            log_data = store_log
+        print(f"📦 Ground truth empacotada salva em: {GROUND_TRUTH_STORE}")
+    elif os.path.exists(GROUND_TRUTH_STORE):
+        # Não deixa a avaliação usar uma GT empacotada de outra execução
+        os.remove(GROUND_TRUTH_STORE)
+    if source == "store":
+        remove_ground_truth_pngs()
+
+    mismatches = []
+    for filename in sorted(os.listdir(MASKS_DIR)) if source != "store" else []:
         if not filename.endswith(".png"):
             continue
         
         img_path = os.path.join(MASKS_DIR, filename)
         output_path = os.path.join(GROUND_TRUTH_DIR, filename)
 
-        # Verificar se a máscara já foi gerada
-        if os.path.exists(output_path):
-            continue
-
         # Carregar a máscara original
         mask = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
         if mask is None:
@@ -47,9 +96,17 @@ def generate_ground_truth():
 
         log_data.append(f"{filename}: {num_active_pixels} pixels brancos ({percentage_active:.2f}%)")
 
+        # Com as duas fontes, o log vem só dos PNGs, conferidos contra o store
+        if store_counts is not None and filename in store_counts and store_counts[filename] != num_active_pixels:
+            mismatches.append(filename)
+
         # Salvar o Ground Truth
         cv2.imwrite(output_path, binary_mask)
 
+    if mismatches:
+        print(f"⚠️ {len(mismatches)} máscara(s) PNG diferem de {MASKS_STORE} (ex.: {mismatches[0]}); "
+              f"a avaliação usa o store")
+
     # Salvar log com estatísticas
     with open(LOG_FILE, "w") as f:
         f.write("\n".join(log_data))
@@ -58,7 +115,15 @@ def generate_ground_truth():
     print(f"📄 Estatísticas salvas em {LOG_FILE}")
 
     # Visualizar amostras aleatórias para depuração
-    visualize_random_samples()
+    if source != "store":
+        visualize_random_samples()
+
+def generate_ground_truth_cached(cache=None):
+    """generate_ground_truth pelo cache de etapas: só refaz o trabalho quando as máscaras mudam."""
+    cache = cache or StageCache()
+    inputs = [MASKS_DIR, MASKS_STORE] + module_sources("generate_ground_truth")
+    outputs = {"ground_truth": GROUND_TRUTH_DIR, "ground_truth_store": GROUND_TRUTH_STORE, "log": LOG_FILE}
+    return cache.run("generate_ground_truth", generate_ground_truth, {"threshold": 127}, inputs, outputs)
 
 def visualize_random_samples():
     """Gera imagens comparativas entre GT e máscara original"""
@@ -75,28 +140,11 @@ def visualize_random_samples():
         if mask is None or gt is None:
             continue
 
-        # Calcular diferença
-        diff = np.abs(mask - gt)
-
-        # Criar visualização
-        plt.figure(figsize=(12, 6))
-        plt.subplot(1, 3, 1)
-        plt.imshow(mask, cmap="gray")
-        plt.title("Máscara Predita")
-
-        plt.subplot(1, 3, 2)
-        plt.imshow(gt, cmap="gray")
-        plt.title("Ground Truth")
-
-        plt.subplot(1, 3, 3)
-        plt.imshow(diff, cmap="hot")
-        plt.title("Diferença (GT - Predição)")
-
-        output_path = os.path.join(DEBUG_DIR, f"comparison_{filename}")
-        plt.savefig(output_path)
-        plt.close()
+        # Painéis coloridos por tabela e diferença XOR, sem matplotlib
+        comparison = render_comparison(mask, gt, titles=("Mascara Predita", "Ground Truth", "Diferenca (XOR)"))
+        cv2.imwrite(os.path.join(DEBUG_DIR, f"comparison_{filename}"), comparison)
 
     print(f"\n🖼️ Imagens comparativas salvas em {DEBUG_DIR}")
 
 if __name__ == "__main__":
-    generate_ground_truth()
+    generate_ground_truth_cached()
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+import os
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_file(path):
+    """Lê o arquivo inteiro com uma única leitura sequencial (sem buffer do Python)."""
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        data = bytearray(size)
+        view = memoryview(data)
+        read = 0
+        while read < size:
+            n = f.readinto(view[read:])
+            if not n:
+                break
+            read += n
+    return np.frombuffer(data, np.uint8, count=read)
+
+
+def decode_image(path, flags=cv2.IMREAD_GRAYSCALE):
+    """Lê e decodifica uma imagem (ou None se a leitura/decodificação falhar)."""
+    try:
+        data = read_file(path)
+    except OSError:
+        return None
+    if not len(data):
+        return None
+    return cv2.imdecode(data, flags)
+
+
+class ParallelImageLoader:
+    """Decodifica imagens em um pool de threads, devolvendo os resultados na ordem de entrada.
+
+    O cv2 libera o GIL durante a decodificação, então as threads usam vários
+    núcleos. No máximo `readahead` tarefas ficam em andamento ao mesmo tempo,
+    o que limita a memória ocupada por imagens já decodificadas e ainda não consumidas.
+    """
+
+    def __init__(self, workers=None, readahead=None, flags=cv2.IMREAD_GRAYSCALE):
+        self.workers = workers or os.cpu_count() or 1
+        self.readahead = readahead or 2 * self.workers
+        self.flags = flags
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="decode")
+
+    def imap(self, func, items):
+        """Aplica `func` a cada item no pool e gera os resultados na ordem dos itens."""
+        pending = collections.deque()
+        for item in items:
+            if len(pending) >= self.readahead:
+                yield pending.popleft().result()
+            pending.append(self._executor.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+
+    def load(self, paths):
+        """Gera (caminho, imagem) na ordem de `paths`; imagem é None se a leitura falhar."""
+        return self.imap(lambda path: (path, decode_image(path, self.flags)), paths)
+
+    def load_stack(self, paths, out=None):
+        """Decodifica `paths` em uma pilha (N, H, W) uint8 pré-alocada.
+
+        A forma vem da primeira imagem (ou de `out`). O cv2.imdecode do Python não
+        aceita `dst`, então cada worker copia sua imagem para a posição dela na pilha
+        logo após decodificar. Devolve (pilha, ok), com ok[i] falso para imagens que
+        falharam ou têm outro tamanho (a posição correspondente fica zerada).
+        """
+        paths = list(paths)
+        if out is None:
+            first = decode_image(paths[0], self.flags) if paths else None
+            if first is None:
+                raise IOError(f"Falha ao carregar imagem: {paths[0] if paths else '(nenhuma)'}")
+            out = np.empty((len(paths),) + first.shape, np.uint8)
+        ok = np.zeros(len(paths), bool)
+
+        def decode_into(index):
+            image = decode_image(paths[index], self.flags)
+            if image is None or image.shape != out.shape[1:]:
+                out[index] = 0
+                return
+            out[index] = image
+            ok[index] = True
+
+        for _ in self.imap(decode_into, range(len(paths))):
+            pass
+        return out, ok
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
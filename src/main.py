@@ -1,18 +1,11 @@
 import os
 import sys
 import subprocess
+import traceback
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 VENV_DIR = os.path.join(BASE_DIR, "..", "venv")  # Ajuste se necessário
 
-# Caminhos para os scripts
-CREATE_VIDEO_SCRIPT = os.path.join(BASE_DIR, "create_video.py")
-BACKGROUND_SUBTRACTION_SCRIPT = os.path.join(BASE_DIR, "background_subtraction.py")
-GENERATE_GT_SCRIPT = os.path.join(BASE_DIR, "generate_ground_truth.py")
-EVALUATE_SCRIPT = os.path.join(BASE_DIR, "evaluate.py")
-COMPARE_MASKS_SCRIPT = os.path.join(BASE_DIR, "compare_masks.py")
-VALIDATE_EVALUATION_SCRIPT = os.path.join(BASE_DIR, "validate_evaluation.py")
-
 def is_venv_active():
     """Verifica se o ambiente virtual está ativado."""
     return sys.prefix != sys.base_prefix
@@ -36,14 +29,17 @@ def activate_venv():
         print("❌ Erro: Ambiente virtual não encontrado! Certifique-se de que o venv está configurado corretamente.")
         sys.exit(1)
 
-def run_script(script_path):
-    """Executa um script Python dentro do ambiente virtual."""
-    print(f"\n🔄 Executando: {script_path}")
-    result = subprocess.run([sys.executable, script_path], text=True)
-    if result.returncode == 0:
-        print(f"✅ Concluído: {script_path}")
-    else:
-        print(f"❌ Erro ao executar: {script_path}")
+def run_stage(name, stage, *args, **kwargs):
+    """Executa uma etapa do pipeline no mesmo processo (sem reiniciar o interpretador)."""
+    print(f"\n🔄 Executando: {name}")
+    try:
+        result = stage(*args, **kwargs)
+    except Exception:
+        traceback.print_exc()
+        print(f"❌ Erro ao executar: {name}")
+        return None
+    print(f"✅ Concluído: {name}")
+    return result
 
 def main():
     """Executa os scripts na sequência correta."""
@@ -51,24 +47,43 @@ def main():
     # Ativar o ambiente virtual antes de executar qualquer script
     activate_venv()
 
-    # Executa a criação do vídeo
-    run_script(CREATE_VIDEO_SCRIPT)
+    # Importa as etapas só depois do venv (cv2/numpy carregados uma única vez)
+    import background_subtraction as bs
+    import evaluate
+    from generate_ground_truth import generate_ground_truth_cached
+    from stage_cache import StageCache, module_sources
+
+    # Etapas cujas entradas (conteúdo dos arquivos) e configuração não mudaram são puladas
+    cache = StageCache()
 
-    # Executa a subtração de fundo
-    run_script(BACKGROUND_SUBTRACTION_SCRIPT)
+    # Executa a subtração de fundo (lendo direto de data/raw/frames, sem reconstruir o vídeo)
+    pipeline = bs.BackgroundSubtractionPipeline()
+    # Código da etapa: todos os módulos de src/ que ela importa (direta ou indiretamente)
+    run_stage("background_subtraction", cache.run, "background_subtraction", bs.run_background_subtraction,
+              pipeline.config(), [bs.RAW_FRAMES_DIR] + module_sources("background_subtraction"),
+              pipeline.output_paths())
 
     # Gera a ground truth
-    run_script(GENERATE_GT_SCRIPT)
+    run_stage("generate_ground_truth", generate_ground_truth_cached, cache)
 
     # Avalia os resultados
-    run_script(EVALUATE_SCRIPT)
+    video_name = "reconstructed_video"
+    run_stage("evaluate", cache.run, "evaluate", evaluate.evaluate_segmentation, {"video": video_name, "roi": None},
+              [evaluate.GROUND_TRUTH_DIR, evaluate.GROUND_TRUTH_STORE,
+               os.path.join(evaluate.PROCESSED_BASE_DIR, video_name)] + module_sources("evaluate"),
+              {"results": os.path.join(evaluate.RESULTS_DIR, "evaluation_results.txt")}, video_name)
+
+    cache.report()
 
     # Pergunta ao usuário sobre a geração de relatórios
     opcao = input("\n📊 Deseja gerar os relatórios de comparação e validação? (s/n): ").strip().lower()
     
     if opcao == 's':
-        run_script(COMPARE_MASKS_SCRIPT)
-        run_script(VALIDATE_EVALUATION_SCRIPT)
+        from compare_masks import compare_masks
+        from validate_evaluation import validate_evaluation
+
+        run_stage("compare_masks", compare_masks)
+        run_stage("validate_evaluation", validate_evaluation)
 
     print("\n🎉 Processo concluído!")
 
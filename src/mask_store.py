@@ -0,0 +1,306 @@
+import cv2
+import numpy as np
+import os
+import re
+import json
+import struct
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MASKS_STORE = os.path.join(BASE_DIR, "../data/processed/reconstructed_video/masks.bsm")
+GROUND_TRUTH_STORE = os.path.join(BASE_DIR, "../data/ground_truth.bsm")
+
+# Formato do arquivo (.bsm):
+#   [0, 4096)       cabeçalho: MAGIC + uint32 com o tamanho do JSON + JSON
+#   [4096, ...)     frames empacotados com np.packbits, `frame_bytes` bytes cada, na ordem de escrita
+#   index_offset    índice: int64 com o número de cada frame, na mesma ordem dos dados
+MAGIC = b"BSMASK01"
+HEADER_SIZE = 4096
+
+_FRAME_NUMBER = re.compile(r"(\d+)")
+
+
+def frame_number_from_filename(filename):
+    """Número do frame no nome do arquivo (mask_0042.png -> 42)."""
+    match = _FRAME_NUMBER.findall(os.path.basename(filename))
+    if not match:
+        raise ValueError(f"Nome sem número de frame: {filename}")
+    return int(match[-1])
+
+
+def mask_filename(frame_num):
+    """Nome do PNG equivalente a um frame do store (o mesmo usado pelo pipeline)."""
+    return f"mask_{frame_num:04d}.png"
+
+
+def pack_mask(mask):
+    """Binariza (> 127) e empacota uma máscara em bits (8 pixels por byte)."""
+    return np.packbits(mask > 127)
+
+
+def unpack_masks(packed, shape):
+    """Desempacota uma ou mais máscaras para uint8 0/255 com o formato `shape` (H, W)."""
+    height, width = shape
+    packed = np.atleast_2d(packed)
+    bits = np.unpackbits(packed, axis=1, count=height * width)
+    masks = (bits * np.uint8(255)).reshape(-1, height, width)
+    return masks
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(packed, axis=-1):
+        """Número de bits 1 ao longo de `axis`."""
+        return np.bitwise_count(packed).sum(axis=axis, dtype=np.int64)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(packed, axis=-1):
+        """Número de bits 1 ao longo de `axis` (tabela de 256 entradas)."""
+        return _POPCOUNT_TABLE[packed].sum(axis=axis, dtype=np.int64)
+
+
+def confusion_counts_packed(gt_packed, pred_packed, pixels):
+    """TP, FP, FN e TN direto dos bits empacotados (popcount), por frame.
+
+    Os bits de preenchimento do último byte são 0 nas duas máscaras, então não entram nas contagens.
+    """
+    tp = popcount(gt_packed & pred_packed)
+    gt_pos = popcount(gt_packed)
+    pred_pos = popcount(pred_packed)
+    fp = pred_pos - tp
+    fn = gt_pos - tp
+    tn = pixels - tp - fp - fn
+    return tp, fp, fn, tn
+
+
+class MaskStoreWriter:
+    """Grava uma sequência de máscaras binárias em um único arquivo empacotado.
+
+    Os frames são acumulados em blocos de `chunk_frames` e gravados com uma
+    escrita por bloco; o índice e o cabeçalho são gravados no `close()`.
+    """
+
+    def __init__(self, path, shape, chunk_frames=64):
+        self.path = path
+        self.shape = tuple(shape)
+        self.pixels = self.shape[0] * self.shape[1]
+        self.frame_bytes = (self.pixels + 7) // 8
+        self.chunk_frames = chunk_frames
+        self.frame_numbers = []
+        self._chunk = np.empty((chunk_frames, self.frame_bytes), np.uint8)
+        self._pending = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(b"\0" * HEADER_SIZE)
+
+    def append(self, frame_num, mask):
+        """Acrescenta uma máscara uint8 (binarizada em > 127)."""
+        if mask.shape != self.shape:
+            raise ValueError(f"Máscara {mask.shape} diferente do store {self.shape}")
+        self.append_packed(frame_num, pack_mask(mask))
+
+    def append_packed(self, frame_num, packed):
+        """Acrescenta uma máscara já empacotada com pack_mask."""
+        self._chunk[self._pending] = packed
+        self._pending += 1
+        self.frame_numbers.append(int(frame_num))
+        if self._pending == self.chunk_frames:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if self._pending:
+            self._file.write(self._chunk[:self._pending].tobytes())
+            self._pending = 0
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush_chunk()
+        index_offset = self._file.tell()
+        self._file.write(np.asarray(self.frame_numbers, dtype="<i8").tobytes())
+
+        header = json.dumps({
+            "version": 1,
+            "height": self.shape[0],
+            "width": self.shape[1],
+            "frame_bytes": self.frame_bytes,
+            "count": len(self.frame_numbers),
+            "chunk_frames": self.chunk_frames,
+            "index_offset": index_offset,
+        }).encode("utf-8")
+        self._file.seek(0)
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MaskStore:
+    """Leitura de um arquivo .bsm mapeado em memória, indexado pelo número do frame."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Arquivo não é um store de máscaras: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        self.shape = (header["height"], header["width"])
+        self.pixels = self.shape[0] * self.shape[1]
+        self.frame_bytes = header["frame_bytes"]
+        count = header["count"]
+
+        self.frame_numbers = np.fromfile(path, dtype="<i8", count=count, offset=header["index_offset"])
+        if count:
+            self.data = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE,
+                                  shape=(count, self.frame_bytes))
+        else:
+            self.data = np.empty((0, self.frame_bytes), np.uint8)
+
+        self._sorted = bool(np.all(np.diff(self.frame_numbers) > 0))
+        self._rows = None if self._sorted else {int(n): i for i, n in enumerate(self.frame_numbers)}
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def _row(self, frame_num):
+        if self._sorted:
+            row = int(np.searchsorted(self.frame_numbers, frame_num))
+            if row < len(self.frame_numbers) and self.frame_numbers[row] == frame_num:
+                return row
+            return None
+        return self._rows.get(int(frame_num))
+
+    def __contains__(self, frame_num):
+        return self._row(frame_num) is not None
+
+    def packed(self, frame_num):
+        """Bits empacotados de um frame (visão do arquivo mapeado, sem cópia)."""
+        row = self._row(frame_num)
+        if row is None:
+            raise KeyError(frame_num)
+        return self.data[row]
+
+    def get(self, frame_num):
+        """Máscara uint8 (0/255) de um frame."""
+        return unpack_masks(self.packed(frame_num), self.shape)[0]
+
+    def rows(self, first, last):
+        """Intervalo de linhas com os frames first..last (inclusive); requer índice ordenado."""
+        if not self._sorted:
+            raise ValueError("Intervalos exigem frames gravados em ordem crescente")
+        start = int(np.searchsorted(self.frame_numbers, first, side="left"))
+        stop = int(np.searchsorted(self.frame_numbers, last, side="right"))
+        return start, stop
+
+    def packed_range(self, first, last):
+        """(números dos frames, bits empacotados) dos frames first..last, sem cópia."""
+        start, stop = self.rows(first, last)
+        return self.frame_numbers[start:stop], self.data[start:stop]
+
+    def get_range(self, first, last):
+        """(números dos frames, pilha (N, H, W) uint8) dos frames first..last."""
+        frame_numbers, packed = self.packed_range(first, last)
+        return frame_numbers, unpack_masks(packed, self.shape)
+
+    def close(self):
+        if isinstance(self.data, np.memmap):
+            self.data._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_store_pairs(gt_path, pred_path, frame_numbers=None):
+    """(nome, gt, predição) de cada frame presente nos dois stores, decodificando um par por vez.
+
+    `frame_numbers` restringe a um subconjunto dos frames (padrão: todos).
+    """
+    with MaskStore(gt_path) as gt_store, MaskStore(pred_path) as pred_store:
+        common = np.intersect1d(gt_store.frame_numbers, pred_store.frame_numbers)
+        if frame_numbers is not None:
+            common = np.intersect1d(common, frame_numbers)
+        for frame_num in common:
+            yield mask_filename(frame_num), gt_store.get(frame_num), pred_store.get(frame_num)
+
+
+def convert_folder(folder, path, prefix="mask_", chunk_frames=64):
+    """Converte um diretório de PNGs (mask_XXXX.png) em um store empacotado."""
+    filenames = sorted((f for f in os.listdir(folder) if f.startswith(prefix) and f.endswith(".png")),
+                       key=frame_number_from_filename)
+    if not filenames:
+        raise IOError(f"Nenhuma máscara PNG encontrada em {folder}")
+
+    writer = None
+    for filename in filenames:
+        mask = cv2.imread(os.path.join(folder, filename), cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            print(f"⚠️ Erro ao carregar imagem: {filename}")
+            continue
+        if writer is None:
+            writer = MaskStoreWriter(path, mask.shape, chunk_frames)
+        writer.append(frame_number_from_filename(filename), mask)
+    writer.close()
+    return path
+
+
+
+def mask_png_frames(folder, prefix="mask_"):
+    """{número do frame: caminho} das máscaras PNG de `folder` (as cópias test_mask_ ficam de fora)."""
+    if not os.path.isdir(folder):
+        return {}
+    return {frame_number_from_filename(f): os.path.join(folder, f)
+            for f in os.listdir(folder) if f.startswith(prefix) and f.endswith(".png")}
+
+
+def current_mask_source(store_path, png_dir):
+    """Qual fonte tem as máscaras da última execução: "both", "store", "png" ou None.
+
+    O pipeline grava o store, os PNGs ou os dois, e o que uma execução anterior
+    deixou continua no disco. O store fecha depois dos PNGs da mesma execução:
+    se ele é mais antigo que o PNG mais novo, é sobra de outra execução. Sendo
+    mais novo, os PNGs também valem ("both") quando cobrem os mesmos frames.
+    """
+    pngs = mask_png_frames(png_dir)
+    if not os.path.exists(store_path):
+        return "png" if pngs else None
+    if not pngs:
+        return "store"
+    if os.path.getmtime(store_path) < max(os.path.getmtime(path) for path in pngs.values()):
+        return "png"
+    with MaskStore(store_path) as store:
+        same_frames = set(store.frame_numbers.tolist()) == set(pngs)
+    return "both" if same_frames else "store"
+
+
+def use_packed_masks(gt_store, pred_store, pred_dir):
+    """True se a avaliação deve ler os stores: a GT empacotada foi gerada a partir
+    do store de máscaras atual (ver current_mask_source), e não de um antigo."""
+    return (os.path.exists(gt_store) and current_mask_source(pred_store, pred_dir) in ("both", "store")
+            and os.path.getmtime(gt_store) >= os.path.getmtime(pred_store))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Converte máscaras PNG em um store empacotado (.bsm).")
+    parser.add_argument("folder", help="Diretório com as máscaras PNG")
+    parser.add_argument("output", help="Arquivo .bsm de saída")
+    args = parser.parse_args()
+
+    convert_folder(args.folder, args.output)
+    png_bytes = sum(os.path.getsize(os.path.join(args.folder, f))
+                    for f in os.listdir(args.folder) if f.startswith("mask_") and f.endswith(".png"))
+    print(f"✅ Store salvo em {args.output}: {os.path.getsize(args.output) / 1e6:.1f} MB "
+          f"(PNGs: {png_bytes / 1e6:.1f} MB)")
@@ -0,0 +1,248 @@
+import numpy as np
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from background_models import BACKGROUND_MODELS, create_background_model
+from frame_source import open_frame_source
+from mask_store import MaskStoreWriter
+from postprocessing import PostProcessor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STREAMS_DIR = os.path.join(BASE_DIR, "../data/processed/streams")
+
+
+def load_manifest(path):
+    """Câmeras de um manifesto: lista de {"name", "source"} (com "max_frames" opcional).
+
+    Aceita JSON (uma lista ou {"streams": [...]}, com objetos ou só caminhos) ou
+    texto com uma fonte por linha (# comenta). Caminhos relativos são resolvidos
+    a partir do diretório do manifesto.
+    """
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = entries["streams"]
+    else:
+        with open(path, encoding="utf-8") as f:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    base = os.path.dirname(os.path.abspath(path))
+    streams = []
+    for i, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {"source": entry}
+        stream = dict(entry)
+        stream["source"] = os.path.join(base, stream["source"])
+        stream.setdefault("name", f"stream_{i + 1:02d}")
+        streams.append(stream)
+
+    names = [stream["name"] for stream in streams]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Nomes de câmera repetidos no manifesto: {path}")
+    return streams
+
+
+class Stream:
+    """Uma câmera: fonte de frames, modelo de fundo próprio (se não agrupado) e pós-processamento."""
+
+    def __init__(self, name, source, postprocessing="fused", max_frames=None, prefetch=8):
+        self.name = name
+        self.source_path = source
+        self.source = open_frame_source(source, grayscale=True, prefetch=prefetch, stop=max_frames)
+        self._frames = iter(self.source)
+        self.postprocessor = PostProcessor(postprocessing)
+        self.model = None
+        self.store = None
+        self.frame_num = 0
+        self.frame = None
+        self.done = False
+        self.frames = 0
+        self.decode_time = 0.0
+        self.model_time = 0.0
+        self.busy_time = 0.0
+
+    def advance(self):
+        """Lê o próximo frame (em tons de cinza); marca a câmera como encerrada no fim da fonte."""
+        t0 = time.perf_counter()
+        item = next(self._frames, None)
+        self.decode_time += time.perf_counter() - t0
+        if item is None:
+            self.done = True
+            self.frame = None
+            return False
+        self.frame_num, self.frame = item
+        return True
+
+    def close(self):
+        self.source.close()
+        if self.store is not None:
+            self.store.close()
+
+
+class MultiStreamRunner:
+    """Várias câmeras fixas em um único processo, cada uma com seu estado de modelo de fundo.
+
+    A cada passo, um frame de cada câmera ativa é processado. Para modelos NumPy
+    (`batched = True` em background_models), as câmeras com o mesmo tamanho de frame
+    formam um grupo: os frames são copiados para uma pilha (câmeras, H, W) e o
+    modelo do grupo atualiza todas em uma operação vetorizada. Para os modelos do
+    cv2 (MOG2/KNN), cada câmera tem sua instância. O pós-processamento (e o modelo,
+    quando não agrupado) de cada câmera roda em um pool de threads; o cv2 libera o GIL.
+    Uma câmera que termina antes das outras repete o último frame na pilha, e o
+    resultado dela é descartado.
+    """
+
+    def __init__(self, streams, model="mog2", model_params=None, postprocessing="fused", workers=4,
+                 max_frames=None, prefetch=8, batch=True, save_masks=False, output_dir=STREAMS_DIR,
+                 on_mask=None):
+        self.model = model
+        self.model_params = dict(model_params or {})
+        self.batch = batch and getattr(BACKGROUND_MODELS[model], "batched", False)
+        self.workers = workers
+        self.save_masks = save_masks
+        self.output_dir = output_dir
+        self.on_mask = on_mask
+        self.streams = [Stream(stream["name"], stream["source"], postprocessing,
+                               stream.get("max_frames", max_frames), prefetch) for stream in streams]
+        if not self.streams:
+            raise ValueError("Nenhuma câmera no manifesto")
+        self.groups = []
+
+    def _setup(self):
+        """Lê o primeiro frame de cada câmera e cria os modelos (um por grupo ou um por câmera)."""
+        by_shape = {}
+        for stream in self.streams:
+            if not stream.advance():
+                print(f"⚠️ Câmera sem frames: {stream.name} ({stream.source_path})")
+                continue
+            if self.batch:
+                by_shape.setdefault(stream.frame.shape, []).append(stream)
+            else:
+                stream.model = create_background_model(self.model, **self.model_params)
+            if self.save_masks:
+                path = os.path.join(self.output_dir, stream.name, "masks.bsm")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                stream.store = MaskStoreWriter(path, stream.frame.shape)
+
+        # Grupo: câmeras do mesmo tamanho, a pilha dos frames delas e um modelo para a pilha
+        self.groups = [(members, np.empty((len(members),) + shape, np.uint8),
+                        create_background_model(self.model, **self.model_params))
+                       for shape, members in by_shape.items()]
+
+    def _finish(self, stream, mask):
+        """Pós-processa e entrega a máscara do frame atual da câmera (roda no pool)."""
+        t0 = time.perf_counter()
+        mask = stream.postprocessor(mask)
+        if stream.store is not None:
+            stream.store.append(stream.frame_num, mask)
+        if self.on_mask is not None:
+            self.on_mask(stream.name, stream.frame_num, mask)
+        stream.frames += 1
+        stream.busy_time += time.perf_counter() - t0
+
+    def _step_single(self, stream):
+        t0 = time.perf_counter()
+        mask = stream.model.apply(stream.frame)
+        elapsed = time.perf_counter() - t0
+        stream.model_time += elapsed
+        stream.busy_time += elapsed
+        self._finish(stream, mask)
+
+    def run(self):
+        """Processa todas as câmeras até o fim e devolve as vazões por câmera e total."""
+        t_start = time.perf_counter()
+        self._setup()
+        steps = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stream") as pool:
+                while True:
+                    active = [stream for stream in self.streams if not stream.done]
+                    if not active:
+                        break
+
+                    tasks = []
+                    for members, stack, model in self.groups:
+                        if all(stream.done for stream in members):
+                            continue
+                        for slot, stream in enumerate(members):
+                            if not stream.done:
+                                np.copyto(stack[slot], stream.frame)
+                        t0 = time.perf_counter()
+                        masks = model.apply(stack)
+                        elapsed = time.perf_counter() - t0
+                        live = [(slot, stream) for slot, stream in enumerate(members) if not stream.done]
+                        for slot, stream in live:
+                            stream.model_time += elapsed / len(live)
+                            stream.busy_time += elapsed / len(live)
+                            tasks.append(pool.submit(self._finish, stream, masks[slot]))
+
+                    if not self.batch:
+                        tasks.extend(pool.submit(self._step_single, stream) for stream in active)
+                    for task in tasks:
+                        task.result()
+
+                    steps += 1
+                    for stream in active:
+                        stream.advance()
+        finally:
+            for stream in self.streams:
+                stream.close()
+
+        elapsed = time.perf_counter() - t_start
+        total_frames = sum(stream.frames for stream in self.streams)
+        return {
+            "model": self.model,
+            "batched": self.batch,
+            "groups": len(self.groups),
+            "workers": self.workers,
+            "steps": steps,
+            "frames": total_frames,
+            "elapsed_time": elapsed,
+            "fps": total_frames / elapsed if elapsed else 0.0,
+            "model_time": sum(stream.model_time for stream in self.streams),
+            "streams": [{
+                "name": stream.name,
+                "source": stream.source_path,
+                "frames": stream.frames,
+                "fps": stream.frames / elapsed if elapsed else 0.0,
+                "model_ms": 1000 * stream.model_time / max(stream.frames, 1),
+                "busy_ms": 1000 * stream.busy_time / max(stream.frames, 1),
+                "decode_ms": 1000 * stream.decode_time / max(stream.frames, 1),
+            } for stream in self.streams],
+        }
+
+
+def print_stream_summary(summary):
+    mode = f"{summary['groups']} grupo(s) empilhado(s)" if summary["batched"] else "um modelo por câmera"
+    print(f"📹 {len(summary['streams'])} câmera(s), modelo {summary['model']} ({mode}), "
+          f"{summary['workers']} thread(s):")
+    print(f"   {'câmera':>16} | {'frames':>6} | {'frames/s':>8} | {'ms/frame':>8} | {'modelo':>8} | "
+          f"{'espera leitura':>14}")
+    for stream in summary["streams"]:
+        print(f"   {stream['name']:>16} | {stream['frames']:6d} | {stream['fps']:8.1f} | "
+              f"{stream['busy_ms']:8.2f} | {stream['model_ms']:8.2f} | {stream['decode_ms']:11.2f} ms")
+    print(f"⏳ Total: {summary['frames']} frames em {summary['elapsed_time']:.2f} s "
+          f"({summary['fps']:.1f} frames/s agregados, modelo {summary['model_time']:.2f} s)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Subtração de fundo em várias câmeras em um único processo.")
+    parser.add_argument("manifest", help="Manifesto de câmeras (.json ou texto com uma fonte por linha)")
+    parser.add_argument("--model", choices=sorted(BACKGROUND_MODELS), default="mog2", help="Modelo de fundo")
+    parser.add_argument("--preset", default="fused", help="Preset de pós-processamento")
+    parser.add_argument("--workers", type=int, default=4, help="Threads de processamento")
+    parser.add_argument("--max-frames", type=int, help="Máximo de frames por câmera")
+    parser.add_argument("--no-batch", action="store_true", help="Um modelo por câmera mesmo para modelos NumPy")
+    parser.add_argument("--save-masks", action="store_true",
+                        help="Grava data/processed/streams/<câmera>/masks.bsm")
+    args = parser.parse_args()
+
+    runner = MultiStreamRunner(load_manifest(args.manifest), model=args.model, postprocessing=args.preset,
+                               workers=args.workers, max_frames=args.max_frames, batch=not args.no_batch,
+                               save_masks=args.save_masks)
+    print_stream_summary(runner.run())
@@ -0,0 +1,87 @@
+import numpy as np
+import json
+
+
+class FrameProfiler:
+    """Tempos por estágio e contadores por frame, acumulados em um buffer NumPy.
+
+    As colunas são fixadas na criação (estágios em segundos e contadores); cada
+    frame ocupa uma linha, e o buffer cresce em blocos. Nada é gravado durante
+    a execução: `save_csv`/`save_json` escrevem tudo de uma vez no final.
+    """
+
+    def __init__(self, stages, counters=(), capacity=1024):
+        self.stages = list(stages)
+        self.counters = list(counters)
+        self.columns = ["frame"] + self.stages + self.counters
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._data = np.zeros((capacity, len(self.columns)), np.float64)
+        self._rows = 0
+        self._row = None
+
+    def begin_frame(self, frame_num):
+        if self._rows == len(self._data):
+            self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+        self._row = self._data[self._rows]
+        self._row[0] = frame_num
+        self._rows += 1
+
+    def add_time(self, stage, seconds):
+        if self._row is not None:
+            self._row[self._index[stage]] += seconds
+
+    def set_counter(self, name, value):
+        if self._row is not None:
+            self._row[self._index[name]] = value
+
+    def end_frame(self):
+        self._row = None
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def data(self):
+        """Matriz (frames, colunas) com os registros até agora."""
+        return self._data[:self._rows]
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Média, total e percentis de latência (ms) por estágio e estatísticas dos contadores."""
+        data = self.data
+        stage_columns = data[:, 1:1 + len(self.stages)] * 1000
+        totals = stage_columns.sum(axis=1)
+
+        def describe(values):
+            if not len(values):
+                return {"mean": 0.0, "total": 0.0, **{f"p{p}": 0.0 for p in percentiles}, "max": 0.0}
+            points = np.percentile(values, percentiles)
+            return {"mean": float(values.mean()), "total": float(values.sum()),
+                    **{f"p{p}": float(v) for p, v in zip(percentiles, points)}, "max": float(values.max())}
+
+        stages = {name: describe(stage_columns[:, i]) for i, name in enumerate(self.stages)}
+        stages["frame_total"] = describe(totals)
+        counters = {name: describe(data[:, self._index[name]]) for name in self.counters}
+        return {"frames": len(self), "stages_ms": stages, "counters": counters}
+
+    def save_csv(self, path):
+        """Uma linha por frame: tempos em ms e contadores."""
+        data = self.data.copy()
+        data[:, 1:1 + len(self.stages)] *= 1000
+        header = ",".join(["frame"] + [f"{name}_ms" for name in self.stages] + self.counters)
+        formats = ["%d"] + ["%.4f"] * len(self.stages) + ["%d"] * len(self.counters)
+        np.savetxt(path, data, delimiter=",", header=header, comments="", fmt=formats)
+
+    def save_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def print_profile(summary):
+    """Tabela de latência por estágio (p50/p95/p99 em ms) de FrameProfiler.summary()."""
+    print(f"📈 Perfil por frame ({summary['frames']} frames, ms):")
+    print(f"   {'estágio':>22} | {'média':>7} | {'p50':>7} | {'p95':>7} | {'p99':>7} | {'máx':>7}")
+    for name, stats in summary["stages_ms"].items():
+        print(f"   {name:>22} | {stats['mean']:7.3f} | {stats['p50']:7.3f} | {stats['p95']:7.3f} | "
+              f"{stats['p99']:7.3f} | {stats['max']:7.3f}")
+    for name, stats in summary["counters"].items():
+        print(f"   {name:>22} | média {stats['mean']:.1f}, p50 {stats['p50']:.0f}, p99 {stats['p99']:.0f}")
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+import os
+import scipy.io
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROI_PATH = os.path.join(BASE_DIR, "../data/raw/perspective_roi.mat")
+
+
+def load_roi_mask(path=ROI_PATH):
+    """Máscara do ROI (uint8 0/255) do arquivo .mat do dataset Mall (roi.mask)."""
+    data = scipy.io.loadmat(path)
+    if "roi" not in data:
+        raise ValueError(f"Arquivo sem a variável 'roi': {path}")
+    mask = np.asarray(data["roi"][0, 0]["mask"])
+    return np.where(mask > 0, 255, 0).astype(np.uint8)
+
+
+class RegionOfInterest:
+    """Região de interesse de uma câmera fixa: máscara e a caixa delimitadora dela.
+
+    O pipeline processa só o recorte `crop(frame)` (uma visão, sem cópia), zera os
+    pixels do recorte fora do ROI com `apply` e devolve a máscara no tamanho
+    original com `paste`.
+    """
+
+    def __init__(self, mask):
+        mask = np.asarray(mask)
+        self.mask = np.where(mask > 0, 255, 0).astype(np.uint8)
+        ys, xs = np.nonzero(self.mask)
+        if not len(ys):
+            raise ValueError("ROI vazio")
+        self.y0, self.y1 = int(ys.min()), int(ys.max()) + 1
+        self.x0, self.x1 = int(xs.min()), int(xs.max()) + 1
+        self.crop_mask = np.ascontiguousarray(self.crop(self.mask))
+        self.pixels = int(len(ys))
+
+    @classmethod
+    def load(cls, path=ROI_PATH):
+        return cls(load_roi_mask(path))
+
+    @property
+    def shape(self):
+        return self.mask.shape
+
+    @property
+    def bbox(self):
+        """(x, y, w, h) do recorte processado."""
+        return self.x0, self.y0, self.x1 - self.x0, self.y1 - self.y0
+
+    def crop(self, image):
+        """Visão do recorte do ROI em uma imagem do tamanho do frame."""
+        return image[self.y0:self.y1, self.x0:self.x1]
+
+    def apply(self, cropped_mask):
+        """Zera, in-place, os pixels de uma máscara recortada que estão fora do ROI."""
+        cv2.bitwise_and(cropped_mask, self.crop_mask, dst=cropped_mask)
+        return cropped_mask
+
+    def paste(self, cropped_mask):
+        """Máscara do tamanho do frame com o recorte na posição original e zeros fora dele."""
+        full = np.zeros(self.shape, cropped_mask.dtype)
+        full[self.y0:self.y1, self.x0:self.x1] = cropped_mask
+        return full
+
+    def stats(self):
+        """Pixels processados por frame: recorte e ROI em relação ao frame inteiro."""
+        height, width = self.shape
+        x, y, w, h = self.bbox
+        frame_pixels = height * width
+        return {
+            "frame_pixels": frame_pixels,
+            "crop_pixels": w * h,
+            "roi_pixels": self.pixels,
+            "crop_fraction": w * h / frame_pixels,
+            "roi_fraction": self.pixels / frame_pixels,
+        }
+
+
+def as_region_of_interest(roi):
+    """Aceita None, um caminho .mat, uma máscara ou um RegionOfInterest."""
+    if roi is None or isinstance(roi, RegionOfInterest):
+        return roi
+    if isinstance(roi, str):
+        return RegionOfInterest.load(roi)
+    return RegionOfInterest(roi)
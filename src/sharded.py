@@ -0,0 +1,203 @@
+import cv2
+import numpy as np
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import background_subtraction as bs
+from frame_source import RAW_FRAMES_DIR, open_frame_source
+from mask_store import MaskStore, MaskStoreWriter
+
+
+def plan_shards(num_frames, workers, warmup=100):
+    """Divide [0, num_frames) em um bloco contíguo por worker.
+
+    Devolve (início, fim, aquecimento) por bloco; o aquecimento são os frames
+    imediatamente anteriores ao bloco usados só para treinar o modelo de fundo.
+    """
+    workers = max(1, min(workers, num_frames))
+    bounds = np.linspace(0, num_frames, workers + 1).astype(int)
+    return [(int(start), int(stop), min(warmup, int(start))) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _run_shard(task):
+    """Executa um bloco em um processo separado, com seu próprio MOG2 aquecido."""
+    source, start, stop, warmup, pipeline_kwargs, capture, store_path = task
+    cv2.setNumThreads(1)  # um núcleo por worker, sem disputa entre os processos
+
+    captured = {}
+    store = None
+
+    def on_mask(frame_num, mask):
+        nonlocal store
+        if frame_num in capture:
+            captured[frame_num] = mask
+        if store_path is not None:
+            if store is None:
+                store = MaskStoreWriter(store_path, mask.shape)
+            store.append(frame_num, mask)
+
+    pipeline = bs.BackgroundSubtractionPipeline(**pipeline_kwargs)
+    try:
+        summary = pipeline.run(source, max_frames=stop - start, start=start, warmup=warmup, on_mask=on_mask)
+    finally:
+        if store is not None:
+            store.close()
+    summary["start"], summary["stop"] = start, stop
+    summary["captured"] = captured
+    return summary
+
+
+def merge_mask_stores(paths, output_path):
+    """Junta os stores dos blocos (na ordem dada) em um único .bsm e apaga os dos blocos."""
+    writer = None
+    for path in paths:
+        if not os.path.exists(path):
+            continue  # bloco sem frames
+        with MaskStore(path) as store:
+            if writer is None:
+                writer = MaskStoreWriter(output_path, store.shape)
+            for frame_num, packed in zip(store.frame_numbers, store.data):
+                writer.append_packed(frame_num, packed)
+        os.remove(path)
+    if writer is not None:
+        writer.close()
+
+
+def boundary_frames(shards, window):
+    """Frames (numerados a partir de 1) logo após o início de cada bloco, exceto o primeiro."""
+    frames = set()
+    for start, stop, _ in shards[1:]:
+        frames.update(range(start + 1, min(start + window, stop) + 1))
+    return frames
+
+
+def compare_with_serial(source, captured, pipeline_kwargs, last_frame):
+    """IoU, frame a frame, entre as máscaras dos blocos e uma execução serial."""
+    serial = {}
+
+    def on_mask(frame_num, mask):
+        if frame_num in captured:
+            serial[frame_num] = mask
+
+    kwargs = dict(pipeline_kwargs, outputs=(), verbose=False)
+    bs.BackgroundSubtractionPipeline(**kwargs).run(source, max_frames=last_frame, on_mask=on_mask)
+
+    ious = {}
+    for frame_num, mask in captured.items():
+        expected, result = serial[frame_num] > 0, mask > 0
+        union = np.count_nonzero(expected | result)
+        ious[frame_num] = np.count_nonzero(expected & result) / union if union else 1.0
+    return ious
+
+
+def run_sharded(source=RAW_FRAMES_DIR, workers=None, warmup=100, max_frames=None,
+                compare_window=0, **pipeline_kwargs):
+    """Executa o pipeline em blocos paralelos (um processo por bloco) e junta os resultados em ordem.
+
+    Cada worker aquece seu próprio MOG2 com os `warmup` frames anteriores ao bloco.
+    Com `compare_window > 0`, os primeiros frames de cada bloco são comparados
+    com uma execução serial para medir o erro introduzido nas fronteiras.
+    """
+    workers = workers or os.cpu_count() or 1
+    with open_frame_source(source, prefetch=0, stop=max_frames) as frames:
+        num_frames = len(frames)
+
+    pipeline_kwargs.setdefault("verbose", False)
+    outputs = pipeline_kwargs.get("outputs", bs.OUTPUT_PRESETS["default"])
+    if isinstance(outputs, str):
+        outputs = bs.OUTPUT_PRESETS[outputs]
+    write_log = "log" in outputs
+    write_store = "mask_store" in outputs
+    # O log e o masks.bsm de cada bloco sobrescreveriam os dos outros: o log é gravado uma vez,
+    # após a junção, e cada bloco grava seu próprio store, juntado depois na ordem dos frames.
+    # As identidades do rastreador não continuam entre blocos, então não há trajetórias.
+    pipeline_kwargs["outputs"] = tuple(output for output in outputs
+                                       if output not in {"log", "display", "mask_store", "trajectories"}
+                                       and not output.startswith("video_"))
+    if set(outputs) - set(pipeline_kwargs["outputs"]) - {"log", "mask_store"}:
+        print("⚠️ Vídeos, janelas e trajetórias não são suportados no modo em blocos e foram ignorados.")
+    output_dir = pipeline_kwargs.get("output_dir", bs.OUTPUT_DIR)
+
+    shards = plan_shards(num_frames, workers, warmup)
+    capture = boundary_frames(shards, compare_window) if compare_window else set()
+    store_paths = [os.path.join(output_dir, f"masks.shard{start:08d}.bsm") if write_store else None
+                   for start, _, _ in shards]
+    tasks = [(source, start, stop, shard_warmup, pipeline_kwargs, capture, store_path)
+             for (start, stop, shard_warmup), store_path in zip(shards, store_paths)]
+
+    start_time = time.time()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+        summaries = list(executor.map(_run_shard, tasks))
+    elapsed_time = time.time() - start_time
+
+    # Junta as estatísticas por frame na ordem dos frames
+    frame_stats = [stat for summary in summaries for stat in summary["frame_stats"]]
+    if write_log:
+        os.makedirs(pipeline_kwargs.get("debug_dir", bs.DEBUG_DIR), exist_ok=True)
+        bs.write_log(frame_stats, os.path.join(pipeline_kwargs.get("debug_dir", bs.DEBUG_DIR), "debug_log.txt"))
+    if write_store:
+        merge_mask_stores(store_paths, os.path.join(output_dir, "masks.bsm"))
+
+    stage_times = {}
+    for summary in summaries:
+        for name, seconds in summary["stage_times"].items():
+            stage_times[name] = stage_times.get(name, 0.0) + seconds
+
+    warmup_frames = sum(summary["warmup_frames"] for summary in summaries)
+    result = {
+        "frames": len(frame_stats),
+        "elapsed_time": elapsed_time,
+        "stage_times": stage_times,
+        "frame_stats": frame_stats,
+        "shards": [(s["start"], s["stop"], s["warmup_frames"], s["elapsed_time"]) for s in summaries],
+        "warmup_frames": warmup_frames,
+        "warmup_time": sum(summary["warmup_time"] for summary in summaries),
+        "warmup_overhead": warmup_frames / len(frame_stats) if frame_stats else 0.0,
+    }
+
+    if capture:
+        captured = {}
+        for summary in summaries:
+            captured.update(summary["captured"])
+        result["boundary_iou"] = compare_with_serial(source, captured, pipeline_kwargs, max(captured))
+    return result
+
+
+def print_sharded_summary(result):
+    print(f"\n⏳ Processamento em {len(result['shards'])} bloco(s) concluído! "
+          f"{result['frames']} frames em {result['elapsed_time']:.2f} s "
+          f"({result['frames'] / result['elapsed_time']:.1f} frames/s)")
+    for start, stop, warmup, elapsed in result["shards"]:
+        print(f"   frames {start + 1}-{stop}: aquecimento de {warmup} frames, {elapsed:.2f} s")
+    print(f"🔥 Aquecimento: {result['warmup_frames']} frames extras "
+          f"({100 * result['warmup_overhead']:.1f}% a mais de MOG2), {result['warmup_time']:.2f} s no total")
+
+    if "boundary_iou" in result:
+        ious = result["boundary_iou"]
+        values = np.array(list(ious.values()))
+        print(f"🔍 Fronteiras vs. execução serial ({len(ious)} frames): "
+              f"IoU médio {values.mean():.4f}, mínimo {values.min():.4f}")
+        worst = sorted(ious.items(), key=lambda item: item[1])[:5]
+        print("   piores frames: " + ", ".join(f"{frame_num} ({iou:.4f})" for frame_num, iou in worst))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Subtração de fundo em blocos paralelos (um processo por bloco).")
+    parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou arquivo de vídeo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Número de processos")
+    parser.add_argument("--warmup", type=int, default=100, help="Frames de aquecimento do MOG2 por bloco")
+    parser.add_argument("--max-frames", type=int, help="Processa no máximo N frames")
+    parser.add_argument("--preset", choices=sorted(bs.OUTPUT_PRESETS), default="default",
+                        help="Política de saídas pronta")
+    parser.add_argument("--compare-window", type=int, default=0,
+                        help="Compara os N primeiros frames de cada bloco com uma execução serial")
+    args = parser.parse_args()
+
+    result = run_sharded(args.source, workers=args.workers, warmup=args.warmup, max_frames=args.max_frames,
+                         compare_window=args.compare_window, outputs=args.preset)
+    print_sharded_summary(result)
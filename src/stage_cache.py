@@ -0,0 +1,269 @@
+import os
+import ast
+import json
+import time
+import shutil
+import hashlib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "../data/cache")
+
+MANIFEST = "manifest.json"
+FINGERPRINTS = "fingerprints.json"
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _list_files(path):
+    """Arquivos de `path` (ele mesmo, ou todos os arquivos do diretório em ordem)."""
+    if os.path.isdir(path):
+        return [os.path.join(root, name)
+                for root, dirs, names in sorted(os.walk(path)) for name in sorted(names)]
+    return [path] if os.path.exists(path) else []
+
+
+def _tree_size(path):
+    return sum(os.path.getsize(f) for f in _list_files(path))
+
+
+def module_sources(*modules, source_dir=BASE_DIR):
+    """Arquivos .py de `source_dir` importados (direta ou indiretamente) pelos `modules`.
+
+    Segue os `import`/`from ... import` de cada arquivo, inclusive os feitos dentro
+    de funções, mas só entre módulos do próprio `source_dir` (cv2, numpy etc. ficam
+    de fora). Serve de entrada "código da etapa" na chave do cache.
+    """
+    found = []
+    pending = list(modules)
+    while pending:
+        path = os.path.join(source_dir, pending.pop() + ".py")
+        if path in found or not os.path.exists(path):
+            continue
+        found.append(path)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split(".")[0])
+    return sorted(found)
+
+
+class StageCache:
+    """Cache de etapas do pipeline endereçado pelo conteúdo das entradas e pela configuração.
+
+    A chave de uma etapa é o hash do conteúdo dos arquivos de entrada (frames,
+    máscaras, código da etapa) e da configuração (parâmetros do MOG2, kernels,
+    limiares). Numa chave conhecida, as saídas guardadas são restauradas e a etapa
+    não é executada. Entradas antigas são removidas por idade e pelo tamanho total
+    (as menos usadas primeiro). Os hashes dos arquivos são memorizados por
+    (tamanho, mtime) para que a verificação de uma sequência inalterada seja barata.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=2 * 1024 ** 3, max_age_days=7):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self.hits = {}
+        self.misses = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._fingerprints_path = os.path.join(cache_dir, FINGERPRINTS)
+        try:
+            with open(self._fingerprints_path, encoding="utf-8") as f:
+                self._fingerprints = json.load(f)
+        except (OSError, ValueError):
+            self._fingerprints = {}
+        self._fingerprints_dirty = False
+
+    def fingerprint(self, path):
+        """Hash do conteúdo de um arquivo, recalculado só se tamanho ou mtime mudaram."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        known = self._fingerprints.get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        digest = _file_digest(path)
+        self._fingerprints[path] = [st.st_size, st.st_mtime_ns, digest]
+        self._fingerprints_dirty = True
+        return digest
+
+    def key(self, stage, config, inputs):
+        """Chave da etapa: hash da configuração e do conteúdo de todos os arquivos de entrada."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"stage": stage, "config": config}, sort_keys=True, default=str).encode("utf-8"))
+        for path in inputs:
+            for file_path in _list_files(path):
+                digest.update(os.path.relpath(file_path, os.path.dirname(os.path.abspath(path))).encode("utf-8"))
+                digest.update(self.fingerprint(file_path).encode("ascii"))
+        self._save_fingerprints()
+        return digest.hexdigest()
+
+    def _save_fingerprints(self):
+        if not self._fingerprints_dirty:
+            return
+        tmp_path = self._fingerprints_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._fingerprints, f)
+        os.replace(tmp_path, self._fingerprints_path)
+        self._fingerprints_dirty = False
+
+    def _entry_dir(self, stage, key):
+        return os.path.join(self.cache_dir, stage, key)
+
+    def _read_manifest(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, entry_dir, manifest):
+        tmp_path = os.path.join(entry_dir, MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp_path, os.path.join(entry_dir, MANIFEST))
+
+    def lookup(self, stage, key):
+        """Manifesto da entrada (stage, key), ou None se ela não existe."""
+        entry_dir = self._entry_dir(stage, key)
+        manifest = self._read_manifest(entry_dir)
+        if manifest is None:
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return None
+        self.hits[stage] = self.hits.get(stage, 0) + 1
+        manifest["last_used"] = time.time()
+        self._write_manifest(entry_dir, manifest)
+        return manifest
+
+    def store(self, stage, key, outputs, result=None):
+        """Guarda as saídas da etapa ({nome: caminho de arquivo ou diretório}) e o resultado."""
+        entry_dir = self._entry_dir(stage, key)
+        tmp_dir = entry_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        stored = {}
+        for name, path in outputs.items():
+            if os.path.isdir(path):
+                shutil.copytree(path, os.path.join(tmp_dir, name))
+            elif os.path.exists(path):
+                shutil.copy2(path, os.path.join(tmp_dir, name))
+            else:
+                continue
+            stored[name] = path
+
+        try:
+            json.dumps(result)
+        except (TypeError, ValueError):
+            result = None
+        now = time.time()
+        manifest = {"stage": stage, "key": key, "created": now, "last_used": now,
+                    "outputs": stored, "size": _tree_size(tmp_dir), "result": result}
+        self._write_manifest(tmp_dir, manifest)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        self.evict()
+        return manifest
+
+    def restore(self, stage, key, manifest):
+        """Copia as saídas guardadas de volta aos caminhos originais (substituindo o que houver lá)."""
+        entry_dir = self._entry_dir(stage, key)
+        for name, path in manifest["outputs"].items():
+            source = os.path.join(entry_dir, name)
+            if os.path.isdir(source):
+                shutil.rmtree(path, ignore_errors=True)
+                shutil.copytree(source, path)
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                shutil.copy2(source, path)
+
+    def run(self, stage, func, config, inputs, outputs, *args, **kwargs):
+        """Executa `func(*args, **kwargs)` ou restaura suas saídas de uma execução idêntica anterior.
+
+        Devolve o resultado da função (o guardado, em um acerto, se era serializável em JSON).
+        """
+        key = self.key(stage, config, inputs)
+        manifest = self.lookup(stage, key)
+        if manifest is not None:
+            self.restore(stage, key, manifest)
+            print(f"♻️ Cache: '{stage}' sem mudanças ({key[:12]}), saídas restauradas")
+            return manifest["result"]
+
+        result = func(*args, **kwargs)
+        self.store(stage, key, outputs, result)
+        return result
+
+    def entries(self):
+        """Manifestos de todas as entradas do cache."""
+        entries = []
+        for stage in sorted(os.listdir(self.cache_dir)):
+            stage_dir = os.path.join(self.cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for key in os.listdir(stage_dir):
+                manifest = self._read_manifest(os.path.join(stage_dir, key))
+                if manifest is not None:
+                    entries.append(manifest)
+        return entries
+
+    def evict(self):
+        """Remove entradas mais velhas que max_age e, depois, as menos usadas até caber em max_bytes."""
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda manifest: manifest["last_used"])
+        total = sum(manifest["size"] for manifest in entries)
+        removed = 0
+        for manifest in entries:
+            if now - manifest["last_used"] <= self.max_age and total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(manifest["stage"], manifest["key"]), ignore_errors=True)
+            total -= manifest["size"]
+            removed += 1
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._fingerprints = {}
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "entries": len(entries),
+            "size": sum(manifest["size"] for manifest in entries),
+        }
+
+    def report(self):
+        stats = self.stats()
+        stages = sorted(set(stats["hits"]) | set(stats["misses"]))
+        print(f"\n♻️ Cache de etapas: {stats['entries']} entrada(s), {stats['size'] / 1e6:.1f} MB em {self.cache_dir}")
+        for stage in stages:
+            print(f"   {stage}: {stats['hits'].get(stage, 0)} acerto(s), {stats['misses'].get(stage, 0)} falta(s)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gerencia o cache de etapas do pipeline.")
+    parser.add_argument("--evict", action="store_true", help="Aplica a política de idade/tamanho agora")
+    parser.add_argument("--clear", action="store_true", help="Apaga todo o cache")
+    parser.add_argument("--max-mb", type=float, default=2048, help="Tamanho máximo do cache (MB)")
+    parser.add_argument("--max-age-days", type=float, default=7, help="Idade máxima de uma entrada (dias)")
+    args = parser.parse_args()
+
+    cache = StageCache(max_bytes=int(args.max_mb * 1024 ** 2), max_age_days=args.max_age_days)
+    if args.clear:
+        cache.clear()
+        print("🧹 Cache apagado.")
+    elif args.evict:
+        print(f"🧹 {cache.evict()} entrada(s) removida(s).")
+    cache.report()
@@ -0,0 +1,312 @@
+import cv2
+import numpy as np
+import os
+import json
+import time
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import background_subtraction as bs
+from evaluate import GROUND_TRUTH_DIR, RESULTS_DIR, StreamingEvaluator, load_binary_mask
+from frame_source import RAW_FRAMES_DIR, open_frame_source
+from mask_store import GROUND_TRUTH_STORE, MaskStore, mask_filename
+from postprocessing import filter_regions
+from tracker import box_iou
+
+# Parâmetros da varredura e seus valores padrão (os do script original)
+DEFAULT_GRID = {
+    "history": [100],
+    "var_threshold": [40],
+    "median_kernel": [5],
+    "morph_kernel": [5],
+    "min_size": [500],
+    "min_box_area": [300],
+}
+METRIC_NAMES = ["Accuracy", "Precision", "Recall", "F1-Score", "IoU"]
+
+# Kernels que precisam ser ímpares: a mediana não aceita tamanho par, e na morfologia
+# um kernel par desloca a máscara (âncora fora do centro)
+KERNEL_PARAMS = ("median_kernel", "morph_kernel")
+
+# Caixas da ground truth: componentes com w*h acima deste limiar (fixo para todas as configurações)
+GT_MIN_BOX_AREA = 300
+BOX_IOU_MATCH = 0.5
+
+
+def sweep_operations(median_kernel=5, morph_kernel=5, min_size=500):
+    """Cadeia de pós-processamento original com os kernels e a área mínima dados."""
+    return (("median", median_kernel), ("open", morph_kernel), ("close", morph_kernel),
+            ("close", morph_kernel), ("open", morph_kernel),
+            ("median", median_kernel),
+            ("remove_small_regions", min_size))
+
+
+def expand_grid(grid):
+    """Lista de configurações (dicionários) com todas as combinações dos valores de `grid`.
+
+    Levanta ValueError para kernels pares (ou menores que 1) em KERNEL_PARAMS.
+    """
+    grid = {**DEFAULT_GRID, **grid}
+    for name in KERNEL_PARAMS:
+        invalid = [size for size in grid[name] if size < 1 or size % 2 == 0]
+        if invalid:
+            raise ValueError(f"{name} precisa de valores ímpares e positivos: {invalid}")
+    names = list(DEFAULT_GRID)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def load_sequence(source=RAW_FRAMES_DIR, max_frames=None, ground_truth=None):
+    """Decodifica a sequência uma vez, em tons de cinza, direto em um bloco de memória compartilhada.
+
+    Devolve (bloco dos frames, bloco da GT, forma (N, H, W), números dos frames). A GT
+    vem de um diretório de PNGs (mask_XXXX.png) ou de um store .bsm; frames sem GT são
+    descartados.
+    """
+    ground_truth = ground_truth or (GROUND_TRUTH_DIR if os.path.isdir(GROUND_TRUTH_DIR)
+                                    and any(f.endswith(".png") for f in os.listdir(GROUND_TRUTH_DIR))
+                                    else GROUND_TRUTH_STORE)
+    store = MaskStore(ground_truth) if ground_truth.endswith(".bsm") else None
+
+    with open_frame_source(source, grayscale=True, prefetch=8, stop=max_frames) as frames:
+        capacity = len(frames)
+        frames_shm = gt_shm = None
+        count = 0
+        frame_numbers = []
+        try:
+            for frame_num, frame in frames:
+                if store is not None:
+                    gt = store.get(frame_num) if frame_num in store else None
+                else:
+                    gt = load_binary_mask(os.path.join(ground_truth, mask_filename(frame_num)))
+                if gt is None:
+                    continue
+                if frames_shm is None:
+                    shape = (capacity,) + frame.shape
+                    frames_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+                    gt_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+                    frame_stack = np.ndarray(shape, np.uint8, buffer=frames_shm.buf)
+                    gt_stack = np.ndarray(shape, np.uint8, buffer=gt_shm.buf)
+                frame_stack[count] = frame
+                gt_stack[count] = gt
+                frame_numbers.append(frame_num)
+                count += 1
+        except BaseException:
+            for shm in (frames_shm, gt_shm):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+            raise
+        finally:
+            if store is not None:
+                store.close()
+
+    if not count:
+        raise FileNotFoundError(f"Nenhum frame com ground truth em {ground_truth} "
+                                f"(rode background_subtraction.py e generate_ground_truth.py antes)")
+    del frame_stack, gt_stack
+    return frames_shm, gt_shm, (count,) + shape[1:], frame_numbers
+
+
+# Estado de cada processo do pool: visões das pilhas compartilhadas (sem cópia)
+_shared = {}
+
+
+def _attach(frames_name, gt_name, shape, frame_numbers):
+    cv2.setNumThreads(1)  # um núcleo por worker, sem disputa entre os processos
+    frames_shm = shared_memory.SharedMemory(name=frames_name)
+    gt_shm = shared_memory.SharedMemory(name=gt_name)
+    _shared.update(
+        frames_shm=frames_shm, gt_shm=gt_shm, frame_numbers=frame_numbers,
+        frames=np.ndarray(shape, np.uint8, buffer=frames_shm.buf),
+        gt=np.ndarray(shape, np.uint8, buffer=gt_shm.buf),
+    )
+
+
+def _box_matches(pred_boxes, gt_boxes):
+    """(caixas previstas com par, caixas da GT com par), com IoU >= BOX_IOU_MATCH."""
+    if not len(pred_boxes) or not len(gt_boxes):
+        return 0, 0
+    iou = box_iou(pred_boxes.astype(np.float32), gt_boxes.astype(np.float32))
+    matched = iou >= BOX_IOU_MATCH
+    return int(matched.any(axis=1).sum()), int(matched.any(axis=0).sum())
+
+
+def evaluate_config(config):
+    """Executa uma configuração sobre a sequência compartilhada e devolve custo e métricas.
+
+    Só `process` e `boxes` são cronometrados; a avaliação (métricas de pixel do
+    evaluate.py e casamento de caixas com a GT) fica fora do tempo por frame.
+    """
+    frames, gt_stack, frame_numbers = _shared["frames"], _shared["gt"], _shared["frame_numbers"]
+    pipeline = bs.BackgroundSubtractionPipeline(
+        history=config["history"], var_threshold=config["var_threshold"],
+        postprocessing=sweep_operations(config["median_kernel"], config["morph_kernel"], config["min_size"]),
+        min_box_area=config["min_box_area"], outputs=(), verbose=False)
+
+    evaluator = StreamingEvaluator()
+    pred_boxes = gt_boxes = pred_matched = gt_matched = 0
+    elapsed = 0.0
+    for frame_num, frame, gt in zip(frame_numbers, frames, gt_stack):
+        t0 = time.perf_counter()
+        mask = pipeline.process(frame)
+        boxes = pipeline.boxes(mask)
+        elapsed += time.perf_counter() - t0
+
+        evaluator.update(mask_filename(frame_num), gt, mask)
+        _, stats, _ = filter_regions(gt, min_size=0)
+        truth = stats[:, :4]
+        truth = truth[truth[:, 2] * truth[:, 3] > GT_MIN_BOX_AREA]
+        matched_pred, matched_gt = _box_matches(boxes, truth)
+        pred_boxes += len(boxes)
+        gt_boxes += len(truth)
+        pred_matched += matched_pred
+        gt_matched += matched_gt
+
+    box_precision = pred_matched / pred_boxes if pred_boxes else 0.0
+    box_recall = gt_matched / gt_boxes if gt_boxes else 0.0
+    box_f1 = (2 * box_precision * box_recall / (box_precision + box_recall)
+              if box_precision + box_recall else 0.0)
+    return {
+        **config,
+        **evaluator.means(),
+        "frames": len(frame_numbers),
+        "ms_per_frame": 1000 * elapsed / len(frame_numbers),
+        "boxes_per_frame": pred_boxes / len(frame_numbers),
+        "box_precision": box_precision,
+        "box_recall": box_recall,
+        "box_f1": box_f1,
+    }
+
+
+def pareto_front(results, metric, cost="ms_per_frame"):
+    """Índices das configurações não dominadas.
+
+    Uma configuração é dominada quando outra é tão boa em `metric` e tão rápida, e melhor em um dos dois.
+    """
+    quality = np.array([result[metric] for result in results])
+    costs = np.array([result[cost] for result in results])
+    dominated = ((quality[None, :] >= quality[:, None]) & (costs[None, :] <= costs[:, None])
+                 & ((quality[None, :] > quality[:, None]) | (costs[None, :] < costs[:, None])))
+    return set(np.flatnonzero(~dominated.any(axis=1)).tolist())
+
+
+def run_sweep(grid, source=RAW_FRAMES_DIR, max_frames=None, ground_truth=None, workers=None,
+              metric="F1-Score"):
+    """Varre as combinações de `grid` em um pool de processos e devolve os resultados ordenados por `metric`.
+
+    A sequência é decodificada uma única vez para memória compartilhada; cada
+    processo do pool lê os frames e a GT direto desse bloco, sem cópia.
+    """
+    configs = expand_grid(grid)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(configs)))
+
+    t0 = time.perf_counter()
+    frames_shm, gt_shm, shape, frame_numbers = load_sequence(source, max_frames, ground_truth)
+    decode_time = time.perf_counter() - t0
+    try:
+        t0 = time.perf_counter()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_attach,
+                                 initargs=(frames_shm.name, gt_shm.name, shape, frame_numbers)) as executor:
+            results = list(executor.map(evaluate_config, configs))
+        sweep_time = time.perf_counter() - t0
+    finally:
+        for shm in (frames_shm, gt_shm):
+            shm.close()
+            shm.unlink()
+
+    front = pareto_front(results, metric)
+    for index, result in enumerate(results):
+        result["pareto"] = index in front
+    results.sort(key=lambda result: (-result[metric], result["ms_per_frame"]))
+    return {
+        "results": results,
+        "metric": metric,
+        "frames": shape[0],
+        "frame_shape": shape[1:],
+        "configs": len(configs),
+        "workers": workers,
+        "decode_time": decode_time,
+        "sweep_time": sweep_time,
+        "shared_mb": 2 * int(np.prod(shape)) / 2 ** 20,
+    }
+
+
+def save_sweep_table(sweep, path):
+    columns = list(DEFAULT_GRID) + ["frames", "ms_per_frame"] + METRIC_NAMES + [
+        "boxes_per_frame", "box_precision", "box_recall", "box_f1", "pareto"]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(columns) + "\n")
+        for result in sweep["results"]:
+            f.write(",".join(str(result[column]) for column in columns) + "\n")
+
+
+def print_sweep(sweep, top=None):
+    print(f"📦 {sweep['frames']} frames {sweep['frame_shape'][1]}x{sweep['frame_shape'][0]} decodificados uma vez "
+          f"em {sweep['decode_time']:.2f} s ({sweep['shared_mb']:.0f} MB compartilhados com GT)")
+    print(f"⏳ {sweep['configs']} configurações em {sweep['workers']} processo(s): {sweep['sweep_time']:.2f} s")
+    metric = sweep["metric"]
+    print(f"\n{'#':>3} | {'hist':>4} | {'varT':>5} | {'med':>3} | {'morf':>4} | {'área':>5} | {'caixa':>5} | "
+          f"{'ms/frame':>8} | {'Accuracy':>8} | {'F1':>6} | {'IoU':>6} | {'caixas F1':>9} | Pareto")
+    for rank, result in enumerate(sweep["results"][:top], 1):
+        print(f"{rank:3d} | {result['history']:4d} | {result['var_threshold']:5g} | {result['median_kernel']:3d} | "
+              f"{result['morph_kernel']:4d} | {result['min_size']:5d} | {result['min_box_area']:5d} | "
+              f"{result['ms_per_frame']:8.2f} | {result['Accuracy']:8.4f} | {result['F1-Score']:6.4f} | "
+              f"{result['IoU']:6.4f} | {result['box_f1']:9.4f} | {'★' if result['pareto'] else ''}")
+    print(f"\n★ = fronteira de Pareto ({metric} x ms/frame)")
+
+
+def odd_kernel(value):
+    """Tipo do argparse para tamanhos de kernel: inteiro ímpar e positivo."""
+    import argparse
+
+    size = int(value)
+    if size < 1 or size % 2 == 0:
+        raise argparse.ArgumentTypeError(f"kernel precisa ser ímpar e positivo: {value}")
+    return size
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Varredura paralela de parâmetros do MOG2 e do pós-processamento.")
+    parser.add_argument("--source", default=RAW_FRAMES_DIR, help="Diretório de frames ou arquivo de vídeo")
+    parser.add_argument("--ground-truth", help="Diretório de máscaras GT ou store .bsm (padrão: data/ground_truth)")
+    parser.add_argument("--max-frames", type=int, help="Número máximo de frames da sequência")
+    parser.add_argument("--grid", help="Arquivo JSON {parâmetro: [valores]} (os argumentos abaixo têm prioridade)")
+    parser.add_argument("--history", type=int, nargs="+", help="Valores de history do MOG2")
+    parser.add_argument("--var-threshold", type=float, nargs="+", help="Valores de varThreshold do MOG2")
+    parser.add_argument("--median-kernel", type=odd_kernel, nargs="+", help="Kernels (ímpares) do filtro de mediana")
+    parser.add_argument("--morph-kernel", type=odd_kernel, nargs="+", help="Kernels (ímpares) da abertura/fechamento")
+    parser.add_argument("--min-size", type=int, nargs="+", help="Áreas mínimas do remove_small_regions")
+    parser.add_argument("--min-box-area", type=int, nargs="+", help="Limiares w*h das caixas")
+    parser.add_argument("--workers", type=int, help="Processos do pool (padrão: número de CPUs)")
+    parser.add_argument("--metric", choices=METRIC_NAMES + ["box_f1"], default="F1-Score",
+                        help="Métrica de ordenação e da fronteira de Pareto")
+    parser.add_argument("--top", type=int, help="Mostra só as N primeiras linhas")
+    parser.add_argument("--output", help="Arquivo CSV da tabela (padrão: data/results/parameter_sweep.csv)")
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid.update(json.load(f))
+    for name in DEFAULT_GRID:
+        if getattr(args, name) is not None:
+            grid[name] = getattr(args, name)
+    unknown = set(grid) - set(DEFAULT_GRID)
+    if unknown:
+        parser.error(f"Parâmetros desconhecidos na grade: {sorted(unknown)}")
+    try:
+        expand_grid(grid)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sweep = run_sweep(grid, args.source, args.max_frames, args.ground_truth, args.workers, args.metric)
+    print_sweep(sweep, args.top)
+    output = args.output or os.path.join(RESULTS_DIR, "parameter_sweep.csv")
+    save_sweep_table(sweep, output)
+    print(f"✅ Tabela salva em: {output}")
@@ -0,0 +1,193 @@
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Um registro por (trilha, frame) em que a trilha foi associada a um blob
+TRAJECTORY_DTYPE = np.dtype([
+    ("track_id", np.int32), ("frame", np.int32),
+    ("cx", np.float32), ("cy", np.float32),
+    ("x", np.int16), ("y", np.int16), ("w", np.int16), ("h", np.int16),
+    ("area", np.int32),
+])
+
+# Custo de pares fora do gate; maior que qualquer custo aceitável
+_INFEASIBLE = 1e6
+
+
+def box_iou(boxes_a, boxes_b):
+    """Matriz (A, B) de IoU entre caixas (x, y, w, h), calculada por broadcasting."""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    ix = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    iy = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(ix, 0, None) * np.clip(iy, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class MultiObjectTracker:
+    """Rastreador de blobs com identidades persistentes entre frames.
+
+    As detecções são as estatísticas dos componentes que o remove_small_regions
+    já calculou (`pipeline.regions`), sem novo findContours. A cada frame, as
+    trilhas ativas são previstas com velocidade constante e associadas aos blobs
+    pela atribuição ótima (`linear_sum_assignment`) sobre o custo
+    (1 - IoU) + distância dos centróides / max_distance; pares mais distantes
+    que `max_distance` e sem sobreposição são proibidos. O estado fica em
+    arrays por trilha (caixa, centróide, velocidade, acertos, falhas), e cada
+    associação vira uma linha de um buffer estruturado (TRAJECTORY_DTYPE).
+    """
+
+    def __init__(self, min_area=300, max_distance=60.0, max_misses=5, min_hits=3, velocity_smoothing=0.5,
+                 capacity=4096):
+        self.min_area = min_area
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.velocity_smoothing = velocity_smoothing
+
+        # Estado das trilhas ativas (uma linha por trilha, compactado a cada frame)
+        self.ids = np.empty(0, np.int32)
+        self.boxes = np.empty((0, 4), np.float32)
+        self.centroids = np.empty((0, 2), np.float32)
+        self.velocities = np.empty((0, 2), np.float32)
+        self.hits = np.empty(0, np.int32)
+        self.misses = np.empty(0, np.int32)
+        self.next_id = 1
+
+        self._records = np.empty(capacity, TRAJECTORY_DTYPE)
+        self._count = 0
+        self.frames = 0
+        self.max_active = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _detections(self, regions):
+        stats, centroids = regions
+        boxes = stats[:, :4]
+        keep = boxes[:, 2].astype(np.int64) * boxes[:, 3] > self.min_area
+        return stats[keep], centroids[keep].astype(np.float32)
+
+    def _record(self, frame_num, ids, stats, centroids):
+        n = len(ids)
+        if self._count + n > len(self._records):
+            grown = np.empty(max(2 * len(self._records), self._count + n), TRAJECTORY_DTYPE)
+            grown[:self._count] = self._records[:self._count]
+            self._records = grown
+        rows = self._records[self._count:self._count + n]
+        rows["track_id"] = ids
+        rows["frame"] = frame_num
+        rows["cx"], rows["cy"] = centroids[:, 0], centroids[:, 1]
+        rows["x"], rows["y"], rows["w"], rows["h"] = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+        rows["area"] = stats[:, cv2.CC_STAT_AREA]
+        self._count += n
+
+    def cost_matrix(self, det_boxes, det_centroids):
+        """Custos (trilhas, detecções) a partir das posições previstas das trilhas."""
+        predicted = self.centroids + self.velocities
+        predicted_boxes = self.boxes.copy()
+        predicted_boxes[:, :2] += self.velocities
+        iou = box_iou(predicted_boxes, det_boxes)
+        distance = np.sqrt(((predicted[:, None, :] - det_centroids[None, :, :]) ** 2).sum(axis=2))
+        cost = (1.0 - iou) + distance / self.max_distance
+        cost[(distance > self.max_distance) & (iou <= 0)] = _INFEASIBLE
+        return cost
+
+    def update(self, frame_num, regions):
+        """Associa os blobs de um frame às trilhas; devolve (ids, caixas) das trilhas confirmadas vistas nele.
+
+        `regions` é (stats, centróides) como em `BackgroundSubtractionPipeline.regions`.
+        """
+        stats, det_centroids = self._detections(regions)
+        det_boxes = stats[:, :4].astype(np.float32)
+        num_tracks, num_dets = len(self.ids), len(stats)
+        self.frames += 1
+
+        matched_tracks = matched_dets = np.empty(0, np.intp)
+        if num_tracks and num_dets:
+            cost = self.cost_matrix(det_boxes, det_centroids)
+            rows, cols = linear_sum_assignment(cost)
+            valid = cost[rows, cols] < _INFEASIBLE
+            matched_tracks, matched_dets = rows[valid], cols[valid]
+
+        # Trilhas associadas: velocidade suavizada, nova caixa/centróide, acerto
+        if len(matched_tracks):
+            step = det_centroids[matched_dets] - self.centroids[matched_tracks]
+            a = self.velocity_smoothing
+            self.velocities[matched_tracks] = a * self.velocities[matched_tracks] + (1 - a) * step
+            self.centroids[matched_tracks] = det_centroids[matched_dets]
+            self.boxes[matched_tracks] = det_boxes[matched_dets]
+            self.hits[matched_tracks] += 1
+
+        # Trilhas sem blob: uma falha a mais; descartadas depois de max_misses seguidas
+        unmatched = np.ones(num_tracks, bool)
+        unmatched[matched_tracks] = False
+        self.misses[unmatched] += 1
+        self.misses[matched_tracks] = 0
+
+        # Registro das associações do frame (ids lidos antes da compactação)
+        matched_ids = self.ids[matched_tracks]
+
+        # Blobs sem trilha: novas trilhas
+        new = np.ones(num_dets, bool)
+        new[matched_dets] = False
+        new_count = int(new.sum())
+        new_ids = np.arange(self.next_id, self.next_id + new_count, dtype=np.int32)
+        self.next_id += new_count
+
+        keep = self.misses <= self.max_misses
+        self.ids = np.concatenate([self.ids[keep], new_ids])
+        self.boxes = np.concatenate([self.boxes[keep], det_boxes[new]])
+        self.centroids = np.concatenate([self.centroids[keep], det_centroids[new]])
+        self.velocities = np.concatenate([self.velocities[keep], np.zeros((new_count, 2), np.float32)])
+        self.hits = np.concatenate([self.hits[keep], np.ones(new_count, np.int32)])
+        self.misses = np.concatenate([self.misses[keep], np.zeros(new_count, np.int32)])
+        self.max_active = max(self.max_active, len(self.ids))
+
+        order = np.concatenate([matched_dets, np.flatnonzero(new)])
+        self._record(frame_num, np.concatenate([matched_ids, new_ids]), stats[order], det_centroids[order])
+
+        confirmed = self.hits >= self.min_hits
+        visible = confirmed & (self.misses == 0)
+        return self.ids[visible], self.boxes[visible].astype(np.int32)
+
+    def trajectories(self, min_hits=None):
+        """Registros (TRAJECTORY_DTYPE) ordenados por trilha e frame, só das trilhas com >= min_hits frames."""
+        min_hits = self.min_hits if min_hits is None else min_hits
+        records = self._records[:self._count]
+        ids, counts = np.unique(records["track_id"], return_counts=True)
+        records = records[np.isin(records["track_id"], ids[counts >= min_hits])]
+        return records[np.lexsort((records["frame"], records["track_id"]))]
+
+    def save(self, path, min_hits=None):
+        """Grava as trajetórias em um .npy estruturado (lido com np.load(path, mmap_mode="r"))."""
+        records = self.trajectories(min_hits)
+        np.save(path, records)
+        return records
+
+    def summary(self):
+        records = self.trajectories()
+        ids, lengths = np.unique(records["track_id"], return_counts=True)
+        return {
+            "frames": self.frames,
+            "tracks": len(ids),
+            "max_active": self.max_active,
+            "records": len(records),
+            "mean_length": float(lengths.mean()) if len(lengths) else 0.0,
+            "max_length": int(lengths.max()) if len(lengths) else 0,
+        }
+
+
+def split_trajectories(records):
+    """{track_id: registros da trilha} a partir de um array ordenado por trilha (como o salvo por `save`)."""
+    if not len(records):
+        return {}
+    boundaries = np.flatnonzero(np.diff(records["track_id"])) + 1
+    return {int(chunk["track_id"][0]): chunk for chunk in np.split(records, boundaries)}
+
+
+def track_color(track_id):
+    """Cor BGR estável para uma trilha."""
+    rng = np.random.default_rng(int(track_id))
+    return tuple(int(c) for c in rng.integers(64, 256, 3))
@@ -4,77 +4,81 @@ import os
 import random
 import matplotlib.pyplot as plt
 
+from comparison_renderer import xor_diff
+from evaluate import load_binary_mask, mask_pair_filenames
+from mask_store import GROUND_TRUTH_STORE, MaskStore, mask_filename, use_packed_masks
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 GROUND_TRUTH_DIR = os.path.join(BASE_DIR, "../data/ground_truth")
 PREDICTIONS_DIR = os.path.join(BASE_DIR, "../data/processed/reconstructed_video/masks")
-
-def load_images(folder):
-    """Carrega todas as imagens de um diretório."""
-    images = {}
-    
-    if not os.path.exists(folder):
-        print(f"⚠️ Erro: Diretório não encontrado: {folder}")
-        return images
-
-    for filename in sorted(os.listdir(folder)):  
-        if filename.endswith(".png"):
-            img_path = os.path.join(folder, filename)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is not None:
-                _, binary_img = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-                images[filename] = binary_img
-            else:
-                print(f"⚠️ Erro ao carregar imagem: {filename}")
-    return images
-
-# Carregar as imagens
-gt_images = load_images(GROUND_TRUTH_DIR)
-pred_images = load_images(PREDICTIONS_DIR)
-
-# Verificar se há imagens carregadas
-if not gt_images or not pred_images:
-    print("⚠️ Erro: Ground truth ou segmentações não foram carregadas corretamente!")
-    exit()
-
-# Escolher um frame aleatório para análise
-random_frame = random.choice(list(gt_images.keys()))
-
-gt = gt_images[random_frame]
-pred = pred_images.get(random_frame, None)
-
-if pred is None:
-    print(f"⚠️ Erro: Não há predição correspondente para {random_frame}")
-    exit()
-
-# Verificar se as imagens têm o mesmo tamanho
-if gt.shape != pred.shape:
-    pred = cv2.resize(pred, (gt.shape[1], gt.shape[0]), interpolation=cv2.INTER_NEAREST)
-
-# Comparação pixel a pixel
-diff = np.abs(gt - pred)
-if np.sum(diff) == 0:
-    print("⚠️ As máscaras preditas são idênticas à ground truth!")
-
-# Mostrar valores únicos para verificar problemas
-print(f"Valores únicos na Ground Truth: {np.unique(gt)}")
-print(f"Valores únicos na Predição: {np.unique(pred)}")
-
-# Contar pixels ativos em cada uma
-print(f"Pixels ativos na Ground Truth: {np.sum(gt > 127)}")
-print(f"Pixels ativos na Predição: {np.sum(pred > 127)}")
-
-# Exibir imagens para comparação
-plt.figure(figsize=(12, 6))
-plt.subplot(1, 3, 1)
-plt.imshow(gt, cmap="gray")
-plt.title("Ground Truth")
-
-plt.subplot(1, 3, 2)
-plt.imshow(pred, cmap="gray")
-plt.title("Predição")
-
-plt.subplot(1, 3, 3)
-plt.imshow(diff, cmap="hot")
-plt.title("Diferença (GT - Predição)")
-
-plt.show()
+PREDICTIONS_STORE = os.path.join(BASE_DIR, "../data/processed/reconstructed_video/masks.bsm")
+
+def validate_evaluation():
+    """Inspeciona um frame aleatório para validar a avaliação."""
+    if use_packed_masks(GROUND_TRUTH_STORE, PREDICTIONS_STORE, PREDICTIONS_DIR):
+        # Stores empacotados: decodifica só o frame sorteado
+        with MaskStore(GROUND_TRUTH_STORE) as gt_store, MaskStore(PREDICTIONS_STORE) as pred_store:
+            common = np.intersect1d(gt_store.frame_numbers, pred_store.frame_numbers)
+            if not len(common):
+                print("⚠️ Erro: Nenhum frame em comum entre ground truth e segmentações!")
+                return
+            frame_num = int(random.choice(common))
+            random_frame = mask_filename(frame_num)
+            gt, pred = gt_store.get(frame_num), pred_store.get(frame_num)
+    else:
+        # Verificar se os diretórios existem
+        for folder in (GROUND_TRUTH_DIR, PREDICTIONS_DIR):
+            if not os.path.isdir(folder):
+                print(f"⚠️ Erro: Diretório não encontrado: {folder}")
+                return
+
+        filenames = mask_pair_filenames(GROUND_TRUTH_DIR, PREDICTIONS_DIR)
+        if not filenames:
+            print("⚠️ Erro: Nenhum frame em comum entre ground truth e segmentações!")
+            return
+
+        # Escolher um frame aleatório para análise (só esse par é decodificado)
+        random_frame = random.choice(filenames)
+
+        gt = load_binary_mask(os.path.join(GROUND_TRUTH_DIR, random_frame))
+        pred = load_binary_mask(os.path.join(PREDICTIONS_DIR, random_frame))
+
+        if gt is None or pred is None:
+            print(f"⚠️ Erro ao carregar imagem: {random_frame}")
+            return
+
+    # Verificar se as imagens têm o mesmo tamanho
+    if gt.shape != pred.shape:
+        pred = cv2.resize(pred, (gt.shape[1], gt.shape[0]), interpolation=cv2.INTER_NEAREST)
+
+    # Comparação pixel a pixel (XOR: np.abs(gt - pred) em uint8 dá 1, não 255, onde gt=0 e pred=255)
+    diff = xor_diff(gt, pred)
+    if not cv2.countNonZero(diff):
+        print("⚠️ As máscaras preditas são idênticas à ground truth!")
+
+    # Mostrar valores únicos para verificar problemas
+    print(f"Valores únicos na Ground Truth: {np.unique(gt)}")
+    print(f"Valores únicos na Predição: {np.unique(pred)}")
+
+    # Contar pixels ativos em cada uma
+    print(f"Pixels ativos na Ground Truth: {np.sum(gt > 127)}")
+    print(f"Pixels ativos na Predição: {np.sum(pred > 127)}")
+
+    # Exibir imagens para comparação
+    plt.figure(figsize=(12, 6))
+    plt.subplot(1, 3, 1)
+    plt.imshow(gt, cmap="gray")
+    plt.title("Ground Truth")
+
+    plt.subplot(1, 3, 2)
+    plt.imshow(pred, cmap="gray")
+    plt.title("Predição")
+
+    plt.subplot(1, 3, 3)
+    plt.imshow(diff, cmap="hot")
+    plt.title("Diferença (XOR)")
+
+    plt.show()
+
+if __name__ == "__main__":
+    validate_evaluation()
@@ -0,0 +1,200 @@
+import cv2
+import numpy as np
+import os
+import time
+import queue
+import shutil
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Saída de vídeo -> (arquivo, conteúdo). Saídas com o mesmo conteúdo são codificadas uma
+# única vez e o arquivo é copiado para as demais ao final.
+VIDEO_OUTPUTS = {
+    "video_original": ("original.avi", "original"),
+    "video_tracking": ("tracking.avi", "tracking"),
+    "video_filtered": ("filtered.avi", "mask"),
+    "video_mog2": ("mog2.avi", "mask"),
+}
+CONTENT_ORDER = ("original", "tracking", "mask")
+COMPOSITE_FILE = "composite.avi"
+
+
+def _encoder_main(shm_name, slot_shape, slots, files, fps, fourcc, work_queue, free_queue, result_queue):
+    """Processo codificador: grava no VideoWriter de cada arquivo os frames dos slots recebidos."""
+    cv2.setNumThreads(1)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        ring = np.ndarray((slots,) + tuple(slot_shape), np.uint8, buffer=shm.buf)
+        height, width = slot_shape[1], slot_shape[2]
+        writers = [cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height)) for path in files]
+        failed = [path for path, writer in zip(files, writers) if not writer.isOpened()]
+        frames = 0
+        encode_time = 0.0
+        while True:
+            slot = work_queue.get()
+            if slot is None:
+                break
+            t0 = time.perf_counter()
+            for index, writer in enumerate(writers):
+                writer.write(ring[slot, index])
+            encode_time += time.perf_counter() - t0
+            frames += 1
+            free_queue.put(slot)
+        for writer in writers:
+            writer.release()
+        del ring
+        result_queue.put({"frames": frames, "encode_time": encode_time, "failed": failed})
+    except Exception as e:
+        result_queue.put({"error": repr(e)})
+    finally:
+        shm.close()
+
+
+class VideoOutputStage:
+    """Saídas de vídeo do pipeline com uma codificação por conteúdo distinto.
+
+    Saídas com o mesmo conteúdo (filtered.avi e mog2.avi recebem a mesma máscara)
+    viram um único fluxo codificado, copiado para os outros arquivos em `close`.
+    Com `composite=True`, os conteúdos são lado a lado em um único arquivo
+    (composite.avi). Os frames são escritos direto em slots de um anel em memória
+    compartilhada (a máscara em cinza é expandida para BGR uma vez, no próprio
+    slot), e um processo separado faz a codificação: o loop de segmentação só
+    espera se todos os `slots` estiverem ocupados. Com `separate_process=False`,
+    a codificação é feita na própria thread, com um slot.
+    """
+
+    def __init__(self, output_dir, outputs, size, fps=20, composite=False, separate_process=True, slots=8,
+                 fourcc="XVID"):
+        self.outputs = [output for output in VIDEO_OUTPUTS if output in outputs]
+        self.contents = [content for content in CONTENT_ORDER
+                         if any(VIDEO_OUTPUTS[output][1] == content for output in self.outputs)]
+        self.composite = composite
+        self.separate_process = separate_process
+        self.frames = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.encoder_stats = None
+
+        width, height = size
+        paths = {output: os.path.join(output_dir, VIDEO_OUTPUTS[output][0]) for output in self.outputs}
+        if composite:
+            self.files = [os.path.join(output_dir, COMPOSITE_FILE)]
+            self.copies = []
+            slot_shape = (1, height, width * len(self.contents), 3)
+        else:
+            # Um arquivo codificado por conteúdo; os outros arquivos do mesmo conteúdo são cópias
+            primary = {}
+            self.copies = []
+            for output in self.outputs:
+                content = VIDEO_OUTPUTS[output][1]
+                if content in primary:
+                    self.copies.append((primary[content], paths[output]))
+                else:
+                    primary[content] = paths[output]
+            self.files = [primary[content] for content in self.contents]
+            slot_shape = (len(self.contents), height, width, 3)
+
+        slots = slots if separate_process else 1
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod((slots,) + slot_shape)))
+        self._ring = np.ndarray((slots,) + slot_shape, np.uint8, buffer=self._shm.buf)
+        # Visão de cada conteúdo dentro de cada slot (calculadas uma vez)
+        self._views = []
+        for slot in range(slots):
+            if composite:
+                self._views.append({content: self._ring[slot, 0, :, i * width:(i + 1) * width]
+                                    for i, content in enumerate(self.contents)})
+            else:
+                self._views.append({content: self._ring[slot, i] for i, content in enumerate(self.contents)})
+
+        if separate_process:
+            context = multiprocessing.get_context("spawn")
+            self._work = context.Queue()
+            self._free = context.Queue()
+            self._results = context.Queue()
+            for slot in range(slots):
+                self._free.put(slot)
+            self._process = context.Process(
+                target=_encoder_main, name="video-encoder", daemon=True,
+                args=(self._shm.name, slot_shape, slots, self.files, fps, fourcc,
+                      self._work, self._free, self._results))
+            self._process.start()
+        else:
+            self._process = None
+            self._writers = [cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps,
+                                             (slot_shape[2], slot_shape[1])) for path in self.files]
+
+    def _wait_for(self, source):
+        """Próximo item de uma fila do codificador, sem travar se o processo morreu."""
+        while True:
+            try:
+                return source.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    raise IOError("O processo de codificação de vídeo terminou inesperadamente")
+
+    @staticmethod
+    def _fill(view, image):
+        if image.ndim == 2:
+            # Cinza -> BGR direto no slot, sem imagem intermediária
+            np.copyto(view, image[:, :, None])
+        else:
+            np.copyto(view, image)
+
+    def write(self, original=None, tracking=None, mask=None):
+        """Enfileira um frame de cada conteúdo habilitado (imagens BGR ou cinza do tamanho do vídeo)."""
+        images = {"original": original, "tracking": tracking, "mask": mask}
+        if self._process is not None:
+            try:
+                slot = self._free.get_nowait()
+            except queue.Empty:
+                t0 = time.perf_counter()
+                slot = self._wait_for(self._free)
+                self.waits += 1
+                self.wait_time += time.perf_counter() - t0
+        else:
+            slot = 0
+
+        for content, view in self._views[slot].items():
+            self._fill(view, images[content])
+
+        if self._process is not None:
+            self._work.put(slot)
+        else:
+            for index, writer in enumerate(self._writers):
+                writer.write(self._ring[slot, index])
+        self.frames += 1
+
+    def close(self):
+        """Termina a codificação, copia os arquivos duplicados e devolve as estatísticas."""
+        if self._process is not None:
+            self._work.put(None)
+            self.encoder_stats = self._wait_for(self._results)
+            self._process.join()
+            self._process = None
+        elif self._writers:
+            for writer in self._writers:
+                writer.release()
+            self._writers = []
+        if self._ring is not None:
+            self._views = []
+            self._ring = None
+            self._shm.close()
+            self._shm.unlink()
+
+        if self.encoder_stats and "error" in self.encoder_stats:
+            raise IOError(f"Falha no processo de codificação de vídeo: {self.encoder_stats['error']}")
+        if self.encoder_stats and self.encoder_stats["failed"]:
+            raise IOError(f"Não foi possível abrir o vídeo: {self.encoder_stats['failed'][0]}")
+        for source, destination in self.copies:
+            shutil.copyfile(source, destination)
+        return self.stats()
+
+    def stats(self):
+        return {
+            "files": [os.path.basename(path) for path in self.files],
+            "copies": [os.path.basename(destination) for _, destination in self.copies],
+            "frames": self.frames,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "encode_time": (self.encoder_stats or {}).get("encode_time"),
+        }
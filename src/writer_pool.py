@@ -0,0 +1,133 @@
+import cv2
+import queue
+import threading
+import itertools
+import time
+
+
+class WriteError(IOError):
+    """Falha em uma ou mais escritas assíncronas."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        first_description, first_error = errors[0]
+        super().__init__(f"{len(errors)} escrita(s) falharam; primeira: {first_description}: {first_error}")
+
+
+def encode_and_write(paths, image, ext=".png"):
+    """Codifica a imagem uma única vez e grava os bytes em cada caminho."""
+    ok, encoded = cv2.imencode(ext, image)
+    if not ok:
+        raise IOError("cv2.imencode falhou")
+    for path in paths:
+        with open(path, "wb") as f:
+            f.write(encoded)
+
+
+class AsyncWriterPool:
+    """Fila limitada de escritas (PNG/vídeo) drenada por um pool de threads.
+
+    O cv2 libera o GIL durante a codificação, então as threads codificam em paralelo
+    com a segmentação. Tarefas com a mesma `key` (por exemplo, um `VideoWriter`) vão
+    sempre para a mesma thread e são executadas na ordem de envio. Quando há
+    `max_pending` tarefas na fila, `submit` bloqueia (backpressure).
+    """
+
+    def __init__(self, workers=4, max_pending=64):
+        if workers < 1:
+            raise ValueError("workers deve ser >= 1")
+
+        self.errors = []
+        self.submitted = 0
+        self.completed = 0
+        self.backpressure_waits = 0
+        self.backpressure_time = 0.0
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._round_robin = itertools.cycle(range(workers))
+        self._lanes = {}
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker, args=(q,), daemon=True,
+                                          name=f"writer-{i}")
+                         for i, q in enumerate(self._queues)]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self, tasks):
+        while True:
+            task = tasks.get()
+            if task is None:
+                tasks.task_done()
+                return
+
+            description, func, args = task
+            try:
+                result = func(*args)
+                if result is False:  # cv2.imwrite sinaliza falha devolvendo False
+                    raise IOError("escrita devolveu False")
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((description, e))
+            finally:
+                with self._lock:
+                    self.completed += 1
+                self._slots.release()
+                tasks.task_done()
+
+    def submit(self, func, *args, key=None, description=""):
+        """Enfileira `func(*args)`; bloqueia enquanto a fila estiver cheia."""
+        if self._closed:
+            raise RuntimeError("AsyncWriterPool já foi fechado")
+
+        if not self._slots.acquire(blocking=False):
+            t0 = time.perf_counter()
+            self._slots.acquire()
+            self.backpressure_waits += 1
+            self.backpressure_time += time.perf_counter() - t0
+
+        if key is None:
+            lane = next(self._round_robin)
+        else:
+            lane = self._lanes.setdefault(key, len(self._lanes) % len(self._queues))
+
+        self.submitted += 1
+        self._queues[lane].put((description, func, args))
+
+    def write_image(self, paths, image, description=""):
+        """Enfileira a codificação PNG de `image` e sua gravação em `paths`."""
+        self.submit(encode_and_write, list(paths), image, description=description or paths[0])
+
+    def flush(self):
+        """Espera até que todas as escritas enfileiradas tenham terminado."""
+        for tasks in self._queues:
+            tasks.join()
+
+    def close(self, raise_on_error=False):
+        """Esvazia a fila, encerra as threads e devolve a lista de erros."""
+        if not self._closed:
+            self._closed = True
+            for tasks in self._queues:
+                tasks.put(None)
+            for thread in self._threads:
+                thread.join()
+
+        if raise_on_error and self.errors:
+            raise WriteError(self.errors)
+        return self.errors
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "errors": len(self.errors),
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_time": self.backpressure_time,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_on_error=exc_type is None)
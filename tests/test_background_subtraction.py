@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import background_subtraction as bs
+from checkpoint import CHECKPOINT_DIR
+from mask_store import MaskStore
+
+
+@pytest.fixture
+def frames_dir(tmp_path):
+    """Sequência curta: fundo liso com um quadrado claro se movendo."""
+    folder = tmp_path / "frames"
+    folder.mkdir()
+    for i in range(8):
+        frame = np.full((60, 80, 3), 40, np.uint8)
+        cv2.rectangle(frame, (5 + 6 * i, 20), (25 + 6 * i, 45), (220, 220, 220), -1)
+        cv2.imwrite(str(folder / f"seq_{i + 1:06d}.jpg"), frame)
+    return str(folder)
+
+
+@pytest.mark.parametrize("output, pattern", [
+    ("test_mask", os.path.join("processed", "masks", "test_mask_{:04d}.png")),
+    ("debug_tracked", os.path.join("debug", "tracked_debug_{}.png")),
+])
+def test_only_copy_output_enabled(tmp_path, frames_dir, output, pattern):
+    pipeline = bs.BackgroundSubtractionPipeline(
+        outputs=(output,), output_dir=str(tmp_path / "processed"), debug_dir=str(tmp_path / "debug"),
+        headless=True, verbose=False)
+    summary = pipeline.run(frames_dir)
+
+    assert summary["frames"] == 8
+    primary = {"test_mask": "mask", "debug_tracked": "tracked"}[output]
+    assert f"write_{primary}" in summary["stage_times"]
+    for frame_num in range(1, 9):
+        assert os.path.exists(tmp_path / pattern.format(frame_num))
+
+
+def test_run_releases_resources_on_error(tmp_path, frames_dir):
+    def fail(frame_num, mask):
+        if frame_num == 3:
+            raise RuntimeError("falha simulada")
+
+    threads_before = set(threading.enumerate())
+    pipeline = bs.BackgroundSubtractionPipeline(
+        outputs=("mask", "mask_store"), output_dir=str(tmp_path / "processed"), debug_dir=str(tmp_path / "debug"),
+        headless=True, verbose=False)
+    with pytest.raises(RuntimeError):
+        pipeline.run(frames_dir, on_mask=fail)
+
+    assert set(threading.enumerate()) <= threads_before
+    assert pipeline._writer is None
+    assert os.path.exists(tmp_path / "processed" / "masks.bsm")
+
+
+def test_resume_keeps_previous_masks_and_log(tmp_path, frames_dir):
+    kwargs = dict(model="gmm", outputs=("mask_store", "log"), output_dir=str(tmp_path / "processed"),
+                  debug_dir=str(tmp_path / "debug"), checkpoint_dir=str(tmp_path / "checkpoints"),
+                  headless=True, verbose=False)
+
+    def interrupt(frame_num, mask):
+        if frame_num == 6:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        bs.BackgroundSubtractionPipeline(checkpoint_every=4, **kwargs).run(frames_dir, on_mask=interrupt)
+    summary = bs.BackgroundSubtractionPipeline(resume=True, **kwargs).run(frames_dir)
+
+    assert summary["checkpoint"]["resumed_from"] == 4
+    assert summary["frames"] == 4
+    with MaskStore(str(tmp_path / "processed" / "masks.bsm")) as store:
+        assert store.frame_numbers.tolist() == list(range(1, 9))
+    log = bs.read_log(str(tmp_path / "debug" / "debug_log.txt"))
+    assert [frame_num for frame_num, _, _ in log] == list(range(1, 9))
+
+
+def test_checkpoint_every_defaults_checkpoint_dir():
+    pipeline = bs.BackgroundSubtractionPipeline(model="gmm", checkpoint_every=10, outputs=(), verbose=False)
+    assert pipeline.checkpoint_dir == CHECKPOINT_DIR
+
+
+def test_grayscale_frames_match_color_decode(tmp_path):
+    from frame_source import ImageFolderFrameSource
+
+    rng = np.random.default_rng(0)
+    folder = tmp_path / "color"
+    folder.mkdir()
+    for i in range(3):
+        cv2.imwrite(str(folder / f"seq_{i + 1:06d}.jpg"), rng.integers(0, 256, (48, 64, 3), np.uint8))
+
+    with ImageFolderFrameSource(str(folder), grayscale=True) as source:
+        for frame_num, frame in source:
+            color = cv2.imread(str(folder / f"seq_{frame_num:06d}.jpg"), cv2.IMREAD_COLOR)
+            np.testing.assert_array_equal(frame, cv2.cvtColor(color, cv2.COLOR_BGR2GRAY))
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from comparison_renderer import render_comparisons
+from writer_pool import WriteError
+
+
+def pairs(names):
+    mask = np.zeros((24, 32), np.uint8)
+    mask[5:15, 8:20] = 255
+    return [(name, mask, np.roll(mask, 3, axis=1)) for name in names]
+
+
+def test_success_reported_only_after_write(tmp_path, capsys):
+    # Um diretório no lugar do arquivo de saída faz a escrita falhar
+    (tmp_path / "comparison_mask_0002.png").mkdir()
+
+    with pytest.raises(WriteError):
+        render_comparisons(pairs(["mask_0001.png", "mask_0002.png"]), str(tmp_path), workers=2)
+
+    out = capsys.readouterr().out
+    assert "Comparação salva: mask_0001.png" in out
+    assert "mask_0002.png" not in out
+    assert (tmp_path / "comparison_mask_0001.png").is_file()
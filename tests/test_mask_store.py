@@ -0,0 +1,60 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mask_store import MaskStoreWriter, current_mask_source, mask_filename, use_packed_masks
+
+
+def write_pngs(folder, frame_numbers, mtime):
+    folder.mkdir(exist_ok=True)
+    for frame_num in frame_numbers:
+        path = str(folder / mask_filename(frame_num))
+        cv2.imwrite(path, np.zeros((8, 16), np.uint8))
+        os.utime(path, (mtime, mtime))
+
+
+def write_store(path, frame_numbers, mtime):
+    with MaskStoreWriter(str(path), (8, 16)) as writer:
+        for frame_num in frame_numbers:
+            writer.append(frame_num, np.zeros((8, 16), np.uint8))
+    os.utime(str(path), (mtime, mtime))
+
+
+def test_current_mask_source(tmp_path):
+    masks, store = tmp_path / "masks", tmp_path / "masks.bsm"
+    assert current_mask_source(str(store), str(masks)) is None
+
+    write_pngs(masks, range(1, 5), 1000)
+    assert current_mask_source(str(store), str(masks)) == "png"
+
+    # Store gravado junto com os PNGs (fecha por último)
+    write_store(store, range(1, 5), 1001)
+    assert current_mask_source(str(store), str(masks)) == "both"
+
+    # Execução seguinte só com o store, cobrindo outros frames: os PNGs são sobras
+    write_store(store, range(1, 9), 1002)
+    assert current_mask_source(str(store), str(masks)) == "store"
+
+    # Execução seguinte só com PNGs: o store é sobra
+    write_pngs(masks, range(1, 9), 1003)
+    assert current_mask_source(str(store), str(masks)) == "png"
+
+
+def test_use_packed_masks_rejects_stale_stores(tmp_path):
+    masks, store, gt_store = tmp_path / "masks", tmp_path / "masks.bsm", tmp_path / "ground_truth.bsm"
+    write_pngs(masks, range(1, 5), 1000)
+    write_store(store, range(1, 5), 1001)
+    write_store(gt_store, range(1, 5), 1002)
+    assert use_packed_masks(str(gt_store), str(store), str(masks))
+
+    # PNGs de uma execução posterior
+    write_pngs(masks, range(1, 5), 1003)
+    assert not use_packed_masks(str(gt_store), str(store), str(masks))
+
+    # Store novo, mas a GT empacotada ainda é da execução anterior
+    write_store(store, range(1, 5), 1004)
+    assert not use_packed_masks(str(gt_store), str(store), str(masks))
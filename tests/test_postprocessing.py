@@ -0,0 +1,45 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from postprocessing import LEGACY_OPERATIONS, PostProcessor, binary_median, scale_operations
+
+
+@pytest.mark.parametrize("scale", [0.75, 0.5, 0.25])
+def test_scaled_kernels_are_odd(scale):
+    for op, size in scale_operations(LEGACY_OPERATIONS, scale):
+        if op != "remove_small_regions":
+            assert size % 2 == 1, (op, size)
+
+
+@pytest.mark.parametrize("scale", [0.75, 0.5])
+def test_scaled_chain_does_not_shift_mask(scale):
+    mask = np.zeros((120, 160), np.uint8)
+    mask[40:80, 60:100] = 255
+    result = PostProcessor(scale=scale)(mask)
+    ys, xs = np.nonzero(result)
+    assert (ys.min(), ys.max(), xs.min(), xs.max()) == (40, 79, 60, 99)
+
+
+@pytest.mark.parametrize("kernel_size", [3, 5, 7, 15])
+def test_binary_median_matches_median_blur(kernel_size):
+    rng = np.random.default_rng(kernel_size)
+    mask = np.where(rng.random((61, 83)) < 0.4, 255, 0).astype(np.uint8)
+    np.testing.assert_array_equal(binary_median(mask, kernel_size), cv2.medianBlur(mask, kernel_size))
+
+
+def test_fused_chain_matches_legacy():
+    rng = np.random.default_rng(0)
+    legacy, fused = PostProcessor("legacy"), PostProcessor("fused")
+    for density in (0.05, 0.3, 0.6):
+        mask = np.where(rng.random((120, 160)) < density, 255, 0).astype(np.uint8)
+        mask[30:90, 40:110] = 255
+        np.testing.assert_array_equal(fused(mask), legacy(mask))
+    # Máscara com sombras (127): a mediana genérica é usada
+    shadows = np.where(rng.random((120, 160)) < 0.3, 127, 0).astype(np.uint8)
+    np.testing.assert_array_equal(fused(shadows), legacy(shadows))
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stage_cache import module_sources
+
+
+def test_module_sources_follows_local_imports(tmp_path):
+    (tmp_path / "stage.py").write_text("import os\nimport helper\n\ndef run():\n    from lazy import work\n")
+    (tmp_path / "helper.py").write_text("import numpy as np\nfrom shared import CONSTANT\n")
+    (tmp_path / "lazy.py").write_text("def work():\n    pass\n")
+    (tmp_path / "shared.py").write_text("CONSTANT = 1\n")
+    (tmp_path / "unused.py").write_text("")
+
+    sources = module_sources("stage", source_dir=str(tmp_path))
+
+    assert [os.path.basename(path) for path in sources] == ["helper.py", "lazy.py", "shared.py", "stage.py"]
+
+
+def test_pipeline_code_covers_imported_modules():
+    names = {os.path.basename(path) for path in module_sources("background_subtraction")}
+    assert {"background_subtraction.py", "frame_source.py", "writer_pool.py", "mask_store.py",
+            "checkpoint.py", "tracker.py", "video_output.py"} <= names
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sweep import expand_grid
+
+
+def test_expand_grid_rejects_even_kernels():
+    assert len(expand_grid({"median_kernel": [3, 5], "morph_kernel": [3, 5, 7]})) == 6
+    with pytest.raises(ValueError, match="morph_kernel"):
+        expand_grid({"morph_kernel": [4, 5]})
+    with pytest.raises(ValueError, match="median_kernel"):
+        expand_grid({"median_kernel": [2]})